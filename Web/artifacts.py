@@ -0,0 +1,67 @@
+"""
+Versioned artifact directory shared by train_model.py (writer) and
+server.py (reader).
+
+Layout:
+    artifacts/
+        CURRENT                  <- name of the live version
+        20250101-120000/
+            model.pkl
+            forest.npz
+            attributions.npz
+            metadata.json
+            analysis_dataset.csv
+
+Publishing copies the files into a fresh version directory and then
+atomically rewrites CURRENT, so a reader never sees a half-written version.
+If there is no CURRENT file, the loose files next to server.py are used.
+They are never hot-reloaded: train_model.py rewrites them one by one, so a
+reader could catch a mix of two runs. Only a forced reload re-reads them.
+"""
+import os
+import shutil
+import time
+
+ARTIFACT_ROOT = os.environ.get("ARTIFACT_ROOT", "artifacts")
+CURRENT_FILE = "CURRENT"
+LEGACY_VERSION = "local"
+
+ARTIFACT_FILES = ["model.pkl", "forest.npz", "attributions.npz", "metadata.json", "analysis_dataset.csv"]
+
+
+def current_version(root=ARTIFACT_ROOT):
+    """Return (version, directory) of the live artifacts."""
+    pointer = os.path.join(root, CURRENT_FILE)
+    try:
+        with open(pointer, 'r') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return LEGACY_VERSION, "."
+    return version, os.path.join(root, version)
+
+
+def fingerprint(root=ARTIFACT_ROOT):
+    """Cheap value that changes whenever a new version should be loaded (only via CURRENT)."""
+    version, _ = current_version(root)
+    return version
+
+
+def publish_artifacts(src_dir=".", root=ARTIFACT_ROOT, version=None, files=ARTIFACT_FILES):
+    """Copy freshly built artifacts into a new version and make it live."""
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    os.makedirs(root, exist_ok=True)
+
+    staging = os.path.join(root, f".{version}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name in files:
+        src = os.path.join(src_dir, name)
+        if os.path.exists(src):
+            shutil.copy2(src, os.path.join(staging, name))
+    os.replace(staging, os.path.join(root, version))
+
+    pointer_tmp = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_FILE))
+    return version
@@ -0,0 +1,191 @@
+"""
+Per-feature attributions of a school's baseline prediction: exact
+path-dependent TreeSHAP over a NumpyForest, vectorized across all leaves.
+
+Path-dependent SHAP explains f(x) with v(S) = E[f(x) | x_S]. Splits on a
+feature in S follow x; any other split averages its two children, weighted
+by how many training samples went each way (node cover). For one leaf this
+is a product over features:
+
+    v_leaf(S) = value * prod_{f in S} A_f * prod_{f not in S} B_f
+
+A_f is 1 when x is inside the leaf's box on feature f (0 otherwise). B_f is
+the product of the cover ratios of the leaf's splits on f. A feature the path
+never splits on has A_f = B_f = 1. The Shapley value of this product game is
+
+    phi_f = value * (A_f - B_f) * sum_k w_k * e_k(f),    w_k = k! (M-k-1)! / M!
+
+Here e_k(f) is the z^k coefficient of prod_{g != f} (B_g + A_g z). That is the
+full product divided by f's own factor. So one product per sample, plus one
+synthetic division per feature, gives every e_k(f) in O(M^2) array operations
+over all leaves at once. The leaf boxes and B depend only on the forest, so
+they are built once.
+
+train_model.py --attributions stores every school's values in attributions.npz
+so the endpoint is a lookup; the server ignores a file computed for another
+forest (PrecomputedAttributions.forest_fingerprint). SHAP values of the forest
+are the mean of each tree's, so after a warm start (refresh.py) only the new
+trees need explaining for schools whose inputs didn't change
+(PrecomputedAttributions.extend).
+
+benchmarks/treeshap_check.py checks this code against a brute-force
+enumeration of all 2^M subsets.
+"""
+from math import factorial
+
+import numpy as np
+
+
+def leaf_boxes(forest):
+    """
+    (lo, hi, cover ratio) per feature and leaf, shaped (features, leaves), plus
+    each leaf's value. x is inside a leaf's box when lo < x <= hi. The ratio is
+    None when the forest has no node covers.
+    """
+    n_nodes, m = forest.value.size, len(forest.feature_names)
+    lo = np.full((n_nodes, m), -np.inf)
+    hi = np.full((n_nodes, m), np.inf)
+    ratio = np.ones((n_nodes, m)) if forest.cover is not None else None
+    is_leaf = forest.children_left == np.arange(n_nodes)
+
+    # Walk all trees one depth level at a time
+    frontier = forest.roots.astype(np.int64)
+    for _ in range(forest.max_depth):
+        frontier = frontier[~is_leaf[frontier]]
+        if frontier.size == 0:
+            break
+        feat = forest.feature[frontier]
+        thr = forest.threshold[frontier]
+        left = forest.children_left[frontier]
+        right = forest.children_right[frontier]
+        for child in (left, right):
+            lo[child], hi[child] = lo[frontier], hi[frontier]
+            if ratio is not None:
+                ratio[child] = ratio[frontier]
+                ratio[child, feat] *= forest.cover[child] / forest.cover[frontier]
+        hi[left, feat] = np.minimum(hi[frontier, feat], thr)
+        lo[right, feat] = np.maximum(lo[frontier, feat], thr)
+        frontier = np.concatenate([left, right])
+
+    leaves = np.flatnonzero(is_leaf)
+    return (np.ascontiguousarray(lo[leaves].T), np.ascontiguousarray(hi[leaves].T),
+            None if ratio is None else np.ascontiguousarray(ratio[leaves].T), forest.value[leaves])
+
+
+class TreeShap:
+    def __init__(self, forest, trees=None):
+        """`trees` (a slice of tree indices) explains just those trees' mean instead of the forest's."""
+        if forest.cover is None:
+            raise ValueError("forest.npz has no node covers; re-export it with train_model.py")
+        self.feature_names = list(forest.feature_names)
+        self.lo, self.hi, self.ratio, self.value = leaf_boxes(forest)
+        self.n_trees = forest.n_trees
+        if trees is not None:
+            # Leaves come out in node order and every tree's nodes are contiguous
+            leaves = np.flatnonzero(forest.children_left == np.arange(forest.value.size))
+            tree_of_leaf = np.searchsorted(forest.roots, leaves, side='right') - 1
+            start, stop, _ = trees.indices(forest.n_trees)
+            keep = (tree_of_leaf >= start) & (tree_of_leaf < stop)
+            self.lo, self.hi, self.ratio = self.lo[:, keep], self.hi[:, keep], self.ratio[:, keep]
+            self.value = self.value[keep]
+            self.n_trees = max(stop - start, 0)
+
+        m = len(self.feature_names)
+        self.weights = np.array([factorial(k) * factorial(m - k - 1) / factorial(m) for k in range(m)])
+        # Average of every tree's prediction when no feature is known
+        self.expected_value = float(self.ratio.prod(axis=0) @ self.value) / self.n_trees
+
+    def _explain(self, x):
+        m = len(self.feature_names)
+        # (features, leaves), so every per-feature row below is contiguous
+        A = (x[:, None] > self.lo) & (x[:, None] <= self.hi)
+        B = self.ratio
+
+        # P[k] = z^k coefficient of prod_g (B_g + A_g z)
+        P = np.zeros((m + 1, A.shape[1]))
+        P[0] = 1.0
+        for f in range(m):
+            P[1:] = P[1:] * B[f] + P[:-1] * A[f]
+            P[0] *= B[f]
+        # Where A_f = 0, f's factor is the constant B_f: sum_k w_k e_k(f) = (w . P) / B_f
+        outside = self.weights @ P[:m]
+
+        phi = np.empty(m)
+        for f in range(m):
+            a, b = A[f], B[f]
+            # Where A_f = 1, divide P by (B_f + z), top coefficient first (stable: B_f <= 1)
+            q = np.zeros_like(b)
+            inside = np.zeros_like(b)
+            for k in range(m - 1, -1, -1):
+                q = P[k + 1] - b * q
+                inside += self.weights[k] * q
+            weighted = np.where(a, inside, outside / b)
+            phi[f] = ((a - b) * weighted) @ self.value
+        return phi / self.n_trees
+
+    def shap_values(self, X_scaled):
+        """SHAP values of the scaled model output, shape (n_samples, n_features)."""
+        # Same float32 comparison as the trees themselves
+        X = np.asarray(X_scaled, dtype=np.float32).astype(np.float64)
+        return np.array([self._explain(x) for x in np.atleast_2d(X)])
+
+
+class PrecomputedAttributions:
+    def __init__(self, names, values, expected_value, feature_names, n_trees=None, forest_fingerprint=None):
+        self.values = values
+        self.expected_value = float(expected_value)
+        self.feature_names = list(feature_names)
+        self.row_of = {n: i for i, n in enumerate(names)}
+        # Trees and forest the values were computed over (None in files from before they were stored)
+        self.n_trees = n_trees
+        self.forest_fingerprint = forest_fingerprint
+
+    def get(self, name):
+        row = self.row_of.get(name)
+        return None if row is None else self.values[row]
+
+    def save(self, path):
+        extra = {} if self.n_trees is None else {"n_trees": self.n_trees}
+        if self.forest_fingerprint is not None:
+            extra["forest_fingerprint"] = self.forest_fingerprint
+        np.savez(path, names=np.array(list(self.row_of), dtype=str), values=self.values,
+                 expected_value=self.expected_value, feature_names=np.array(self.feature_names, dtype=str), **extra)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            n_trees = int(data["n_trees"]) if "n_trees" in data.files else None
+            fingerprint = str(data["forest_fingerprint"]) if "forest_fingerprint" in data.files else None
+            return cls(data["names"].tolist(), data["values"], data["expected_value"],
+                       data["feature_names"].tolist(), n_trees, fingerprint)
+
+    @classmethod
+    def compute(cls, forest, names, X_raw):
+        shap = TreeShap(forest)
+        return cls(names, shap.shap_values(forest.transform(X_raw)), shap.expected_value,
+                   forest.feature_names, forest.n_trees, forest.fingerprint())
+
+    @classmethod
+    def extend(cls, previous, forest, names, X_raw, recompute=()):
+        """
+        Attributions after a warm start appended trees to the forest `previous`
+        was computed on (same scaler, its trees first). Schools in `recompute`
+        or missing from `previous` are explained over the whole forest. Every
+        other school keeps its stored values, weighted by the old tree count,
+        plus the new trees' values weighted by theirs.
+        """
+        old, total = previous.n_trees, forest.n_trees
+        X_scaled = forest.transform(X_raw)
+        recompute = set(recompute)
+        keep = [i for i, n in enumerate(names) if n not in recompute and n in previous.row_of]
+        fresh = sorted(set(range(len(names))) - set(keep))
+
+        added = TreeShap(forest, trees=slice(old, total))
+        values = np.empty((len(names), len(forest.feature_names)))
+        if keep:
+            stored = previous.values[[previous.row_of[names[i]] for i in keep]]
+            values[keep] = (old * stored + added.n_trees * added.shap_values(X_scaled[keep])) / total
+        if fresh:
+            values[fresh] = TreeShap(forest).shap_values(X_scaled[fresh])
+        expected = (old * previous.expected_value + added.n_trees * added.expected_value) / total
+        return cls(names, values, expected, forest.feature_names, total, forest.fingerprint())
@@ -0,0 +1,75 @@
+"""
+Check and time interactions.InteractionSurfaces against predicting the same grid.
+
+The reference builds every grid point of every feature pair as a row, the way
+a batched simulator call would, and runs them through model.predict_scaled in
+one call per school. Both should agree to float rounding.
+
+    python benchmarks/interactions.py --schools 10 --resolution 21
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interactions import DEFAULT_MAX_DELTA, InteractionSurfaces  # noqa: E402
+from predictor import load_predictor  # noqa: E402
+
+
+def grid_batch(surfaces, base_vec, deltas):
+    da, db = (d.ravel() for d in np.meshgrid(deltas, deltas, indexing="ij"))
+    batches = []
+    for p, q in surfaces.pairs:
+        fa, fb = surfaces.feat_idx[p], surfaces.feat_idx[q]
+        batch = np.tile(base_vec, (da.size, 1))
+        batch[:, fa] = np.minimum(base_vec[fa] + da, 1.0)
+        batch[:, fb] = np.minimum(base_vec[fb] + db, 1.0)
+        batches.append(batch)
+    return np.concatenate(batches)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schools", type=int, default=10)
+    parser.add_argument("--resolution", type=int, default=21)
+    args = parser.parse_args()
+
+    with open('metadata.json', 'r') as f:
+        metadata = json.load(f)
+    model = load_predictor(".")
+    defaults = metadata["school_defaults"]
+    names = list(defaults)[:args.schools]
+    deltas = np.linspace(0.0, DEFAULT_MAX_DELTA, args.resolution)
+
+    start = time.perf_counter()
+    surfaces = InteractionSurfaces(model.forest, metadata["numeric_cols"], metadata["controllable_features"])
+    print(f"backend={model.name} pairs={len(surfaces.pairs)} grid={args.resolution}x{args.resolution} "
+          f"build {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    fast_s = ref_s = worst = 0.0
+    for name in names:
+        base_vec = model.transform([float(defaults[name][c]) for c in metadata["numeric_cols"]])
+        start = time.perf_counter()
+        fast, _ = surfaces.compute(base_vec, deltas)
+        fast_s += time.perf_counter() - start
+
+        batch = grid_batch(surfaces, base_vec, deltas)
+        start = time.perf_counter()
+        ref = model.predict_scaled(batch).reshape(fast.shape)
+        ref_s += time.perf_counter() - start
+        worst = max(worst, np.abs(ref - fast).max())
+
+    n = len(names)
+    print(f"  leaf boxes      {fast_s / n * 1000:8.1f} ms/school")
+    print(f"  predict_scaled  {ref_s / n * 1000:8.1f} ms/school ({len(batch)} rows)")
+    print(f"  max |diff| {worst:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Throughput and latency of concurrent simulator requests with and without
+micro-batching.
+
+    python benchmarks/microbatch.py --threads 8 --requests 20
+    MODEL_BACKEND=sklearn python benchmarks/microbatch.py
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+def run(app, names, threads, per_thread):
+    client_latencies = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        client = app.test_client()
+        local = []
+        for i in range(per_thread):
+            name = names[(offset * per_thread + i) % len(names)]
+            t = time.perf_counter()
+            client.post('/api/school_profile_full', json={"school_name": name, "delta": 0.2})
+            local.append(time.perf_counter() - t)
+        with lock:
+            client_latencies.extend(local)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    lat = np.array(client_latencies) * 1000
+    return len(lat) / elapsed, np.percentile(lat, 50), np.percentile(lat, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20, help="requests per thread")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    app = server.create_app(watch=False)
+    serving = app.extensions['state_manager'].current
+    names = list(serving.default_rows)
+    print(f"backend={serving.model.name} threads={args.threads} requests/thread={args.requests}")
+
+    for label, window in (("no batching", 0.0), (f"window {args.window_ms} ms", args.window_ms)):
+        serving.batcher.window = window / 1000.0
+        serving.batcher.calls = serving.batcher.batches = 0
+        run(app, names, args.threads, 2)  # warm-up
+        rps, p50, p99 = run(app, names, args.threads, args.requests)
+        calls = max(serving.batcher.calls, 1)
+        print(f"  {label:14s} {rps:7.1f} req/s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  "
+              f"({serving.batcher.batches}/{calls} model calls)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Check quantized.QuantizedForest against the scikit-learn pipeline and time it
+on simulator batches.
+
+The reference is the "sklearn" backend: model.pkl's fitted MinMaxScaler and
+RandomForestRegressor.predict. Exactness is checked three ways:
+
+  - grid-aligned raw ratings (1.0-5.0 in steps of 0.1), scaled and predicted
+  - every school's simulator batch
+  - uniform random scaled inputs, off the grid
+
+All three must be bit-identical, not just close.
+
+    python benchmarks/quantized.py --schools 50
+
+Needs model.pkl next to forest.npz.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+from benchmarks.uncertainty import simulator_batch, timed  # noqa: E402
+from predictor import load_predictor  # noqa: E402
+from quantized import QuantizedForest  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schools", type=int, default=50)
+    parser.add_argument("--random-rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    sklearn = load_predictor(".", "sklearn")
+    forest = load_predictor(".", "numpy").forest
+    start = time.perf_counter()
+    quantized = QuantizedForest(forest)
+    table_mb = sum(t.nbytes for t in quantized.bits) / 2 ** 20
+    print(f"build {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{quantized.n_words} words/row, tables {table_mb:.1f} MB")
+
+    rng = np.random.default_rng(0)
+    raw = rng.integers(10, 51, size=(args.random_rows, len(forest.feature_names))) / 10.0
+    exact = np.array_equal(quantized.predict_scaled(forest.transform(raw)), sklearn.predict(raw))
+    print(f"  grid-aligned raw   exact: {exact}")
+
+    app = server.create_app(watch=False)
+    serving = app.extensions['state_manager'].current
+    names = list(serving.default_rows)[:args.schools]
+    batches = [simulator_batch(serving, n) for n in names]
+    exact = all(np.array_equal(quantized.predict_scaled(b), sklearn.predict_scaled(b)) for b in batches)
+    print(f"  simulator batches  exact: {exact}")
+
+    scaled = rng.random((args.random_rows, len(forest.feature_names)))
+    print(f"  random scaled      exact: {np.array_equal(quantized.predict_scaled(scaled), sklearn.predict_scaled(scaled))}")
+
+    print(f"schools={len(names)} rows/batch={len(batches[0])}")
+    base = timed(sklearn.predict_scaled, batches)
+    print(f"  {'sklearn':18s} {base:7.2f} ms/school")
+    for label, fn in (("numpy forest", forest.predict_scaled),
+                      ("quantized", quantized.predict_scaled)):
+        ms = timed(fn, batches)
+        print(f"  {label:18s} {ms:7.2f} ms/school  ({base / ms:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Check refresh.py's change detection and warm-start metadata rebuild on
+analysis_dataset.csv, whose school names repeat.
+
+Each case edits a copy of the dataset and plans a refresh against the
+unedited one. It checks two things:
+
+  - the plan touches exactly the edited schools
+  - school_defaults rebuilt from the plan matches a full rebuild
+
+Edits land on the first and the last row of a repeated name, since only
+the last one ends up in school_defaults.
+
+    python benchmarks/refresh_check.py
+"""
+import json
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from refresh import column_profile, plan_refresh, row_hashes, school_defaults, touched_schools  # noqa: E402
+
+TARGET = "happiness"
+
+
+def refresh_state(df, columns):
+    profiles = {c: column_profile(df[c]) for c in columns + [TARGET]}
+    return {"hashes": row_hashes(df), "profiles": profiles, "n_trees": 500, "full_trees": 500}
+
+
+def cases(df):
+    repeated = df.index[df.duplicated(["school_name", "state"], keep=False)]
+    name = df.loc[repeated[0], "school_name"]
+    rows = df.index[df["school_name"] == name]
+    first, last = rows[0], rows[-1]
+
+    def edit(row):
+        new = df.copy()
+        new.loc[row, "food"] = new.loc[row, "food"] % 5 + 0.1
+        return new
+
+    yield "unchanged", df.copy(), set()
+    yield "edit first of repeated name", edit(first), {name}
+    yield "edit last of repeated name", edit(last), {name}
+    yield "drop last of repeated name", df.drop(index=last).reset_index(drop=True), {name}
+    yield "repeat a row", pd.concat([df, df.loc[[first]]], ignore_index=True), {name}
+    yield "swap two schools", df.reindex([1, 0] + list(range(2, len(df)))).reset_index(drop=True), set()
+
+
+def main():
+    df = pd.read_csv("analysis_dataset.csv")
+    columns = [c for c in df.select_dtypes("number").columns if c not in (TARGET, "number_of_ratings")]
+    state = refresh_state(df, columns)
+    previous = school_defaults(df, TARGET)
+    print(f"{len(df)} rows, {df['school_name'].duplicated().sum()} repeat an earlier name")
+
+    ok = True
+    for label, new, expected in cases(df):
+        plan = plan_refresh(state, row_hashes(new), new, columns, columns)
+        touched = touched_schools(plan)
+        rebuilt = school_defaults(new, TARGET, previous, touched)
+        same = json.dumps(rebuilt) == json.dumps(school_defaults(new, TARGET))
+        passed = touched == expected and same
+        ok &= passed
+        print(f"  {label:30s} mode={plan['mode']:10s} touched={len(touched)} "
+              f"defaults match full: {same}  {'ok' if passed else 'FAIL'}")
+    print("all ok" if ok else "FAILED")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold-start time and per-worker memory of the server.
+
+Each run starts a fresh interpreter (like a new gunicorn worker), builds the
+app, serves one simulator request and reports wall time and resident memory.
+
+    python benchmarks/startup.py                      # current tree, auto backend
+    python benchmarks/startup.py --backend sklearn
+    python benchmarks/startup.py --web-dir /path/to/old/Web   # compare another checkout
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import server
+app = server.create_app(watch=False) if hasattr(server, "create_app") else server.app
+t_app = time.perf_counter() - t0
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+rss_ready = rss_mb()
+client = app.test_client()
+t1 = time.perf_counter()
+client.post("/api/school_profile_full", json={"school_name": "Adelphi University", "delta": 0.2})
+t_first = time.perf_counter() - t1
+print(json.dumps({
+    "startup_s": t_app,
+    "first_request_s": t_first,
+    "rss_ready_mb": rss_ready,
+    "rss_after_request_mb": rss_mb(),
+    "pandas_loaded": "pandas" in sys.modules,
+    "sklearn_loaded": "sklearn" in sys.modules,
+}))
+'''
+
+
+def run_once(web_dir, backend):
+    env = dict(os.environ)
+    if backend:
+        env["MODEL_BACKEND"] = backend
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD],
+        cwd=web_dir, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--web-dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--backend", default=None, help="MODEL_BACKEND for the child (auto/numpy/sklearn)")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once(args.web_dir, args.backend) for _ in range(args.runs)]
+    print(f"{args.web_dir} (backend={args.backend or 'default'}, {args.runs} runs, median)")
+    for key in ("startup_s", "first_request_s", "rss_ready_mb", "rss_after_request_mb"):
+        print(f"  {key:22s} {statistics.median(r[key] for r in runs):8.3f}")
+    print(f"  pandas loaded          {runs[0]['pandas_loaded']}")
+    print(f"  sklearn loaded         {runs[0]['sklearn_loaded']}")
+
+
+if __name__ == "__main__":
+    main()
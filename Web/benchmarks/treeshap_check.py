@@ -0,0 +1,114 @@
+"""
+Check attribution.TreeShap against a brute-force reference on a sample of schools.
+
+The reference evaluates v(S) = E[f(x) | x_S] for every one of the 2^M feature
+subsets with the classic EXPVALUE recursion (follow x on splits in S,
+cover-weighted average otherwise). It runs bottom-up over each tree's nodes
+and then applies the Shapley formula directly. It shares no code with the
+leaf-box algorithm. If the `shap` package is installed, its
+TreeExplainer(feature_perturbation="tree_path_dependent") is compared too.
+
+    python benchmarks/treeshap_check.py --schools 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from math import factorial
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attribution import TreeShap  # noqa: E402
+from predictor import load_predictor  # noqa: E402
+
+
+def internal_levels(forest):
+    """Internal nodes grouped by depth, deepest first."""
+    is_leaf = forest.children_left == np.arange(forest.value.size)
+    levels, frontier = [], forest.roots.astype(np.int64)
+    while frontier.size:
+        frontier = frontier[~is_leaf[frontier]]
+        if frontier.size:
+            levels.append(frontier)
+        frontier = np.concatenate([forest.children_left[frontier], forest.children_right[frontier]])
+    return levels[::-1]
+
+
+def reference_shap(forest, levels, x_scaled):
+    m = len(forest.feature_names)
+    x = np.float32(x_scaled).astype(np.float64)
+    goes_left = x[forest.feature] <= forest.threshold
+    left_share = forest.cover[forest.children_left] / forest.cover
+    right_share = forest.cover[forest.children_right] / forest.cover
+
+    v = np.empty(2 ** m)
+    for subset in range(2 ** m):
+        known = (subset >> forest.feature) & 1 == 1
+        val = forest.value.copy()
+        for nodes in levels:
+            l, r = forest.children_left[nodes], forest.children_right[nodes]
+            follow = np.where(goes_left[nodes], val[l], val[r])
+            average = left_share[nodes] * val[l] + right_share[nodes] * val[r]
+            val[nodes] = np.where(known[nodes], follow, average)
+        v[subset] = val[forest.roots].mean()
+
+    phi = np.zeros(m)
+    for f in range(m):
+        for subset in range(2 ** m):
+            if subset >> f & 1:
+                continue
+            k = bin(subset).count("1")
+            weight = factorial(k) * factorial(m - k - 1) / factorial(m)
+            phi[f] += weight * (v[subset | 1 << f] - v[subset])
+    return phi, v[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schools", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open('metadata.json', 'r') as f:
+        metadata = json.load(f)
+    forest = load_predictor(".").forest
+    defaults = metadata["school_defaults"]
+    rng = np.random.default_rng(args.seed)
+    names = rng.choice(list(defaults), size=min(args.schools, len(defaults)), replace=False)
+    X = forest.transform([[float(defaults[n][c]) for c in metadata["numeric_cols"]] for n in names])
+
+    start = time.perf_counter()
+    shap = TreeShap(forest)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    fast = shap.shap_values(X)
+    per_school = (time.perf_counter() - start) / len(names)
+    print(f"TreeShap: build {build * 1000:.0f} ms, {per_school * 1000:.1f} ms/school")
+
+    levels = internal_levels(forest)
+    worst = 0.0
+    for name, x, phi in zip(names, X, fast):
+        ref, expected = reference_shap(forest, levels, x)
+        worst = max(worst, np.abs(ref - phi).max(), abs(expected - shap.expected_value))
+    additivity = np.abs(fast.sum(axis=1) + shap.expected_value - forest.predict_scaled(X)).max()
+    print(f"brute force ({len(names)} schools): max |diff| {worst:.2e}, additivity error {additivity:.2e}")
+
+    try:
+        import pickle
+        import shap as shap_lib
+    except ImportError:
+        print("shap not installed; skipped TreeExplainer comparison")
+        return
+    with open('model.pkl', 'rb') as f:
+        model = pickle.load(f).named_steps['model']
+    explainer = shap_lib.TreeExplainer(model, feature_perturbation="tree_path_dependent")
+    lib = explainer.shap_values(X.astype(np.float32))
+    print(f"shap.TreeExplainer: max |diff| {np.abs(lib - fast).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cost of the simulator's uncertainty bands compared with a plain prediction.
+
+    python benchmarks/uncertainty.py --schools 50
+    MODEL_BACKEND=sklearn python benchmarks/uncertainty.py
+
+"per-tree + spread" is what `"uncertainty": true` does: one pass that keeps
+every tree's output, then its mean, std and 10th/90th percentiles.
+"two passes" is the alternative it replaces (predict, then per-tree again).
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+def simulator_batch(serving, name):
+    """The batch simulate_school sends for one school (delta 0.2)."""
+    numeric_cols = serving.metadata["numeric_cols"]
+    feat_idx = np.array([numeric_cols.index(f) for f in serving.metadata["controllable_features"]])
+    n_feat = len(feat_idx)
+    base_vec = serving.model.transform(serving.defaults_raw[serving.default_rows[name]])
+    deltas = np.concatenate([np.full(n_feat, 0.2), np.repeat(np.arange(server.SWEEP_STEPS) / 100.0, n_feat)])
+    feats = np.tile(feat_idx, server.SWEEP_STEPS + 1)
+    batch = np.tile(base_vec, (len(deltas) + 1, 1))
+    batch[np.arange(1, len(deltas) + 1), feats] = np.minimum(base_vec[feats] + deltas, 1.0)
+    return batch
+
+
+def timed(fn, batches):
+    fn(batches[0])  # warm-up
+    start = time.perf_counter()
+    for b in batches:
+        fn(b)
+    return (time.perf_counter() - start) / len(batches) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schools", type=int, default=50)
+    args = parser.parse_args()
+
+    app = server.create_app(watch=False)
+    serving = app.extensions['state_manager'].current
+    model = serving.model
+    names = list(serving.default_rows)[:args.schools]
+    batches = [simulator_batch(serving, n) for n in names]
+    model.predict_per_tree(batches[0])  # sklearn backend: build the exported forest first
+
+    def per_tree_spread(b):
+        per_tree = model.predict_per_tree(b).T
+        return per_tree.mean(axis=1), server.tree_spread(per_tree - per_tree[0])
+
+    def two_passes(b):
+        return model.predict_scaled(b), server.tree_spread(model.predict_per_tree(b).T)
+
+    print(f"backend={model.name} schools={len(names)} rows/batch={len(batches[0])}")
+    plain = timed(model.predict_scaled, batches)
+    for label, fn in (("plain predict", model.predict_scaled),
+                      ("per-tree + spread", per_tree_spread),
+                      ("two passes", two_passes)):
+        ms = timed(fn, batches)
+        print(f"  {label:18s} {ms:7.2f} ms/school  ({ms / plain:4.2f}x)")
+
+    client = app.test_client()
+    for label, flag in (("endpoint", False), ("endpoint + bands", True)):
+        def request(b, i=iter(range(10 ** 9))):
+            # Different school each call so single-flight never shares results
+            client.post('/api/school_profile_full',
+                        json={"school_name": names[next(i) % len(names)], "uncertainty": flag})
+        print(f"  {label:18s} {timed(request, batches):7.2f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Streaming export of a full weighted ranking as CSV or NDJSON.
+
+Scores are rank_schools' weighting (85% rating / 15% log-scaled review count
+within the slice), taken from the prebuilt RankingIndex matrices. Only the
+sort order and the score columns are built up front, a few floats per school.
+The text is encoded EXPORT_CHUNK_ROWS rows at a time as the client reads,
+so the response body never sits in memory and the first bytes go out at once.
+"""
+import csv
+import io
+
+import numpy as np
+
+from ranking import DEFAULT_REVIEW_WEIGHT
+from responses import dumps
+
+EXPORT_CHUNK_ROWS = 500
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+class RankingExport:
+    def __init__(self, ranking, table, features, sort, state=None, review_weight=DEFAULT_REVIEW_WEIGHT):
+        rows = ranking.rows[state]
+        cols = [ranking.features.index(f) for f in features]
+        scores = ((1 - review_weight) * ranking.matrix[state][:, cols]
+                  + review_weight * ranking.reviews[state][:, None])
+
+        # Best first; NaN scores sort last, like rank_schools
+        self.order = np.argsort(-scores[:, features.index(sort)], kind='stable')
+        scores = np.round(scores, 2)
+        self.header = ["rank", "school_name", "state", "number_of_ratings"] + list(features)
+        states = table['state'] if 'state' in table else np.full(table.n_rows, "", dtype=object)
+        ratings = table['number_of_ratings'] if 'number_of_ratings' in table else np.zeros(table.n_rows)
+        self.columns = [ranking.names[rows], states[rows], ratings[rows].astype(np.int64)] + list(scores.T)
+
+    def __len__(self):
+        return self.order.size
+
+    def chunks(self):
+        """Rows as lists, EXPORT_CHUNK_ROWS at a time, best first. NaN becomes None."""
+        for start in range(0, len(self), EXPORT_CHUNK_ROWS):
+            idx = self.order[start:start + EXPORT_CHUNK_ROWS]
+            cols = [range(start + 1, start + idx.size + 1)]
+            for col in self.columns:
+                values = col[idx].tolist()
+                if col.dtype.kind == 'f':
+                    values = [None if v != v else v for v in values]
+                cols.append(values)
+            yield [list(row) for row in zip(*cols)]
+
+    def csv(self):
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        writer.writerow(self.header)
+        for rows in self.chunks():
+            # csv writes None as an empty cell
+            writer.writerows(rows)
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue().encode('utf-8')
+
+    def ndjson(self):
+        for rows in self.chunks():
+            yield b"".join(dumps(dict(zip(self.header, row))) + b"\n" for row in rows)
@@ -0,0 +1,134 @@
+"""
+Portable NumPy copy of the trained pipeline (MinMaxScaler + RandomForest).
+
+train_model.py exports it to forest.npz next to model.pkl. Loading it needs
+only NumPy, so the server can serve predictions without importing pandas or
+scikit-learn. Predictions are identical to `pipe.predict`: inputs are scaled
+with the same float64 arithmetic as MinMaxScaler and compared as float32,
+like scikit-learn's trees.
+"""
+import hashlib
+
+import numpy as np
+
+
+class NumpyForest:
+    def __init__(self, feature, threshold, children_left, children_right, value,
+                 roots, max_depth, scale, offset, feature_names, cover=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        # MinMaxScaler: scaled = raw * scale + offset
+        self.scale = scale
+        self.offset = offset
+        self.feature_names = list(feature_names)
+        # Training samples reaching each node (older exports don't have it)
+        self.cover = cover
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def fingerprint(self):
+        """Hash of the scaler and every tree, to tell which forest derived files were built from."""
+        h = hashlib.sha1()
+        for array in (self.feature, self.threshold, self.children_left, self.children_right,
+                      self.value, self.roots, self.scale, self.offset):
+            h.update(np.ascontiguousarray(array).tobytes())
+        return h.hexdigest()
+
+    # --- EXPORT / IMPORT ---
+
+    @classmethod
+    def from_pipeline(cls, pipe):
+        """Flatten every tree of a fitted pipeline into shared node arrays."""
+        scaler = pipe.named_steps['preprocess'].named_transformers_['num']
+        model = pipe.named_steps['model']
+
+        features, thresholds, lefts, rights, values, covers, roots = [], [], [], [], [], [], []
+        base = 0
+        max_depth = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            left = tree.children_left.astype(np.int32)
+            right = tree.children_right.astype(np.int32)
+            is_leaf = left == -1
+            node_ids = np.arange(n, dtype=np.int32)
+            # Leaves point at themselves, so traversal can run a fixed number
+            # of steps without checking for leaves.
+            lefts.append(np.where(is_leaf, node_ids, left) + base)
+            rights.append(np.where(is_leaf, node_ids, right) + base)
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            values.append(tree.value[:, 0, 0])
+            covers.append(tree.weighted_n_node_samples)
+            roots.append(base)
+            base += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children_left=np.concatenate(lefts),
+            children_right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.int32),
+            max_depth=max_depth,
+            scale=np.asarray(scaler.scale_, dtype=np.float64),
+            offset=np.asarray(scaler.min_, dtype=np.float64),
+            feature_names=scaler.feature_names_in_,
+            cover=np.concatenate(covers),
+        )
+
+    def save(self, path):
+        optional = {"cover": self.cover} if self.cover is not None else {}
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold,
+            children_left=self.children_left, children_right=self.children_right,
+            value=self.value, roots=self.roots, max_depth=self.max_depth,
+            scale=self.scale, offset=self.offset,
+            feature_names=np.array(self.feature_names, dtype=str),
+            **optional,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    # --- SCALING ---
+
+    def transform(self, raw):
+        return np.asarray(raw, dtype=np.float64) * self.scale + self.offset
+
+    def inverse_transform(self, scaled):
+        return (np.asarray(scaled, dtype=np.float64) - self.offset) / self.scale
+
+    # --- PREDICTION ---
+
+    def leaf_indices(self, X_scaled):
+        """Global leaf node reached by every (tree, sample) pair, shape (n_trees, n_samples)."""
+        X = np.asarray(X_scaled, dtype=np.float32)
+        n_samples = X.shape[0]
+        sample_idx = np.broadcast_to(np.arange(n_samples), (self.n_trees, n_samples))
+        nodes = np.repeat(self.roots[:, None], n_samples, axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[sample_idx, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return nodes
+
+    def predict_per_tree(self, X_scaled):
+        """Every tree's prediction, shape (n_trees, n_samples)."""
+        return self.value[self.leaf_indices(X_scaled)]
+
+    def predict_scaled(self, X_scaled):
+        return self.predict_per_tree(X_scaled).mean(axis=0)
+
+    def predict(self, raw):
+        return self.predict_scaled(self.transform(raw))
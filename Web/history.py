@@ -0,0 +1,301 @@
+"""
+Append-only history of the analysis dataset, one snapshot per scrape date.
+
+Every train_model.py run overwrites analysis_dataset.csv; appending it here
+keeps how each school's ratings moved. Storage is columnar and
+delta-encoded: a snapshot stores, per column, only the schools whose value
+differs from the previous snapshot (NaN to NaN is not a change, a school
+that drops out becomes NaN).
+
+Layout:
+    history/
+        catalog.json        <- columns, school names (id = position), each
+                               school's latest state, snapshot dates and,
+                               per column, the change count after each snapshot
+        <column>.ids        <- uint32 school ids of every change, snapshot by snapshot
+        <column>.vals       <- float64 new values, aligned with .ids
+
+Readers memory-map .ids/.vals and only look at the columns they are asked
+about. A school's trend compares its id against the column's change log and
+reads just the values that match; a state's trend replays only its schools'
+changes. Both cost grows with how much changed, not with how many
+snapshots there are, and a snapshot where nothing moved adds ~nothing.
+
+Appends write the column files first and the catalog last (atomic replace).
+Bytes past the catalog's counts are a crashed append: readers ignore them
+and the next append truncates them. One writer at a time.
+
+    python history.py append analysis_dataset.csv --date 2025-01-31
+    python history.py trend --school "Auburn University" --feature happiness
+    python history.py stats
+"""
+import argparse
+import datetime
+import json
+import os
+import threading
+
+import numpy as np
+
+from school_table import TEXT_COLUMNS, SchoolTable
+
+HISTORY_ROOT = os.environ.get("HISTORY_ROOT", "history")
+CATALOG_FILE = "catalog.json"
+ID_DTYPE = np.dtype('<u4')
+VALUE_DTYPE = np.dtype('<f8')
+
+
+class UnknownFeatureError(ValueError):
+    """Raised when a trend asks for a column the history has never stored."""
+
+
+def _empty_catalog():
+    return {"columns": [], "schools": [], "states": [], "dates": [], "ends": {}, "school_id": {}}
+
+
+class HistoryStore:
+    def __init__(self, root=HISTORY_ROOT):
+        self.root = root
+        self._catalog = None
+        self._stamp = None
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    # --- CATALOG ---
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def catalog(self):
+        """Current catalog, re-read only when catalog.json has been replaced."""
+        try:
+            stat = os.stat(self._path(CATALOG_FILE))
+        except FileNotFoundError:
+            return _empty_catalog()
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        with self._lock:
+            if stamp != self._stamp:
+                with open(self._path(CATALOG_FILE), 'r') as f:
+                    catalog = json.load(f)
+                catalog["school_id"] = {name: i for i, name in enumerate(catalog["schools"])}
+                self._catalog, self._stamp, self._maps = catalog, stamp, {}
+            return self._catalog
+
+    def _write_catalog(self, catalog):
+        tmp = self._path(CATALOG_FILE + ".tmp")
+        with open(tmp, 'w') as f:
+            json.dump({k: v for k, v in catalog.items() if k != "school_id"}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(CATALOG_FILE))
+
+    # --- READING ---
+
+    def _column(self, catalog, column):
+        """(ids, values) memory maps of a column's change log, as far as the catalog covers."""
+        n = catalog["ends"][column][-1] if catalog["ends"].get(column) else 0
+        if n == 0:
+            return np.empty(0, dtype=ID_DTYPE), np.empty(0, dtype=VALUE_DTYPE)
+        with self._lock:
+            maps = self._maps.get(column)
+            if maps is None or maps[0].size != n:
+                maps = (np.memmap(self._path(column + ".ids"), dtype=ID_DTYPE, mode='r', shape=(n,)),
+                        np.memmap(self._path(column + ".vals"), dtype=VALUE_DTYPE, mode='r', shape=(n,)))
+                if catalog is self._catalog:
+                    self._maps[column] = maps
+        return maps
+
+    def _features(self, catalog, features):
+        """Requested columns (default all), checked against the catalog."""
+        for column in features or ():
+            if column not in catalog["ends"]:
+                raise UnknownFeatureError(f"Unknown feature: {column}")
+        return features or catalog["columns"]
+
+    def _snapshot_of(self, catalog, column, positions):
+        """Snapshot index of each change position."""
+        return np.searchsorted(catalog["ends"][column], positions, side='right')
+
+    def values_as_of(self, column, date=None, catalog=None):
+        """Every school's value of `column` at the last snapshot on or before `date` (NaN if none)."""
+        catalog = catalog or self.catalog()
+        n_schools = len(catalog["schools"])
+        ends = catalog["ends"].get(column)
+        k = len(catalog["dates"]) if date is None else int(np.searchsorted(catalog["dates"], str(date), side='right'))
+        values = np.full(n_schools, np.nan)
+        if not ends or k == 0:
+            return values
+        ids, vals = self._column(catalog, column)
+        end = ends[k - 1]
+        # Last write per school wins: first occurrence in the reversed log
+        rev_ids = ids[:end][::-1]
+        schools, first = np.unique(rev_ids, return_index=True)
+        values[schools] = vals[:end][::-1][first]
+        return values
+
+    def school_trend(self, school_name, features=None):
+        """{feature: (dates, values)} at the snapshots where the school's value changed, or None."""
+        catalog = self.catalog()
+        sid = catalog["school_id"].get(school_name)
+        if sid is None:
+            return None
+        trends = {}
+        for column in self._features(catalog, features):
+            ids, vals = self._column(catalog, column)
+            pos = np.flatnonzero(ids == sid)
+            snaps = self._snapshot_of(catalog, column, pos)
+            trends[column] = ([catalog["dates"][s] for s in snaps], np.asarray(vals[pos]))
+        return trends
+
+    def state_trend(self, state, features=None):
+        """
+        {feature: (dates, means, counts)} for the schools whose latest state is
+        `state`: plain mean over the schools with a value, at every snapshot
+        where any of them changed. None if the state has no schools.
+        """
+        catalog = self.catalog()
+        members = np.array([s == state for s in catalog["states"]], dtype=bool)
+        if not members.any():
+            return None
+        trends = {}
+        for column in self._features(catalog, features):
+            ids, vals = self._column(catalog, column)
+            pos = np.flatnonzero(members[ids])
+            new = np.asarray(vals[pos])
+            sel_ids = ids[pos]
+            # Value each change replaced: the same school's previous change (NaN before its first)
+            order = np.argsort(sel_ids, kind='stable')
+            old_sorted = np.full(pos.size, np.nan)
+            same = sel_ids[order][1:] == sel_ids[order][:-1]
+            old_sorted[1:][same] = new[order][:-1][same]
+            old = np.empty(pos.size)
+            old[order] = old_sorted
+
+            has_new, has_old = ~np.isnan(new), ~np.isnan(old)
+            d_sum = np.where(has_new, new, 0.0) - np.where(has_old, old, 0.0)
+            d_count = has_new.astype(np.int64) - has_old
+
+            snaps = self._snapshot_of(catalog, column, pos)
+            points, starts = np.unique(snaps, return_index=True)
+            sums = np.cumsum(np.add.reduceat(d_sum, starts)) if pos.size else np.empty(0)
+            counts = np.cumsum(np.add.reduceat(d_count, starts)) if pos.size else np.empty(0, dtype=np.int64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+            trends[column] = ([catalog["dates"][s] for s in points], means, counts)
+        return trends
+
+    # --- WRITING ---
+
+    def append(self, date, table):
+        """Add `table` (a SchoolTable) as the snapshot for `date`, later than every existing one."""
+        date = datetime.date.fromisoformat(str(date)).isoformat()
+        os.makedirs(self.root, exist_ok=True)
+        catalog = self.catalog()
+        catalog = {k: (v.copy() if isinstance(v, (list, dict)) else v) for k, v in catalog.items()}
+        catalog.setdefault("school_id", {})
+        if catalog["dates"] and date <= catalog["dates"][-1]:
+            raise ValueError(f"Snapshot {date} is not after the latest one ({catalog['dates'][-1]})")
+        if 'school_name' not in table:
+            raise ValueError("Snapshot has no school_name column")
+
+        # School ids: first row of a name wins, like SchoolTable.row_of
+        names = table['school_name']
+        states = table['state'] if 'state' in table else np.full(table.n_rows, "", dtype=object)
+        rows = np.array(sorted(table.row_of.values()), dtype=np.int64)
+        for row in rows:
+            name = names[row]
+            if name not in catalog["school_id"]:
+                catalog["school_id"][name] = len(catalog["schools"])
+                catalog["schools"].append(name)
+                catalog["states"].append("")
+            state = states[row]
+            if isinstance(state, str) and state:
+                catalog["states"][catalog["school_id"][name]] = state
+        ids = np.array([catalog["school_id"][names[row]] for row in rows], dtype=np.int64)
+
+        n_prev = len(catalog["dates"])
+        columns = [c for c in table.columns if c not in TEXT_COLUMNS]
+        catalog["columns"] = catalog["columns"] + [c for c in columns if c not in catalog["columns"]]
+        ends = {}
+        changes = 0
+        for column in catalog["columns"]:
+            previous = self.values_as_of(column, catalog=catalog) if column in catalog["ends"] else None
+            prev = np.full(len(catalog["schools"]), np.nan)
+            if previous is not None:
+                prev[:previous.size] = previous
+            cur = np.full(len(catalog["schools"]), np.nan)
+            if column in table:
+                cur[ids] = table[column][rows]
+            changed = np.flatnonzero(~((prev == cur) | (np.isnan(prev) & np.isnan(cur))))
+            column_ends = list(catalog["ends"].get(column, [0] * n_prev))
+            self._append_column(column, column_ends[-1] if column_ends else 0, changed, cur[changed])
+            ends[column] = column_ends + [(column_ends[-1] if column_ends else 0) + int(changed.size)]
+            changes += int(changed.size)
+
+        catalog["ends"] = ends
+        catalog["dates"] = catalog["dates"] + [date]
+        self._write_catalog(catalog)
+        return changes
+
+    def append_csv(self, date, path):
+        return self.append(date, SchoolTable.from_csv(path))
+
+    def _append_column(self, column, committed, ids, values):
+        for suffix, data, dtype in ((".ids", ids, ID_DTYPE), (".vals", values, VALUE_DTYPE)):
+            with open(self._path(column + suffix), 'ab') as f:
+                # Drop anything a crashed append left past the committed end
+                f.truncate(committed * dtype.itemsize)
+                f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+    # --- STATS ---
+
+    def stats(self):
+        catalog = self.catalog()
+        return {
+            "snapshots": len(catalog["dates"]),
+            "first_date": catalog["dates"][0] if catalog["dates"] else None,
+            "last_date": catalog["dates"][-1] if catalog["dates"] else None,
+            "schools": len(catalog["schools"]),
+            "changes": {c: ends[-1] for c, ends in catalog["ends"].items()},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ratings history snapshot store")
+    parser.add_argument("--root", default=HISTORY_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    append = sub.add_parser("append", help="add a CSV (analysis_dataset.csv layout) as a snapshot")
+    append.add_argument("csv")
+    append.add_argument("--date", default=datetime.date.today().isoformat(), help="scrape date, YYYY-MM-DD")
+    trend = sub.add_parser("trend", help="print a school's or state's trend")
+    group = trend.add_mutually_exclusive_group(required=True)
+    group.add_argument("--school")
+    group.add_argument("--state")
+    trend.add_argument("--feature", action="append", help="repeatable; default every column")
+    sub.add_parser("stats", help="snapshot count and stored changes per column")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.root)
+    if args.command == "append":
+        changes = store.append_csv(args.date, args.csv)
+        print(f"Snapshot {args.date}: {changes} changed values stored")
+    elif args.command == "trend":
+        try:
+            if args.school:
+                trends = store.school_trend(args.school, args.feature)
+            else:
+                trends = store.state_trend(args.state, args.feature)
+        except UnknownFeatureError as e:
+            raise SystemExit(str(e))
+        if trends is None:
+            raise SystemExit("Not in the history")
+        for feature, (dates, values, *_) in trends.items():
+            print(feature + ": " + ", ".join(f"{d} {v:.2f}" for d, v in zip(dates, values)))
+    else:
+        print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+2-D interaction surfaces for the simulator: predicted happiness over a grid
+of deltas for two features at once, every other feature held at the school's
+value.
+
+Surfaces come from the forest's leaf boxes (attribution.leaf_boxes), not from
+predicting every grid point. With the rest of x fixed, moving features a and b
+can only reach a leaf whose box already holds x on every other feature. Over
+those leaves
+
+    surface[i, j] = sum value * [a_i inside on a] * [b_j inside on b] / n_trees
+
+which is a single (res x leaves) @ (leaves x res) product per pair. All 28
+pairs of a 21x21 grid take ~25 ms, against ~1.7 s (numpy backend) for the same
+12,348 rows through predict_scaled, and give the same numbers (same float32
+comparisons as the trees). benchmarks/interactions.py checks both.
+
+A pair's interaction strength is how far its surface is from additive:
+surface - (a's sweep + b's sweep - baseline), as an RMS in happiness percent.
+"""
+import threading
+from collections import OrderedDict
+from itertools import combinations
+
+import numpy as np
+
+from attribution import leaf_boxes
+
+DEFAULT_RESOLUTION = 21
+MAX_RESOLUTION = 51
+DEFAULT_MAX_DELTA = 0.5     # scaled units, same range as the simulator's sweep
+CACHE_SCHOOLS = 256         # per-school surfaces kept per serving state
+
+
+class InteractionSurfaces:
+    def __init__(self, forest, numeric_cols, features):
+        self.features = list(features)
+        self.feat_idx = np.array([numeric_cols.index(f) for f in self.features])
+        self.pairs = list(combinations(range(len(self.features)), 2))
+        self.n_trees = forest.n_trees
+        self.lo, self.hi, _, self.value = leaf_boxes(forest)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compute(self, base_vec, deltas):
+        """(surfaces, strengths): (pairs, res, res) predictions and each pair's RMS interaction."""
+        base_vec = np.asarray(base_vec, dtype=np.float64)
+        # Same float32 comparison as the trees themselves
+        x = base_vec.astype(np.float32).astype(np.float64)
+        outside = (x[:, None] <= self.lo) | (x[:, None] > self.hi)
+        n_outside = outside.sum(axis=0)
+
+        # Only leaves that at most two features keep x out of can matter. Each
+        # one's bitmask of those features decides which pairs can reach it.
+        leaves = np.flatnonzero(n_outside <= 2)
+        masks = (1 << np.arange(len(x))) @ outside[:, leaves]
+
+        # Raised in float64 first, as the simulator does; thresholds sit on grid midpoints
+        grid = np.minimum(base_vec[self.feat_idx, None] + deltas, 1.0).astype(np.float32).astype(np.float64)
+
+        res = len(deltas)
+        surfaces = np.empty((len(self.pairs), res, res))
+        for k, (p, q) in enumerate(self.pairs):
+            fa, fb = self.feat_idx[p], self.feat_idx[q]
+            reach = leaves[(masks & ~((1 << fa) | (1 << fb))) == 0]
+            in_a = (grid[p][:, None] > self.lo[fa, reach]) & (grid[p][:, None] <= self.hi[fa, reach])
+            in_b = (grid[q][:, None] > self.lo[fb, reach]) & (grid[q][:, None] <= self.hi[fb, reach])
+            surfaces[k] = (in_a * self.value[reach]) @ in_b.T
+        surfaces /= self.n_trees
+
+        additive = surfaces[:, :, :1] + surfaces[:, :1, :] - surfaces[:, :1, :1]
+        strengths = np.sqrt(((surfaces - additive) ** 2).mean(axis=(1, 2))) * 100
+        return surfaces, strengths
+
+    def for_school(self, key, base_vec, deltas):
+        """compute(), cached per (school, resolution, max delta) key."""
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+        result = self.compute(base_vec, deltas)
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > CACHE_SCHOOLS:
+                self._cache.popitem(last=False)
+        return result
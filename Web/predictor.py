@@ -0,0 +1,101 @@
+"""
+Model backends behind one small interface used by the request handlers:
+
+    transform(raw) / inverse_transform(scaled)   MinMax scaling
+    predict_scaled(X_scaled)                      happiness in [0, 1]
+    predict_per_tree(X_scaled)                    every tree's output, (n_trees, n_samples)
+    predict(raw)
+
+"numpy" serves forest.npz and never imports pandas or scikit-learn.
+"quantized" serves the same forest.npz through bin-code bit-vector lookup
+(quantized.py): identical predictions, several times faster on simulator batches.
+"sklearn" unpickles model.pkl; those imports happen only when it is chosen.
+"auto" (the default) prefers numpy when forest.npz exists.
+"""
+import os
+
+from forest import NumpyForest
+
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "auto")
+
+
+class NumpyPredictor:
+    name = "numpy"
+    # Cost is almost purely per row, so merging calls buys nothing and the
+    # wait would only add latency.
+    batch_window_ms = 0.0
+
+    def __init__(self, forest):
+        self.forest = forest
+        self.transform = forest.transform
+        self.inverse_transform = forest.inverse_transform
+        self.predict_scaled = forest.predict_scaled
+        self.predict_per_tree = forest.predict_per_tree
+        self.predict = forest.predict
+
+
+class QuantizedPredictor(NumpyPredictor):
+    name = "quantized"
+
+    def __init__(self, forest):
+        super().__init__(forest)
+        # Imported here so the other backends never build the bit tables
+        from quantized import QuantizedForest
+        self.quantized = QuantizedForest(forest)
+        self.predict_scaled = self.quantized.predict_scaled
+        self.predict_per_tree = self.quantized.predict_per_tree
+
+    def predict(self, raw):
+        return self.predict_scaled(self.transform(raw))
+
+
+class SklearnPredictor:
+    name = "sklearn"
+    # Each predict pays a fixed joblib dispatch cost; merging concurrent calls pays it once.
+    batch_window_ms = 5.0
+
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.scaler = pipe.named_steps['preprocess'].named_transformers_['num']
+        self.model = pipe.named_steps['model']
+        self._forest = None
+
+    @property
+    def forest(self):
+        # Built on first use by features that need the raw tree arrays
+        if self._forest is None:
+            self._forest = NumpyForest.from_pipeline(self.pipe)
+        return self._forest
+
+    def transform(self, raw):
+        # Same arithmetic as MinMaxScaler.transform, without the DataFrame round trip
+        return raw * self.scaler.scale_ + self.scaler.min_
+
+    def inverse_transform(self, scaled):
+        return (scaled - self.scaler.min_) / self.scaler.scale_
+
+    def predict_scaled(self, X_scaled):
+        return self.model.predict(X_scaled)
+
+    def predict_per_tree(self, X_scaled):
+        # One vectorized pass over the exported trees instead of 500 estimator calls
+        return self.forest.predict_per_tree(X_scaled)
+
+    def predict(self, raw):
+        return self.predict_scaled(self.transform(raw))
+
+
+def load_predictor(path, backend=MODEL_BACKEND):
+    forest_path = os.path.join(path, 'forest.npz')
+    if backend == "auto":
+        backend = "numpy" if os.path.exists(forest_path) else "sklearn"
+
+    if backend == "numpy":
+        return NumpyPredictor(NumpyForest.load(forest_path))
+    if backend == "quantized":
+        return QuantizedPredictor(NumpyForest.load(forest_path))
+    if backend == "sklearn":
+        import pickle
+        with open(os.path.join(path, 'model.pkl'), 'rb') as f:
+            return SklearnPredictor(pickle.load(f))
+    raise ValueError(f"Unknown MODEL_BACKEND '{backend}'")
@@ -0,0 +1,99 @@
+"""
+Multi-feature weighted school ranking.
+
+    score = (1 - review_weight) * sum_f(w_f * rating_f) + review_weight * review_score
+
+Weights are normalized to sum to 1 and every term stays on the 1-5 rating
+scale, so {"safety": 1} with review_weight 0.15 is exactly the weighting used
+by /api/analytics/rank. Review scores are log-scaled within the slice being
+ranked (all schools, or one state), also like /api/analytics/rank.
+
+Everything a query needs is prebuilt: a rating matrix per slice, the
+review-score column per slice, and each state's row indices. A query is one
+matrix-vector product plus an argpartition top-k.
+"""
+import numpy as np
+
+DEFAULT_REVIEW_WEIGHT = 0.15
+
+
+def review_scores(ratings):
+    """Scale review counts to 1.0 - 5.0 on a log scale (all 1.0 if they don't vary)."""
+    if ratings.size and ratings.max() > ratings.min():
+        ratings_log = np.log1p(ratings)
+        r_min, r_max = ratings_log.min(), ratings_log.max()
+        return 1 + 4 * (ratings_log - r_min) / (r_max - r_min)
+    return np.ones_like(ratings, dtype=np.float64)
+
+
+def top_k_indices(scores, k):
+    """Indices of the k largest finite scores, best first."""
+    finite = np.isfinite(scores)
+    if not finite.all():
+        scores = np.where(finite, scores, -np.inf)
+    k = min(k, int(finite.sum()))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(scores.size)
+    return idx[np.argsort(-scores[idx], kind='stable')]
+
+
+class RankingIndex:
+    def __init__(self, table, features):
+        self.features = [f for f in features if f in table]
+        self.names = table['school_name'] if 'school_name' in table else np.empty(0, dtype=object)
+        ratings = table['number_of_ratings'] if 'number_of_ratings' in table else np.zeros(table.n_rows)
+
+        matrix = np.column_stack([table[f] for f in self.features]) if self.features else np.empty((table.n_rows, 0))
+
+        # Row slices: None = all schools, otherwise one per state
+        self.rows = {None: np.arange(table.n_rows)}
+        order = np.argsort(table.state_codes, kind='stable')
+        bounds = np.searchsorted(table.state_codes[order], np.arange(len(table.states) + 1))
+        for code, state in enumerate(table.states):
+            self.rows[state] = order[bounds[code]:bounds[code + 1]]
+
+        # Per-slice copies, column-major so each feature column is contiguous
+        self.matrix = {key: np.asfortranarray(matrix[rows]) for key, rows in self.rows.items()}
+        self.reviews = {key: review_scores(ratings[rows]) for key, rows in self.rows.items()}
+
+    def weight_vector(self, weights):
+        """Validate {feature: weight} and return a normalized vector over self.features."""
+        if not isinstance(weights, dict) or not weights:
+            raise ValueError("weights must be a non-empty object of {feature: weight}")
+        unknown = sorted(set(weights) - set(self.features))
+        if unknown:
+            raise ValueError(f"Unknown features: {', '.join(unknown)}")
+
+        w = np.zeros(len(self.features))
+        for f, value in weights.items():
+            try:
+                w[self.features.index(f)] = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Weight for '{f}' must be a number")
+        if np.any(w < 0) or not np.isfinite(w).all():
+            raise ValueError("Weights must be finite and non-negative")
+        if w.sum() == 0:
+            raise ValueError("At least one weight must be positive")
+        return w / w.sum()
+
+    def scores(self, w, review_weight=DEFAULT_REVIEW_WEIGHT, state=None):
+        """Weighted score of every school in the slice, aligned with self.rows[state]."""
+        # Only weighted columns take part, so a missing rating the user gave
+        # no weight doesn't turn the score into NaN.
+        used = np.flatnonzero(w)
+        matrix = self.matrix[state]
+        if used.size == w.size:
+            feature_part = matrix @ w
+        else:
+            feature_part = matrix[:, used] @ w[used]
+        return (1 - review_weight) * feature_part + review_weight * self.reviews[state]
+
+    def top_k(self, w, review_weight=DEFAULT_REVIEW_WEIGHT, state=None, k=10):
+        """Return (table rows, scores) of the k best schools in the slice, best first."""
+        scores = self.scores(w, review_weight, state)
+        idx = top_k_indices(scores, k)
+        return self.rows[state][idx], scores[idx]
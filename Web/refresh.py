@@ -0,0 +1,188 @@
+"""
+Incremental refresh for train_model.py (--incremental).
+
+refresh_state.json remembers, from the previous run, a content hash per
+row and a profile of every numeric column (range, mean/std and decile
+bins) taken at the last full retrain. The next run compares against it:
+
+    nothing changed              -> leave the artifacts alone
+    drift or too many changes    -> full retrain
+    otherwise                    -> keep the scaler and the existing trees, add
+                                    new ones with warm_start, and rebuild only the
+                                    touched schools' metadata entries
+
+Names repeat (campuses, same-named colleges in one state), so rows are keyed
+by school name, state and how many earlier rows share both (row_keys).
+
+Drift is checked against the last *full* profile, so small daily changes
+that add up still trigger a full retrain eventually. The same is true of a
+forest that has grown past MAX_TREES.
+"""
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+REFRESH_STATE_FILE = "refresh_state.json"
+ROW_KEY_COLUMNS = ("school_name", "state")
+ROW_KEY_SEP = "\x1f"
+
+DRIFT_PSI_THRESHOLD = 0.2         # population stability index, per column
+DRIFT_MEAN_THRESHOLD = 0.25       # mean shift, in reference standard deviations
+MAX_CHANGED_FRACTION = 0.25       # more changed rows than this -> full retrain
+WARM_START_MIN_TREES = 10
+MAX_TREES = 1000
+PROFILE_BINS = 10
+
+
+def _cells(df, cols):
+    return df[cols].astype(object).where(df[cols].notna(), "").astype(str)
+
+
+def row_keys(df):
+    """Identity of every row: name, state and its occurrence among rows sharing both."""
+    cols = [c for c in ROW_KEY_COLUMNS if c in df.columns]
+    cells = _cells(df, cols)
+    occurrence = cells.groupby(cols, sort=False).cumcount().astype(str)
+    return (cells.agg(ROW_KEY_SEP.join, axis=1) + ROW_KEY_SEP + occurrence).tolist()
+
+
+def key_school(key):
+    """School name of a row key."""
+    return key.split(ROW_KEY_SEP, 1)[0]
+
+
+def row_hashes(df):
+    """{row key: content hash of the row}."""
+    cols = sorted(df.columns)
+    text = _cells(df, cols).agg(ROW_KEY_SEP.join, axis=1)
+    return {key: hashlib.blake2b(t.encode(), digest_size=8).hexdigest()
+            for key, t in zip(row_keys(df), text)}
+
+
+def touched_schools(plan):
+    """Names of the schools with a changed, added or removed row."""
+    return {key_school(k) for k in plan["changed"] + plan["added"] + plan["removed"]}
+
+
+def school_defaults(df, target, previous=None, touched=None):
+    """
+    metadata.json's school_defaults: {name: its row without `target`}, the last
+    row winning for repeated names. With `previous`, only the `touched` schools
+    are rebuilt and every other entry is reused.
+    """
+    rebuild = df if previous is None else df[df["school_name"].isin(touched)]
+    rebuilt = {}
+    for _, row in rebuild.iterrows():
+        d = row.to_dict()
+        d.pop(target, None)
+        rebuilt[row["school_name"]] = d
+    return {name: rebuilt[name] if name in rebuilt else previous[name] for name in df["school_name"]}
+
+
+def column_profile(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return None
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, PROFILE_BINS + 1)[1:-1]))
+    return {
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "edges": edges.tolist(),
+        "shares": _bin_shares(values, edges).tolist(),
+    }
+
+
+def _bin_shares(values, edges):
+    counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+    return counts / max(values.size, 1)
+
+
+def psi(expected, actual, eps=1e-4):
+    expected = np.clip(np.asarray(expected, dtype=np.float64), eps, None)
+    actual = np.clip(np.asarray(actual, dtype=np.float64), eps, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def drift_report(profiles, df):
+    """Per-column drift of df against stored profiles: {col: {psi, mean_shift, out_of_range}}."""
+    report = {}
+    for col, ref in profiles.items():
+        if ref is None or col not in df.columns:
+            continue
+        values = np.asarray(df[col], dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            continue
+        shift = abs(values.mean() - ref["mean"]) / ref["std"] if ref["std"] > 0 else 0.0
+        report[col] = {
+            "psi": round(psi(ref["shares"], _bin_shares(values, np.asarray(ref["edges"]))), 4),
+            "mean_shift": round(float(shift), 4),
+            # The scaler was fit on the old range; values outside it need a refit
+            "out_of_range": bool(values.min() < ref["min"] or values.max() > ref["max"]),
+        }
+    return report
+
+
+def load_refresh_state(path=REFRESH_STATE_FILE):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_refresh_state(hashes, profiles, n_trees, full_trees, path=REFRESH_STATE_FILE):
+    state = {"hashes": hashes, "profiles": profiles, "n_trees": n_trees, "full_trees": full_trees}
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def plan_refresh(state, hashes, df, columns, model_columns):
+    """
+    Decide how to refresh. Returns a dict with
+        mode     "none", "warm_start" or "full"
+        reasons  why a full retrain was chosen
+        changed / added / removed   row keys (see touched_schools for names)
+        extra_trees   trees to add for warm_start
+    """
+    plan = {"mode": "full", "reasons": [], "changed": [], "added": [], "removed": [], "extra_trees": 0}
+    if state is None:
+        plan["reasons"].append("no previous refresh state")
+        return plan
+
+    old = state["hashes"]
+    plan["added"] = sorted(set(hashes) - set(old))
+    plan["removed"] = sorted(set(old) - set(hashes))
+    plan["changed"] = sorted(n for n in hashes if n in old and old[n] != hashes[n])
+    touched = len(plan["added"]) + len(plan["removed"]) + len(plan["changed"])
+    if touched == 0:
+        plan["mode"] = "none"
+        return plan
+
+    if list(model_columns) != list(columns):
+        plan["reasons"].append("feature columns changed")
+    fraction = touched / max(len(hashes), 1)
+    if fraction > MAX_CHANGED_FRACTION:
+        plan["reasons"].append(f"{fraction:.0%} of rows changed")
+    for col, d in drift_report(state["profiles"], df).items():
+        if d["out_of_range"]:
+            plan["reasons"].append(f"{col} outside the fitted range")
+        elif d["psi"] > DRIFT_PSI_THRESHOLD or d["mean_shift"] > DRIFT_MEAN_THRESHOLD:
+            plan["reasons"].append(f"{col} drifted (psi {d['psi']}, mean shift {d['mean_shift']})")
+
+    extra = max(WARM_START_MIN_TREES, math.ceil(state["full_trees"] * fraction))
+    if state["n_trees"] + extra > MAX_TREES:
+        plan["reasons"].append(f"forest would exceed {MAX_TREES} trees")
+
+    if not plan["reasons"]:
+        plan["mode"] = "warm_start"
+        plan["extra_trees"] = extra
+    return plan
@@ -0,0 +1,147 @@
+"""
+Response helpers for the JSON API.
+
+Serializes payloads with orjson when it is installed (NumPy scalars and
+arrays are handled natively) and falls back to the stdlib encoder otherwise.
+Bodies are gzip/brotli compressed based on the client's Accept-Encoding.
+"""
+import gzip
+import json
+
+import numpy as np
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves.
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+# --- SERIALIZATION ---
+
+def _default(obj):
+    """Fallback encoder for the stdlib json module."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def round_floats(obj, ndigits):
+    """Recursively round every float (Python or NumPy) in a payload."""
+    if isinstance(obj, float):
+        return round(obj, ndigits)
+    if isinstance(obj, np.floating):
+        return round(float(obj), ndigits)
+    if isinstance(obj, np.ndarray):
+        return np.round(obj, ndigits) if obj.dtype.kind == 'f' else obj
+    if isinstance(obj, dict):
+        return {k: round_floats(v, ndigits) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [round_floats(v, ndigits) for v in obj]
+    return obj
+
+
+def dumps(payload, ndigits=None):
+    """Serialize a payload to UTF-8 JSON bytes."""
+    if ndigits is not None:
+        payload = round_floats(payload, ndigits)
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+# --- COMPRESSION ---
+
+def _accepted_encodings(header):
+    """Parse an Accept-Encoding header into {encoding: q}."""
+    accepted = {}
+    for part in (header or "").split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """Pick the best encoding we support: br, then gzip, else None."""
+    accepted = _accepted_encodings(header)
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def _build_response(body, encoding, status):
+    resp = Response(body, status=status, mimetype='application/json')
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.headers['Vary'] = 'Accept-Encoding'
+    return resp
+
+
+# --- RESPONSES ---
+
+def json_response(payload, status=200, ndigits=None):
+    """
+    Drop-in replacement for jsonify: fast serialization, optional float
+    rounding and compression negotiated from the current request.
+    """
+    body = dumps(payload, ndigits)
+    encoding = None
+    if len(body) >= MIN_COMPRESS_BYTES:
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        body = compress(body, encoding)
+    return _build_response(body, encoding, status)
+
+
+class PrecompressedJSON:
+    """
+    A payload that never changes between requests. It is serialized once and
+    each encoding is compressed once, on first use, then served from memory.
+    """
+
+    def __init__(self, payload, ndigits=None):
+        self._bodies = {None: dumps(payload, ndigits)}
+
+    def _body(self, encoding):
+        if encoding not in self._bodies:
+            self._bodies[encoding] = compress(self._bodies[None], encoding)
+        return self._bodies[encoding]
+
+    def response(self, status=200):
+        encoding = None
+        if len(self._bodies[None]) >= MIN_COMPRESS_BYTES:
+            encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        return _build_response(self._body(encoding), encoding, status)
@@ -0,0 +1,85 @@
+"""
+Column-oriented, pandas-free view of analysis_dataset.csv.
+
+Text columns (school_name, state) are kept as NumPy object arrays and every
+other column as float64 (blank or unparsable cells become NaN). States are
+also encoded as integer codes so per-state aggregates can use np.bincount.
+"""
+import csv
+
+import numpy as np
+
+TEXT_COLUMNS = ("school_name", "state")
+
+
+def _to_float(cell):
+    try:
+        return float(cell)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class SchoolTable:
+    def __init__(self, columns):
+        self.columns = columns
+        self.n_rows = len(next(iter(columns.values()))) if columns else 0
+
+        if 'number_of_ratings' in columns:
+            columns['number_of_ratings'] = np.nan_to_num(columns['number_of_ratings'], nan=0.0)
+
+        if 'state' in columns:
+            states = columns['state']
+            has_state = np.array([isinstance(s, str) and s != "" for s in states], dtype=bool)
+            self.states = sorted(set(states[has_state].tolist()))
+            lookup = {s: i for i, s in enumerate(self.states)}
+            # -1 marks rows without a state; they are left out of state aggregates
+            self.state_codes = np.array([lookup.get(s, -1) if ok else -1 for s, ok in zip(states, has_state)],
+                                        dtype=np.int64)
+        else:
+            self.states = []
+            self.state_codes = np.full(self.n_rows, -1, dtype=np.int64)
+
+        self.row_of = {}
+        if 'school_name' in columns:
+            for i, name in enumerate(columns['school_name']):
+                self.row_of.setdefault(name, i)
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return cls({})
+            cells = [[] for _ in header]
+            for row in reader:
+                for j in range(len(header)):
+                    cells[j].append(row[j] if j < len(row) else "")
+
+        columns = {}
+        for name, values in zip(header, cells):
+            if name in TEXT_COLUMNS:
+                columns[name] = np.array(values, dtype=object)
+            else:
+                columns[name] = np.array([_to_float(v) for v in values], dtype=np.float64)
+        return cls(columns)
+
+    @classmethod
+    def empty(cls):
+        return cls({})
+
+    @property
+    def is_empty(self):
+        return self.n_rows == 0
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def state_rows(self, state):
+        """Row indices of one state (empty if unknown)."""
+        if state not in self.states:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.state_codes == self.states.index(state))
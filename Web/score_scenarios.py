@@ -0,0 +1,219 @@
+"""
+Offline batch scoring of hypothetical schools.
+
+Uses the same model artifact, backend and MinMax scaling as server.py and
+scores rating vectors on a process pool in fixed-size chunks. Results are
+written as each chunk finishes, so memory stays around
+(2 x workers) chunks whatever the input size.
+
+Input is a CSV or Parquet file with one column per model feature (other
+columns are passed through), or a grid generated on the fly:
+
+    python score_scenarios.py scenarios.csv scored.csv
+    python score_scenarios.py scenarios.parquet scored.parquet --workers 8
+    python score_scenarios.py --grid food,social,safety --base-school "Yale University" grid.csv
+
+A grid takes every combination of the listed features from --grid-min to
+--grid-max in --grid-step increments. The other features stay at the base
+school's ratings, or at the median school's when no base school is given.
+Grid rows are generated chunk by chunk and never held in memory all at once.
+
+The output adds `happiness_percent`, on the same scale as the simulator's
+baseline_happiness. Rows with a missing feature get an empty score.
+Parquet needs pyarrow.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from artifacts import ARTIFACT_ROOT, current_version
+from predictor import MODEL_BACKEND, load_predictor
+
+CHUNK_ROWS = 10000        # per task; a 500-tree forest needs ~50 bytes/row/tree while predicting
+SCORE_COLUMN = "happiness_percent"
+
+_model = None
+
+
+# --- WORKERS ---
+
+def _init_worker(path, backend):
+    global _model
+    _model = load_predictor(path, backend)
+    if _model.name == "sklearn":
+        # One process per core already; joblib threads would oversubscribe
+        _model.model.n_jobs = 1
+
+
+def _score(X_raw):
+    scores = np.full(len(X_raw), np.nan)
+    ok = ~np.isnan(X_raw).any(axis=1)
+    if ok.any():
+        scores[ok] = _model.predict(X_raw[ok]) * 100
+    return scores
+
+
+# --- INPUT ---
+
+def read_chunks(path, chunk_rows):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def grid_size(n_varied, lo, hi, step):
+    return len(grid_axis(lo, hi, step)) ** n_varied
+
+
+def grid_axis(lo, hi, step):
+    return np.round(np.arange(lo, hi + step / 2, step), 10)
+
+
+def grid_chunks(features, varied, base, lo, hi, step, chunk_rows):
+    """Every combination of `varied` on the axis grid, other features fixed at `base`."""
+    axis = grid_axis(lo, hi, step)
+    shape = (axis.size,) * len(varied)
+    total = axis.size ** len(varied)
+    cols = [features.index(f) for f in varied]
+    for start in range(0, total, chunk_rows):
+        idx = np.arange(start, min(start + chunk_rows, total))
+        X = np.tile(base, (idx.size, 1))
+        X[:, cols] = axis[np.stack(np.unravel_index(idx, shape), axis=1)]
+        yield pd.DataFrame(X, columns=features)
+
+
+# --- OUTPUT ---
+
+class ResultWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a", header=not os.path.exists(self.path), index=False)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+# --- DRIVER ---
+
+def score(chunks, features, path, output, workers=os.cpu_count() or 1, backend=MODEL_BACKEND, total=None):
+    """Score DataFrame chunks in order with `workers` processes. Returns rows written."""
+    writer = ResultWriter(output)
+    rows = 0
+    start = time.perf_counter()
+
+    def flush(chunk, scores):
+        nonlocal rows
+        chunk = chunk.copy()
+        chunk[SCORE_COLUMN] = scores
+        writer.write(chunk)
+        rows += len(chunk)
+        elapsed = time.perf_counter() - start
+        of = f"/{total}" if total else ""
+        print(f"\r{rows}{of} rows, {rows / elapsed:,.0f} rows/s", end="", file=sys.stderr, flush=True)
+
+    def matrix(chunk):
+        missing = [f for f in features if f not in chunk.columns]
+        if missing:
+            raise SystemExit(f"Input is missing feature columns: {', '.join(missing)}")
+        return chunk[features].to_numpy(dtype=np.float64)
+
+    try:
+        if workers <= 1:
+            _init_worker(path, backend)
+            for chunk in chunks:
+                flush(chunk, _score(matrix(chunk)))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(path, backend)) as pool:
+                # Bounded queue keeps memory flat and output in input order
+                pending = deque()
+                for chunk in chunks:
+                    pending.append((chunk, pool.submit(_score, matrix(chunk))))
+                    if len(pending) >= 2 * workers:
+                        chunk, future = pending.popleft()
+                        flush(chunk, future.result())
+                while pending:
+                    chunk, future = pending.popleft()
+                    flush(chunk, future.result())
+    finally:
+        writer.close()
+        print(file=sys.stderr)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score hypothetical schools with the trained model")
+    parser.add_argument("input", nargs="?", help="CSV or Parquet of scenarios (omit with --grid)")
+    parser.add_argument("output", help="CSV or Parquet to write")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--artifacts", default=ARTIFACT_ROOT, help="artifact root (default: the server's)")
+    parser.add_argument("--backend", default=MODEL_BACKEND)
+    parser.add_argument("--grid", help="comma-separated features to sweep instead of reading an input file")
+    parser.add_argument("--grid-min", type=float, default=1.0)
+    parser.add_argument("--grid-max", type=float, default=5.0)
+    parser.add_argument("--grid-step", type=float, default=0.1)
+    parser.add_argument("--base-school", help="school whose ratings fill the features the grid doesn't vary")
+    args = parser.parse_args()
+
+    version, path = current_version(args.artifacts)
+    with open(os.path.join(path, 'metadata.json'), 'r') as f:
+        metadata = json.load(f)
+    features = metadata["numeric_cols"]
+    print(f"Scoring with artifacts version {version}", file=sys.stderr)
+
+    total = None
+    if args.grid:
+        varied = [f.strip() for f in args.grid.split(",") if f.strip()]
+        unknown = [f for f in varied if f not in features]
+        if unknown:
+            raise SystemExit(f"Unknown features: {', '.join(unknown)} (model features: {', '.join(features)})")
+        defaults = metadata["school_defaults"]
+        if args.base_school:
+            if args.base_school not in defaults:
+                raise SystemExit(f"School not found: {args.base_school}")
+            base = np.array([float(defaults[args.base_school][c]) for c in features])
+        else:
+            base = np.nanmedian([[float(d[c]) for c in features] for d in defaults.values()], axis=0)
+        total = grid_size(len(varied), args.grid_min, args.grid_max, args.grid_step)
+        chunks = grid_chunks(features, varied, base, args.grid_min, args.grid_max, args.grid_step, args.chunk_rows)
+    elif args.input:
+        chunks = read_chunks(args.input, args.chunk_rows)
+    else:
+        parser.error("give an input file or --grid")
+
+    start = time.perf_counter()
+    rows = score(chunks, features, path, args.output, args.workers, args.backend, total)
+    print(f"Wrote {rows} rows to {args.output} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Prebuilt index for the school-name autocomplete.
+
+Three match tiers, best first:
+  1. the normalized name starts with the query      (bisect on a sorted array)
+  2. every query token prefixes some name token     (token posting lists)
+  3. fuzzy trigram overlap, for typos               (trigram posting lists)
+
+Tier 3 works per token: each query token is scored against every distinct
+name token (trigram Dice), a name keeps each query token's best score, and
+the name's score is the mean over query tokens weighted by their length.
+Every query token must resemble some word of the name. So one misspelt word
+in a long name ("harvrd", "adelphy") still matches, and words the name has
+that the query doesn't mention cost nothing.
+
+Within tiers 1 and 2, shorter names rank first; tier 3 ranks by score. School
+ids are assigned in (length, name) order, so sorting ids is the same as
+sorting by rank. Every tier is always counted, so `total` doesn't depend on
+the page asked for.
+"""
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+# Common shorthand users type, e.g. "Univ of Alabama"
+ABBREVIATIONS = {
+    "univ": "university",
+    "coll": "college",
+    "inst": "institute",
+    "intl": "international",
+    "cmty": "community",
+}
+
+MIN_TRIGRAM_SCORE = 0.5        # weighted mean of the query tokens' best Dice
+MIN_TOKEN_SCORE = 0.3          # token pairs below this don't count at all
+
+_NON_ALNUM = re.compile(r"[^a-z0-9 ]+")
+_PREFIX_END = "\uffff"
+
+
+def normalize(text):
+    """Lowercase, strip accents/punctuation, expand abbreviations."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = text.encode("ascii", "ignore").decode("ascii").lower()
+    text = _NON_ALNUM.sub(" ", text.replace("&", " and "))
+    return " ".join(ABBREVIATIONS.get(tok, tok) for tok in text.split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SchoolSearchIndex:
+    def __init__(self, names):
+        # ids follow ranking order: shortest name first, then alphabetical
+        ordered = sorted(set(names), key=lambda n: (len(n), n))
+        self.names = ordered
+        normalized = [normalize(n) for n in ordered]
+
+        # Tier 1: sorted normalized names for bisect prefix lookup
+        pairs = sorted((norm, i) for i, norm in enumerate(normalized))
+        self._sorted_norms = [p[0] for p in pairs]
+        self._sorted_ids = [p[1] for p in pairs]
+
+        # Tier 2: token -> ids, plus a sorted token list for prefix lookup
+        postings = {}
+        for i, norm in enumerate(normalized):
+            for tok in set(norm.split()):
+                postings.setdefault(tok, []).append(i)
+        self._tokens = sorted(postings)
+        self._token_ids = [frozenset(postings[t]) for t in self._tokens]
+
+        # Tier 3: trigram -> name-token array, and name token -> ids (CSR)
+        trigram_counts = np.zeros(len(self._tokens), dtype=np.float64)
+        tri_postings = {}
+        for t, tok in enumerate(self._tokens):
+            grams = trigrams(tok)
+            trigram_counts[t] = len(grams)
+            for g in grams:
+                tri_postings.setdefault(g, []).append(t)
+        self._trigram_counts = trigram_counts
+        self._trigrams = {g: np.array(ts, dtype=np.int32) for g, ts in tri_postings.items()}
+        token_names = [np.array(sorted(postings[t]), dtype=np.int32) for t in self._tokens]
+        self._token_name_ptr = np.concatenate([[0], np.cumsum([a.size for a in token_names])]).astype(np.int64)
+        self._token_names = np.concatenate(token_names) if token_names else np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.names)
+
+    # --- TIERS ---
+
+    def _prefix_ids(self, query):
+        lo = bisect_left(self._sorted_norms, query)
+        hi = bisect_left(self._sorted_norms, query + _PREFIX_END, lo)
+        return self._sorted_ids[lo:hi]
+
+    def _token_prefix_ids(self, tok):
+        lo = bisect_left(self._tokens, tok)
+        hi = bisect_left(self._tokens, tok + _PREFIX_END, lo)
+        if hi - lo == 1:
+            return self._token_ids[lo]
+        return frozenset().union(*self._token_ids[lo:hi])
+
+    def _token_ids_all(self, tokens):
+        # Intersect the rarest posting lists first
+        sets = sorted((self._token_prefix_ids(t) for t in tokens), key=len)
+        result = set(sets[0])
+        for s in sets[1:]:
+            if not result:
+                break
+            result &= s
+        return result
+
+    def _fuzzy_ids(self, tokens, exclude):
+        scores = np.zeros(len(self.names))
+        matched = np.zeros(len(self.names), dtype=np.int64)
+        weights = 0.0
+        for tok in tokens:
+            grams = trigrams(tok)
+            weights += len(grams)
+            postings = [self._trigrams[g] for g in grams if g in self._trigrams]
+            if not postings:
+                continue
+            # Shared trigram count per name token, then the Dice coefficient
+            shared = np.bincount(np.concatenate(postings), minlength=len(self._tokens))
+            dice = 2.0 * shared / (len(grams) + self._trigram_counts)
+            close = np.flatnonzero(dice >= MIN_TOKEN_SCORE)
+            # Best score of this query token in every name holding one of the close tokens
+            starts, ends = self._token_name_ptr[close], self._token_name_ptr[close + 1]
+            names = self._token_names[np.concatenate([np.arange(a, b) for a, b in zip(starts, ends)])
+                                      if close.size else np.empty(0, dtype=np.int64)]
+            best = np.zeros(len(self.names))
+            np.maximum.at(best, names, np.repeat(dice[close], ends - starts))
+            scores += len(grams) * best
+            matched += best > 0
+        scores /= weights
+        # Every query token has to resemble some word of the name
+        candidates = np.flatnonzero((scores >= MIN_TRIGRAM_SCORE) & (matched == len(tokens)))
+        # Stable sort keeps ties in id (rank) order
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [i for i in candidates.tolist() if i not in exclude]
+
+    # --- QUERY ---
+
+    def search(self, query, limit=10, offset=0):
+        """Return (names for the requested page, total number of matches)."""
+        norm = normalize(query)
+        if not norm:
+            return [], 0
+
+        prefix = self._prefix_ids(norm)
+        seen = set(prefix)
+        ranked = sorted(prefix)
+
+        tokens = norm.split()
+        token_hits = self._token_ids_all(tokens) - seen
+        seen |= token_hits
+
+        # Only the ids that can land on the requested page need ordering
+        needed = offset + limit
+        ranked.extend(heapq.nsmallest(max(0, needed - len(ranked)), token_hits))
+
+        # Counted whether or not the page reaches it, so total is the same on every page
+        fuzzy = self._fuzzy_ids(tokens, seen) if len(norm) >= 3 else []
+        total = len(seen) + len(fuzzy)
+        if len(ranked) < needed:
+            ranked.extend(fuzzy)
+
+        page = ranked[offset:offset + limit]
+        return [self.names[i] for i in page], total
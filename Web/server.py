@@ -1,294 +1,738 @@
-from flask import Flask, request, jsonify, render_template
-import pickle
-import pandas as pd
-import numpy as np
-import json
-import os
-import webbrowser
-from threading import Timer
-
-app = Flask(__name__)
-
-# --- 1. LOAD MODEL & METADATA ---
-print("Loading model and metadata...")
-with open('model.pkl', 'rb') as f:
-    pipe = pickle.load(f)
-
-with open('metadata.json', 'r') as f:
-    metadata = json.load(f)
-
-scaler = pipe.named_steps['preprocess'].named_transformers_['num']
-
-# --- 2. LOAD ANALYTICS DATASET ---
-print("Loading analysis dataset...")
-try:
-    if os.path.exists('analysis_dataset.csv'):
-        analytics_df = pd.read_csv('analysis_dataset.csv')
-        
-        if 'number_of_ratings' in analytics_df.columns:
-            analytics_df['number_of_ratings'] = pd.to_numeric(analytics_df['number_of_ratings'], errors='coerce').fillna(0)
-        
-        if 'state' in analytics_df.columns:
-            ALL_STATES = sorted(analytics_df['state'].dropna().unique().tolist())
-        else:
-            ALL_STATES = []
-    else:
-        analytics_df = pd.DataFrame()
-        ALL_STATES = []
-
-except Exception as e:
-    print(f"Error loading analytics data: {e}")
-    analytics_df = pd.DataFrame()
-    ALL_STATES = []
-
-# --- ROUTES ---
-
-@app.route('/')
-def home():
-    return render_template('index.html')
-
-@app.route('/analytics')
-def analytics():
-    return render_template('analytics.html')
-
-# --- ANALYTICS API ---
-
-@app.route('/api/states', methods=['GET'])
-def get_states():
-    return jsonify(ALL_STATES)
-
-@app.route('/api/analytics/rank', methods=['POST'])
-def rank_schools():
-    """
-    Returns:
-    1. Top Schools (Ranked by 85% Quality / 15% Quantity)
-    2. Top States (Ranked by WEIGHTED AVERAGE of schools)
-    """
-    data = request.json
-    state = data.get("state", "All")
-    feature = data.get("feature", "happiness")
-    
-    if analytics_df.empty:
-        return jsonify({"error": "No data available"}), 500
-
-    # --- HELPER: Smart Weighting Function ---
-    def apply_weighting(df, feat_col):
-        ratings = df['number_of_ratings']
-        
-        if not ratings.empty and ratings.max() > ratings.min():
-            ratings_log = np.log1p(ratings)
-            r_min, r_max = ratings_log.min(), ratings_log.max()
-            
-            # SCALE REVIEWS: 1.0 - 5.0
-            scaled_reviews = 1 + 4 * (ratings_log - r_min) / (r_max - r_min)
-        else:
-            scaled_reviews = 1.0 
-        
-        # WEIGHTING: 85% Feature / 15% Reviews
-        return (df[feat_col] * 0.85) + (scaled_reviews * 0.15)
-
-    # ----------------------------------------
-    # 1. GLOBAL STATE RANKING (WEIGHTED AVERAGE)
-    # ----------------------------------------
-    df_global = analytics_df.copy()
-    if feature in df_global.columns:
-        # A. Calculate individual school scores
-        df_global['_weighted_score'] = apply_weighting(df_global, feature)
-        
-        # B. Calculate "Influence Weight" for each school
-        # We use log(reviews) so a school with 10k reviews has more say than one with 10,
-        # but doesn't completely drown it out.
-        df_global['_influence'] = np.log1p(df_global['number_of_ratings'])
-        
-        # C. Calculate Weighted Average per State
-        # Formula: Sum(Score * Influence) / Sum(Influence)
-        def weighted_avg(x):
-            if x['_influence'].sum() == 0:
-                return 0
-            return np.average(x['_weighted_score'], weights=x['_influence'])
-
-        state_stats = df_global.groupby('state').apply(weighted_avg).sort_values(ascending=False).head(10)
-        
-        top_states = [{"state": s, "score": round(v, 2)} for s, v in state_stats.items()]
-    else:
-        top_states = []
-
-    # ----------------------------------------
-    # 2. SCHOOL RANKING
-    # ----------------------------------------
-    df_filtered = analytics_df.copy()
-    
-    if state != "All" and 'state' in df_filtered.columns:
-        df_filtered = df_filtered[df_filtered['state'] == state]
-    
-    if feature not in df_filtered.columns:
-        return jsonify({"top_schools": [], "top_states": [], "distribution": [], "average_score": 0})
-
-    df_filtered['_weighted_score'] = apply_weighting(df_filtered, feature)
-    df_sorted = df_filtered.sort_values(by='_weighted_score', ascending=False)
-    
-    # Display the weighted score
-    df_sorted[feature] = df_sorted['_weighted_score'].round(2)
-    
-    top_schools = df_sorted.head(10)[['school_name', feature]].to_dict(orient='records')
-    
-    # Distribution Data
-    vals = df_sorted[feature]
-    bins = [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.1]
-    labels = ["1.0-1.5", "1.5-2.0", "2.0-2.5", "2.5-3.0", "3.0-3.5", "3.5-4.0", "4.0-4.5", "4.5-5.0"]
-    
-    if not vals.empty:
-        hist_counts = pd.cut(vals, bins=bins, labels=labels, right=False).value_counts().sort_index()
-        counts_list = hist_counts.tolist()
-    else:
-        counts_list = [0] * len(labels)
-    
-    distribution_data = {
-        "labels": labels,
-        "counts": counts_list
-    }
-
-    avg = df_sorted[feature].mean() if not df_sorted.empty else 0
-
-    return jsonify({
-        "top_schools": top_schools,
-        "top_states": top_states, 
-        "distribution": distribution_data,
-        "school_count": len(df_filtered),
-        "average_score": avg
-    })
-
-# --- SIMULATOR API ---
-
-@app.route('/api/metadata', methods=['GET'])
-def get_metadata():
-    return jsonify({
-        "schools": list(metadata["school_defaults"].keys()),
-        "controllable": metadata["controllable_features"]
-    })
-
-@app.route('/api/school_profile_full', methods=['POST'])
-def school_profile_full():
-    data = request.json
-    school_name = data.get("school_name")
-    delta_scaled = float(data.get("delta", 0.2))
-
-    if school_name not in metadata["school_defaults"]:
-        return jsonify({"error": "School not found"}), 404
-
-    base_row_dict = metadata["school_defaults"][school_name].copy()
-    numeric_cols = metadata["numeric_cols"]
-    controllable = metadata["controllable_features"]
-    
-    df_base = pd.DataFrame([base_row_dict])
-    df_base_num = df_base[numeric_cols]
-    base_pred = pipe.predict(df_base_num)[0]
-    
-    raw_numeric = df_base_num.values
-    scaled_numeric = scaler.transform(raw_numeric)
-    base_vec = scaled_numeric.flatten()
-
-    batch_vectors = []
-    meta_info = [] 
-
-    for feat in controllable:
-        idx = numeric_cols.index(feat)
-        current_val = base_vec[idx]
-        new_val = min(current_val + delta_scaled, 1.0)
-        vec = base_vec.copy()
-        vec[idx] = new_val
-        batch_vectors.append(vec)
-        meta_info.append(('ranking', feat))
-
-    steps = list(range(51)) 
-    for d_int in steps:
-        d = d_int / 100.0
-        for feat in controllable:
-            idx = numeric_cols.index(feat)
-            current_val = base_vec[idx]
-            new_val = min(current_val + d, 1.0)
-            vec = base_vec.copy()
-            vec[idx] = new_val
-            batch_vectors.append(vec)
-            meta_info.append(('sweep', feat, d_int))
-
-    batch_np = np.array(batch_vectors)
-    batch_raw = scaler.inverse_transform(batch_np)
-    df_batch = pd.DataFrame(batch_raw, columns=numeric_cols)
-    all_preds = pipe.predict(df_batch)
-
-    rankings_results = []
-    sweep_data = {} 
-    marginal_data = { f: {} for f in controllable }
-
-    for i, info in enumerate(meta_info):
-        pred = all_preds[i]
-        gain = pred - base_pred
-        
-        if info[0] == 'ranking':
-            feat = info[1]
-            idx = numeric_cols.index(feat)
-            new_raw = batch_raw[i, idx]
-            rankings_results.append({
-                "feature": feat,
-                "current_value": base_row_dict[feat],
-                "current_percent": base_vec[idx] * 100, 
-                "new_value": new_raw,
-                "gain": gain,
-                "gain_percent": gain * 100
-            })
-        elif info[0] == 'sweep':
-            feat = info[1]
-            d_int = info[2]
-            if d_int not in sweep_data: sweep_data[d_int] = {"gain": -1, "feat": None}
-            if gain > sweep_data[d_int]["gain"]: sweep_data[d_int] = {"gain": gain, "feat": feat}
-            marginal_data[feat][d_int] = pred
-
-    rankings_results.sort(key=lambda x: x["gain"], reverse=True)
-
-    sweep_results = []
-    for d_int in sorted(sweep_data.keys()):
-        item = sweep_data[d_int]
-        if item["gain"] > 0:
-            sweep_results.append({
-                "delta": d_int,
-                "best_feature": item["feat"],
-                "gain_percent": item["gain"] * 100
-            })
-
-    marginal_results = []
-    for feat in controllable:
-        best_jump = -1
-        best_delta = 0
-        for s in range(1, 51):
-            prev = marginal_data[feat][s-1]
-            curr = marginal_data[feat][s]
-            jump = curr - prev
-            if jump > best_jump:
-                best_jump = jump
-                best_delta = s
-        if best_jump > 0.0001:
-            marginal_results.append({
-                "feature": feat,
-                "optimal_delta": best_delta,
-                "jump_size": best_jump * 100
-            })
-    marginal_results.sort(key=lambda x: x["jump_size"], reverse=True)
-
-    return jsonify({
-        "baseline_happiness": base_pred * 100,
-        "rankings": rankings_results,
-        "sweep": sweep_results,
-        "marginal": marginal_results
-    })
-
-if __name__ == '__main__':
-    from threading import Timer
-    import webbrowser
-
-    if not os.environ.get("WERKZEUG_RUN_MAIN"):
-        def open_browser():
-            webbrowser.open_new('http://127.0.0.1:5000/analytics')
-        Timer(1, open_browser).start()
-
-    app.run(debug=True, port=5000)
\ No newline at end of file
+from flask import Blueprint, Flask, Response, current_app, request, render_template
+import numpy as np
+import hmac
+import os
+
+from batching import SingleFlight
+from export import FORMATS, RankingExport
+from history import HistoryStore, UnknownFeatureError
+from interactions import DEFAULT_MAX_DELTA, DEFAULT_RESOLUTION, MAX_RESOLUTION
+from ranking import DEFAULT_REVIEW_WEIGHT, review_scores
+from responses import json_response
+from serving_state import StateManager
+
+# Run with `python server.py`, `gunicorn "server:create_app()"` or `gunicorn server:app`.
+# The request path only touches NumPy arrays; pandas/scikit-learn are imported
+# only when the sklearn model backend is selected (see predictor.py).
+bp = Blueprint('main', __name__)
+
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+SEARCH_MAX_LIMIT = 50
+
+
+def create_app(state_manager=None, watch=True):
+    app = Flask(__name__)
+
+    # --- 1. LOAD MODEL, METADATA & ANALYTICS DATASET ---
+    # Everything lives on an immutable ServingState; a background watcher swaps in
+    # a new one when a new artifact version is published (see artifacts.py).
+    if state_manager is None:
+        print("Loading model, metadata and analysis dataset...")
+        state_manager = StateManager()
+        state_manager.load_initial()
+    if watch:
+        state_manager.start_watcher()
+
+    app.extensions['state_manager'] = state_manager
+    # Ratings history is appended out of band; the store re-reads its catalog when it changes
+    app.extensions['history'] = HistoryStore()
+    app.register_blueprint(bp)
+    return app
+
+
+def __getattr__(name):
+    # Lets `gunicorn server:app` keep working without building the app at import time
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_state_manager():
+    return current_app.extensions['state_manager']
+
+
+def get_serving():
+    """The ServingState for this request. Read it once and pass it along."""
+    return get_state_manager().current
+
+# --- ROUTES ---
+
+@bp.route('/')
+def home():
+    return render_template('index.html')
+
+@bp.route('/analytics')
+def analytics():
+    return render_template('analytics.html')
+
+# --- ANALYTICS API ---
+
+def apply_weighting(feat_vals, ratings):
+    """Smart weighting: 85% feature / 15% review count, both on a 1-5 scale."""
+    # SCALE REVIEWS: 1.0 - 5.0
+    scaled_reviews = review_scores(ratings)
+
+    # WEIGHTING: 85% Feature / 15% Reviews
+    return (feat_vals * 0.85) + (scaled_reviews * 0.15)
+
+
+def state_weighted_averages(table, scores):
+    """
+    Weighted average score per state, indexed like table.states.
+    We use log(reviews) as the influence weight so a school with 10k reviews has
+    more say than one with 10, but doesn't completely drown it out.
+    Formula: Sum(Score * Influence) / Sum(Influence)
+    """
+    influence = np.log1p(table['number_of_ratings'])
+    has_state = table.state_codes >= 0
+    codes = table.state_codes[has_state]
+    n_states = len(table.states)
+
+    num = np.bincount(codes, weights=(scores * influence)[has_state], minlength=n_states)
+    den = np.bincount(codes, weights=influence[has_state], minlength=n_states)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den == 0, 0.0, num / den)
+
+
+@bp.route('/api/states', methods=['GET'])
+def get_states():
+    return get_serving().states_payload.response()
+
+@bp.route('/api/analytics/rank', methods=['POST'])
+def rank_schools():
+    """
+    Returns:
+    1. Top Schools (Ranked by 85% Quality / 15% Quantity)
+    2. Top States (Ranked by WEIGHTED AVERAGE of schools)
+    """
+    data = request.json
+    state = data.get("state", "All")
+    feature = data.get("feature", "happiness")
+    table = get_serving().analytics
+
+    if table.is_empty:
+        return json_response({"error": "No data available"}, status=500)
+
+    # ----------------------------------------
+    # 1. GLOBAL STATE RANKING (WEIGHTED AVERAGE)
+    # ----------------------------------------
+    if feature in table and table.states:
+        scores = apply_weighting(table[feature], table['number_of_ratings'])
+        state_scores = state_weighted_averages(table, scores)
+        # NaN scores sort last, like pandas
+        order = np.argsort(-state_scores, kind='stable')[:10]
+        top_states = [{"state": table.states[i], "score": round(float(state_scores[i]), 2)} for i in order]
+    else:
+        top_states = []
+
+    # ----------------------------------------
+    # 2. SCHOOL RANKING
+    # ----------------------------------------
+    if state != "All" and 'state' in table:
+        rows = table.state_rows(state)
+    else:
+        rows = np.arange(table.n_rows)
+
+    if feature not in table:
+        return json_response({"top_schools": [], "top_states": [], "distribution": [], "average_score": 0})
+
+    weighted = apply_weighting(table[feature][rows], table['number_of_ratings'][rows])
+    order = np.argsort(-weighted, kind='stable')
+
+    # Display the weighted score
+    display = np.round(weighted, 2)
+    names = table['school_name']
+    top_schools = [{"school_name": names[rows[i]], feature: float(display[i])} for i in order[:10]]
+
+    # Distribution Data
+    bins = [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.1]
+    labels = ["1.0-1.5", "1.5-2.0", "2.0-2.5", "2.5-3.0", "3.0-3.5", "3.5-4.0", "4.0-4.5", "4.5-5.0"]
+
+    vals = display[~np.isnan(display)]
+    counts_list = np.histogram(vals, bins=bins)[0].tolist()
+
+    distribution_data = {
+        "labels": labels,
+        "counts": counts_list
+    }
+
+    avg = float(vals.mean()) if vals.size else 0
+
+    return json_response({
+        "top_schools": top_schools,
+        "top_states": top_states,
+        "distribution": distribution_data,
+        "school_count": int(rows.size),
+        "average_score": avg
+    })
+
+CUSTOM_RANK_MAX_K = 500
+
+@bp.route('/api/analytics/custom_rank', methods=['POST'])
+def custom_rank():
+    """
+    Rank schools by any blend of features, e.g.
+    {"weights": {"safety": 0.5, "food": 0.3, "social": 0.2}, "review_weight": 0.15, "state": "All", "k": 10}
+    """
+    data = request.json or {}
+    state = data.get("state", "All")
+    ranking = get_serving().ranking
+
+    try:
+        w = ranking.weight_vector(data.get("weights"))
+        review_weight = float(data.get("review_weight", DEFAULT_REVIEW_WEIGHT))
+        k = int(data.get("k", 10))
+    except (TypeError, ValueError) as e:
+        return json_response({"error": str(e)}, status=400)
+    if not 0.0 <= review_weight <= 1.0:
+        return json_response({"error": "review_weight must be between 0 and 1"}, status=400)
+    k = min(max(k, 1), CUSTOM_RANK_MAX_K)
+
+    key = None if state == "All" else state
+    if key not in ranking.rows:
+        return json_response({"error": "Unknown state"}, status=404)
+
+    rows, scores = ranking.top_k(w, review_weight, key, k)
+    return json_response({
+        "weights": {f: w[i] for i, f in enumerate(ranking.features) if w[i] > 0},
+        "review_weight": review_weight,
+        "school_count": int(ranking.rows[key].size),
+        "top_schools": [
+            {"school_name": ranking.names[r], "score": round(float(sc), 2)}
+            for r, sc in zip(rows, scores)
+        ]
+    })
+
+@bp.route('/api/analytics/export', methods=['GET'])
+def export_ranking():
+    """
+    Full weighted ranking as a streamed download:
+    ?feature=happiness|<rating>|all&state=All&format=csv|ndjson&sort=happiness
+    "all" exports every rating's score, ranked by `sort`.
+    """
+    feature = request.args.get("feature", "happiness")
+    state = request.args.get("state", "All")
+    fmt = request.args.get("format", "csv")
+    serving = get_serving()
+    ranking = serving.ranking
+
+    if fmt not in FORMATS:
+        return json_response({"error": f"format must be one of: {', '.join(FORMATS)}"}, status=400)
+    if feature == "all":
+        features, sort = ranking.features, request.args.get("sort", "happiness")
+    else:
+        features, sort = [feature], feature
+    if sort not in features or not set(features) <= set(ranking.features):
+        return json_response({"error": "Unknown feature"}, status=400)
+
+    key = None if state == "All" else state
+    if key not in ranking.rows:
+        return json_response({"error": "Unknown state"}, status=404)
+
+    export = RankingExport(ranking, serving.analytics, features, sort, key)
+    body = export.csv() if fmt == "csv" else export.ndjson()
+    resp = Response(body, mimetype=FORMATS[fmt])
+    filename = f"ranking_{feature}_{state}.{fmt}".replace(" ", "_")
+    resp.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    resp.headers['X-Row-Count'] = str(len(export))
+    return resp
+
+STANDING_MAX_NEIGHBOURS = 10
+
+@bp.route('/api/analytics/standing', methods=['GET'])
+def school_standing():
+    """National and in-state rank/percentile of one school for every rating: ?school=&neighbours="""
+    school_name = request.args.get("school", "")
+    neighbours = min(max(request.args.get("neighbours", 2, type=int), 0), STANDING_MAX_NEIGHBOURS)
+    serving = get_serving()
+
+    row = serving.analytics.row_of.get(school_name)
+    if row is None:
+        return json_response({"error": "School not found"}, status=404)
+
+    standing = serving.standings.lookup(row, neighbours=neighbours)
+    standing["school"] = school_name
+    return json_response(standing)
+
+# --- SIMULATOR API ---
+
+@bp.route('/api/school_attribution', methods=['GET'])
+def school_attribution():
+    """Why a school's baseline is what it is: TreeSHAP contribution of each feature, ?school="""
+    school_name = request.args.get("school", "")
+    serving = get_serving()
+
+    row = serving.default_rows.get(school_name)
+    if row is None:
+        return json_response({"error": "School not found"}, status=404)
+
+    attributions = serving.attributions
+    values = attributions.get(school_name) if attributions is not None else None
+    if values is not None:
+        expected = attributions.expected_value
+    else:
+        try:
+            shap = serving.tree_shap
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=503)
+        values = shap.shap_values(serving.model.transform(serving.defaults_raw[row]))[0]
+        expected = shap.expected_value
+
+    numeric_cols = serving.metadata["numeric_cols"]
+    contributions = [
+        {"feature": feat, "value": serving.defaults_raw[row, j], "contribution": values[j] * 100}
+        for j, feat in enumerate(numeric_cols)
+    ]
+    contributions.sort(key=lambda c: abs(c["contribution"]), reverse=True)
+    # expected + sum(contributions) == baseline_happiness
+    return json_response({
+        "school_name": school_name,
+        "baseline_happiness": (expected + values.sum()) * 100,
+        "expected_happiness": expected * 100,
+        "contributions": contributions,
+    })
+
+@bp.route('/api/metadata', methods=['GET'])
+def get_metadata():
+    return get_serving().metadata_payload.response()
+
+@bp.route('/api/schools/search', methods=['GET'])
+def search_schools():
+    query = request.args.get("q", "")
+    limit = min(max(request.args.get("limit", 10, type=int), 1), SEARCH_MAX_LIMIT)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+
+    results, total = get_serving().search_index.search(query, limit=limit, offset=offset)
+    return json_response({
+        "query": query,
+        "results": results,
+        "total": total,
+        "offset": offset,
+        "limit": limit
+    })
+
+SIMILAR_MAX_K = 50
+
+@bp.route('/api/schools/similar', methods=['GET'])
+def similar_schools():
+    """Nearest schools by rating profile: ?school=&k=&state=&ratings_weight="""
+    school_name = request.args.get("school", "")
+    state = request.args.get("state", "All")
+    k = min(max(request.args.get("k", 10, type=int), 1), SIMILAR_MAX_K)
+    ratings_weight = request.args.get("ratings_weight", 0.0, type=float)
+    if not np.isfinite(ratings_weight):
+        return json_response({"error": "ratings_weight must be a finite number"}, status=400)
+    similarity = get_serving().similarity
+
+    if school_name not in similarity.row_of:
+        return json_response({"error": "School not found"}, status=404)
+    key = None if state == "All" else state
+    if key not in similarity.rows:
+        return json_response({"error": "Unknown state"}, status=404)
+
+    results = similarity.query(school_name, k=k, state=key, ratings_weight=ratings_weight)
+    return json_response({
+        "school": school_name,
+        "results": [{"school_name": n, "state": s, "distance": round(d, 4)} for n, s, d in results]
+    })
+
+SWEEP_STEPS = 51  # sweep deltas 0.00 .. 0.50 in scaled units
+
+# Identical simulator requests already being computed share one result
+simulation_flights = SingleFlight()
+
+@bp.route('/api/school_profile_full', methods=['POST'])
+def school_profile_full():
+    serving = get_serving()
+
+    data = request.json or {}
+    school_name = data.get("school_name")
+    try:
+        delta_scaled = float(data.get("delta", 0.2))
+        precision = data.get("precision")
+        precision = int(precision) if precision is not None else None
+    except (TypeError, ValueError):
+        return json_response({"error": "delta and precision must be numbers"}, status=400)
+    if not np.isfinite(delta_scaled):
+        return json_response({"error": "delta must be finite"}, status=400)
+    uncertainty = data.get("uncertainty", False)
+    if not isinstance(uncertainty, bool):
+        return json_response({"error": "uncertainty must be true or false"}, status=400)
+
+    if school_name not in serving.default_rows:
+        return json_response({"error": "School not found"}, status=404)
+
+    payload = simulation_flights.do(
+        (serving.version, school_name, delta_scaled, uncertainty),
+        lambda: simulate_school(serving, school_name, delta_scaled, uncertainty),
+    )
+    return json_response(payload, ndigits=precision)
+
+def tree_spread(per_tree):
+    """Std and 10th/90th percentile across trees for every row of a (rows, trees) array."""
+    p10, p90 = np.percentile(per_tree, [10, 90], axis=1)
+    return per_tree.std(axis=1), p10, p90
+
+def spread_entry(spread, i):
+    std, p10, p90 = spread
+    return {"std": std[i] * 100, "p10": p10[i] * 100, "p90": p90[i] * 100}
+
+def simulate_school(serving, school_name, delta_scaled, uncertainty=False):
+    """
+    Baseline, per-feature rankings, sweep and marginal gains for one school.
+    With `uncertainty`, every figure also gets its spread across the trees.
+    """
+    metadata, model = serving.metadata, serving.model
+    row = serving.default_rows[school_name]
+
+    base_row_dict = metadata["school_defaults"][school_name]
+    numeric_cols = metadata["numeric_cols"]
+    controllable = metadata["controllable_features"]
+    feat_idx = np.array([numeric_cols.index(f) for f in controllable])
+    n_feat = len(controllable)
+
+    base_vec = model.transform(serving.defaults_raw[row])
+
+    # Batch layout: [baseline] + [one 'ranking' row per feature] + [SWEEP_STEPS x features sweep rows]
+    sweep_deltas = np.arange(SWEEP_STEPS) / 100.0
+    deltas = np.concatenate([np.full(n_feat, delta_scaled), np.repeat(sweep_deltas, n_feat)])
+    feats = np.tile(feat_idx, SWEEP_STEPS + 1)
+
+    batch = np.tile(base_vec, (len(deltas) + 1, 1))
+    batch[np.arange(1, len(deltas) + 1), feats] = np.minimum(base_vec[feats] + deltas, 1.0)
+
+    # Concurrent simulator requests share one prediction call
+    if uncertainty:
+        # One per-tree pass; its mean is the usual prediction
+        per_tree = serving.tree_batcher.predict(batch)
+        all_preds = per_tree.mean(axis=1)
+        base_spread = tree_spread(per_tree[:1])
+        # Gains are per-tree differences from that tree's own baseline
+        gain_spread = tree_spread(per_tree - per_tree[0])
+    else:
+        all_preds = serving.batcher.predict(batch)
+    base_pred = all_preds[0]
+    ranking_preds = all_preds[1:n_feat + 1]
+    sweep_preds = all_preds[n_feat + 1:].reshape(SWEEP_STEPS, n_feat)
+
+    # Rankings: gain from raising each feature by `delta`
+    ranking_raw = model.inverse_transform(batch[1:n_feat + 1])
+    rankings_results = []
+    for j, feat in enumerate(controllable):
+        idx = feat_idx[j]
+        gain = ranking_preds[j] - base_pred
+        rankings_results.append({
+            "feature": feat,
+            "current_value": base_row_dict[feat],
+            "current_percent": base_vec[idx] * 100,
+            "new_value": ranking_raw[j, idx],
+            "gain": gain,
+            "gain_percent": gain * 100
+        })
+        if uncertainty:
+            rankings_results[-1]["gain_spread"] = spread_entry(gain_spread, 1 + j)
+    rankings_results.sort(key=lambda x: x["gain"], reverse=True)
+
+    # Sweep: best single feature at each delta
+    sweep_gains = sweep_preds - base_pred
+    best_feat = sweep_gains.argmax(axis=1)
+    sweep_results = []
+    for d_int in range(SWEEP_STEPS):
+        gain = sweep_gains[d_int, best_feat[d_int]]
+        if gain > 0:
+            sweep_results.append({
+                "delta": d_int,
+                "best_feature": controllable[best_feat[d_int]],
+                "gain_percent": gain * 100
+            })
+            if uncertainty:
+                row_idx = 1 + n_feat + d_int * n_feat + best_feat[d_int]
+                sweep_results[-1]["gain_spread"] = spread_entry(gain_spread, row_idx)
+
+    # Marginal: the single step with the biggest jump for each feature
+    jumps = np.diff(sweep_preds, axis=0)
+    best_step = jumps.argmax(axis=0)
+    marginal_results = []
+    for j, feat in enumerate(controllable):
+        best_jump = jumps[best_step[j], j]
+        if best_jump > 0.0001:
+            marginal_results.append({
+                "feature": feat,
+                "optimal_delta": int(best_step[j]) + 1,
+                "jump_size": best_jump * 100
+            })
+    marginal_results.sort(key=lambda x: x["jump_size"], reverse=True)
+
+    result = {
+        "baseline_happiness": base_pred * 100,
+        "rankings": rankings_results,
+        "sweep": sweep_results,
+        "marginal": marginal_results
+    }
+    if uncertainty:
+        result["baseline_spread"] = spread_entry(base_spread, 0)
+    return result
+
+@bp.route('/api/school_interactions', methods=['POST'])
+def school_interactions():
+    """
+    Predicted happiness over a grid of deltas for two features raised together.
+    {"school_name": ..., "features": ["food", "social"], "resolution": 21, "max_delta": 0.5}
+    Without "features", returns the `top` (default 5) most interacting pairs.
+    """
+    serving = get_serving()
+    data = request.json or {}
+    school_name = data.get("school_name")
+    features = data.get("features")
+    try:
+        resolution = int(data.get("resolution", DEFAULT_RESOLUTION))
+        max_delta = float(data.get("max_delta", DEFAULT_MAX_DELTA))
+        top = int(data.get("top", 5))
+        precision = data.get("precision")
+        precision = int(precision) if precision is not None else None
+    except (TypeError, ValueError):
+        return json_response({"error": "resolution, max_delta, top and precision must be numbers"}, status=400)
+    if not np.isfinite(max_delta):
+        return json_response({"error": "max_delta must be finite"}, status=400)
+    resolution = min(max(resolution, 2), MAX_RESOLUTION)
+    max_delta = min(max(max_delta, 0.0), 1.0)
+
+    if school_name not in serving.default_rows:
+        return json_response({"error": "School not found"}, status=404)
+    controllable = serving.metadata["controllable_features"]
+    if features is not None:
+        if (not isinstance(features, list) or len(features) != 2 or features[0] == features[1]
+                or any(f not in controllable for f in features)):
+            return json_response({"error": "features must be two different controllable features"}, status=400)
+
+    return json_response(school_interaction_surfaces(serving, school_name, features, resolution, max_delta, top),
+                         ndigits=precision)
+
+def school_interaction_surfaces(serving, school_name, features, resolution, max_delta, top):
+    """One requested pair, or the `top` pairs by interaction strength, with their surfaces."""
+    model, interactions = serving.model, serving.interactions
+    row = serving.default_rows[school_name]
+    base_vec = model.transform(serving.defaults_raw[row])
+    deltas = np.linspace(0.0, max_delta, resolution)
+
+    # Every pair at once, cached per school
+    surfaces, strengths = interactions.for_school((school_name, resolution, max_delta), base_vec, deltas)
+
+    names = interactions.features
+    if features is not None:
+        pair = tuple(sorted(names.index(f) for f in features))
+        chosen = [interactions.pairs.index(pair)]
+    else:
+        chosen = np.argsort(-strengths, kind='stable')[:min(max(top, 1), len(strengths))]
+
+    # Raw rating each grid delta lands on, per feature
+    grid = np.tile(base_vec, (resolution, 1))
+    grid[:, interactions.feat_idx] = np.minimum(base_vec[interactions.feat_idx] + deltas[:, None], 1.0)
+    values = np.ascontiguousarray(model.inverse_transform(grid).T)
+
+    pairs = []
+    for k in chosen:
+        p, q = interactions.pairs[k]
+        if features is not None and names[p] != features[0]:
+            p, q = q, p
+            surface = np.ascontiguousarray(surfaces[k].T)
+        else:
+            surface = surfaces[k]
+        pairs.append({
+            "features": [names[p], names[q]],
+            "values": {names[p]: values[interactions.feat_idx[p]], names[q]: values[interactions.feat_idx[q]]},
+            "happiness": surface * 100,
+            "interaction_strength": strengths[k],
+        })
+    return {
+        "school_name": school_name,
+        "baseline_happiness": surfaces[0, 0, 0] * 100,
+        "deltas": deltas,
+        "pair_count": len(interactions.pairs),
+        "pairs": pairs,
+    }
+
+STATE_SIMULATION_MAX_K = 50
+
+def baseline_predictions(serving):
+    """Every school's current predicted happiness (scaled 0-1), aligned with defaults_raw."""
+    return serving.model.predict_scaled(serving.model.transform(serving.defaults_raw))
+
+def state_happiness_scores(serving):
+    """rank_schools' weighted happiness per school and per state, plus the influence weights."""
+    table = serving.analytics
+    scores = apply_weighting(table['happiness'], table['number_of_ratings'])
+    return scores, state_weighted_averages(table, scores), np.log1p(table['number_of_ratings'])
+
+@bp.route('/api/analytics/state_simulate', methods=['POST'])
+def state_simulate():
+    """
+    Raise one feature by `delta` (scaled units, like the simulator) at every school in a state:
+    {"state": "California", "feature": "food", "delta": 0.2, "k": 10}
+    """
+    serving = get_serving()
+    data = request.json or {}
+    state = data.get("state")
+    feature = data.get("feature")
+    try:
+        delta_scaled = float(data.get("delta", 0.2))
+        k = int(data.get("k", 10))
+    except (TypeError, ValueError):
+        return json_response({"error": "delta and k must be numbers"}, status=400)
+    if not np.isfinite(delta_scaled):
+        return json_response({"error": "delta must be finite"}, status=400)
+    k = min(max(k, 1), STATE_SIMULATION_MAX_K)
+
+    table = serving.analytics
+    if table.is_empty or 'happiness' not in table:
+        return json_response({"error": "No data available"}, status=500)
+    if feature not in serving.metadata["controllable_features"]:
+        return json_response({"error": f"Unknown feature '{feature}'"}, status=400)
+    if state not in table.states:
+        return json_response({"error": "Unknown state"}, status=404)
+
+    return json_response(simulate_state(serving, state, feature, delta_scaled, k))
+
+def simulate_state(serving, state, feature, delta_scaled, k):
+    """Predicted effect of one intervention on a state's weighted happiness score and rank."""
+    table, model = serving.analytics, serving.model
+    scores, state_scores, influence = serving.cached("state_happiness_scores", state_happiness_scores)
+    base_preds = serving.cached("baseline_predictions", baseline_predictions)
+
+    # The state's rows that the model knows, as analytics rows and defaults rows.
+    # Defaults are keyed by name, so rows sharing a name are one school to the model.
+    rows = table.state_rows(state)
+    row_models = np.array([serving.default_rows.get(n, -1) for n in table['school_name'][rows]], dtype=np.int64)
+    rows, row_models = rows[row_models >= 0], row_models[row_models >= 0]
+    model_rows, school_of_row = np.unique(row_models, return_inverse=True)
+
+    # One batch: every school with the feature raised (capped at the top of the scale)
+    j = serving.metadata["numeric_cols"].index(feature)
+    batch = model.transform(serving.defaults_raw[model_rows])
+    batch[:, j] = np.minimum(batch[:, j] + delta_scaled, 1.0)
+    new_preds = serving.batcher.predict(batch) if len(batch) else np.empty(0)
+    gains = new_preds - base_preds[model_rows]
+
+    # Predicted happiness moves by gain * 4 on the 1-5 scale and review counts don't
+    # change, so each row shifts the state's influence-weighted average by the
+    # amount below; a school's shift is the sum over its rows.
+    code = table.states.index(state)
+    total_influence = influence[table.state_codes == code].sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        row_shifts = np.where(total_influence > 0,
+                              0.85 * 4 * gains[school_of_row] * influence[rows] / total_influence, 0.0)
+    shifts = np.bincount(school_of_row, weights=row_shifts, minlength=model_rows.size)
+    first_row = np.full(model_rows.size, rows.size, dtype=np.int64)
+    np.minimum.at(first_row, school_of_row, np.arange(rows.size))
+    current = state_scores[code]
+    new = current + shifts.sum()
+
+    # Rank among states, 1 = best, as in rank_schools' top_states
+    other_scores = np.delete(state_scores, code)
+    current_rank = int(np.sum(other_scores > current)) + 1
+    new_rank = int(np.sum(other_scores > new)) + 1
+
+    names = table['school_name']
+    order = np.argsort(-gains, kind='stable')[:k]
+    return {
+        "state": state,
+        "feature": feature,
+        "delta": delta_scaled,
+        "school_count": int(model_rows.size),
+        "current_score": round(float(current), 4),
+        "new_score": round(float(new), 4),
+        "score_change": round(float(new - current), 4),
+        "current_rank": current_rank,
+        "new_rank": new_rank,
+        "rank_change": current_rank - new_rank,
+        "state_count": len(table.states),
+        "average_gain_percent": float(gains.mean() * 100) if gains.size else 0.0,
+        "top_beneficiaries": [
+            {
+                "school_name": names[rows[first_row[i]]],
+                "baseline_happiness": base_preds[model_rows[i]] * 100,
+                "new_happiness": new_preds[i] * 100,
+                "gain_percent": gains[i] * 100,
+                "state_score_change": float(shifts[i]),
+            }
+            for i in order
+        ],
+    }
+
+# --- HISTORY API ---
+
+@bp.route('/api/history/trend', methods=['GET'])
+def history_trend():
+    """
+    How a school's or a state's ratings moved across scrape snapshots:
+    ?school=<name> or ?state=<state>, &feature=<f> (repeatable, default all).
+    Each feature lists the dates where its value changed and the value from then on;
+    a state's value is the plain mean over its schools, with how many had one.
+    """
+    school_name = request.args.get("school")
+    state = request.args.get("state")
+    features = request.args.getlist("feature") or None
+    if bool(school_name) == bool(state):
+        return json_response({"error": "Pass exactly one of school or state"}, status=400)
+
+    history = current_app.extensions['history']
+    try:
+        trends = history.school_trend(school_name, features) if school_name else history.state_trend(state, features)
+    except UnknownFeatureError as e:
+        return json_response({"error": str(e)}, status=400)
+    if trends is None:
+        return json_response({"error": "Not found in the ratings history"}, status=404)
+
+    stats = history.stats()
+    payload = {
+        "school_name" if school_name else "state": school_name or state,
+        "snapshots": stats["snapshots"],
+        "first_date": stats["first_date"],
+        "last_date": stats["last_date"],
+        "trends": {},
+    }
+    for feature, (dates, values, *counts) in trends.items():
+        entry = {"dates": dates, "values": values}
+        if counts:
+            entry["school_counts"] = counts[0]
+        payload["trends"][feature] = entry
+    return json_response(payload, ndigits=3)
+
+# --- ADMIN API ---
+
+@bp.route('/api/admin/reload', methods=['POST'])
+def admin_reload():
+    """Ask this worker to load the live artifact version in the background."""
+    token = request.headers.get("X-Admin-Token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return json_response({"error": "Forbidden"}, status=403)
+
+    state_manager = get_state_manager()
+    state_manager.reload_in_background(force=request.args.get("force") == "1")
+    return json_response({
+        "status": "reload scheduled",
+        "serving_version": state_manager.current.version
+    }, status=202)
+
+@bp.route('/api/version', methods=['GET'])
+def get_version():
+    state_manager = get_state_manager()
+    serving = state_manager.current
+    return json_response({
+        "version": serving.version,
+        "backend": serving.model.name,
+        "loaded_at": serving.loaded_at,
+        "last_reload_error": state_manager.last_error
+    })
+
+if __name__ == '__main__':
+    from threading import Timer
+    import webbrowser
+
+    if not os.environ.get("WERKZEUG_RUN_MAIN"):
+        def open_browser():
+            webbrowser.open_new('http://127.0.0.1:5000/analytics')
+        Timer(1, open_browser).start()
+
+    create_app().run(debug=True, port=5000)
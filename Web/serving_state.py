@@ -0,0 +1,275 @@
+"""
+Immutable snapshot of everything a request needs (model, metadata, dataset
+and the payloads/indexes derived from them) plus the manager that swaps it.
+
+Request handlers read `manager.current` once and use that object for the
+whole request, so a reload that lands mid-request never mixes versions.
+Reloads run on a background thread; the swap itself is a single reference
+assignment.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from artifacts import ARTIFACT_ROOT, current_version, fingerprint
+from attribution import PrecomputedAttributions
+from batching import BATCH_WINDOW_MS, MicroBatcher
+from predictor import load_predictor
+from ranking import RankingIndex
+from responses import PrecompressedJSON
+from school_table import SchoolTable
+from search import SchoolSearchIndex
+from standings import StandingsIndex
+
+WATCH_INTERVAL = float(os.environ.get("ARTIFACT_WATCH_INTERVAL", "5"))
+
+
+class ArtifactError(Exception):
+    """Raised when a candidate artifact version fails validation."""
+
+
+@dataclass(frozen=True)
+class ServingState:
+    version: str
+    loaded_at: float
+    model: object                 # NumpyPredictor or SklearnPredictor
+    batcher: MicroBatcher         # coalesces concurrent model.predict_scaled calls
+    tree_batcher: MicroBatcher    # same for model.predict_per_tree, rows x trees
+    metadata: dict
+    default_rows: dict            # school name -> row of defaults_raw
+    defaults_raw: np.ndarray      # (n_schools, n_features) raw ratings, numeric_cols order
+    analytics: SchoolTable
+    ranking: RankingIndex
+    standings: StandingsIndex
+    all_states: list
+    states_payload: PrecompressedJSON
+    metadata_payload: PrecompressedJSON
+    search_index: SchoolSearchIndex
+    attributions: object          # PrecomputedAttributions from train time, or None
+    # Derived, lazily filled caches. A new state starts with an empty dict,
+    # which is how a reload invalidates them.
+    caches: dict = field(default_factory=dict)
+    _cache_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def cached(self, key, build):
+        """Return caches[key], building it once with build(self) on first use."""
+        value = self.caches.get(key)
+        if value is None:
+            with self._cache_lock:
+                value = self.caches.get(key)
+                if value is None:
+                    value = self.caches[key] = build(self)
+        return value
+
+    @property
+    def similarity(self):
+        # Built on first use: it pulls in scipy, which most workers never need
+        return self.cached("similarity", _similarity_index)
+
+    @property
+    def tree_shap(self):
+        # For schools missing from attributions.npz; leaf boxes take ~0.2s to build
+        return self.cached("tree_shap", _tree_shap)
+
+    @property
+    def interactions(self):
+        # Leaf boxes take ~0.2s to build; per-school surfaces are cached inside
+        return self.cached("interactions", _interactions)
+
+
+# --- LOADING ---
+
+def _load_analytics(path):
+    csv_path = os.path.join(path, 'analysis_dataset.csv')
+    if not os.path.exists(csv_path):
+        return SchoolTable.empty()
+    return SchoolTable.from_csv(csv_path)
+
+
+def _defaults_matrix(metadata):
+    numeric_cols = metadata["numeric_cols"]
+    names = list(metadata["school_defaults"].keys())
+    defaults_raw = np.array(
+        [[float(metadata["school_defaults"][n][c]) for c in numeric_cols] for n in names],
+        dtype=np.float64,
+    )
+    return {n: i for i, n in enumerate(names)}, defaults_raw
+
+
+def _similarity_index(state):
+    from similarity import SimilarityIndex
+
+    defaults = state.metadata["school_defaults"]
+    names = list(defaults.keys())
+    return SimilarityIndex(
+        names=names,
+        states=[defaults[n].get("state") for n in names],
+        features_scaled=state.model.transform(state.defaults_raw),
+        ratings=[float(defaults[n].get("number_of_ratings") or 0) for n in names],
+    )
+
+
+def _tree_shap(state):
+    from attribution import TreeShap
+
+    return TreeShap(state.model.forest)
+
+
+def _interactions(state):
+    from interactions import InteractionSurfaces
+
+    metadata = state.metadata
+    return InteractionSurfaces(state.model.forest, metadata["numeric_cols"], metadata["controllable_features"])
+
+
+def _load_attributions(path, metadata, model):
+    attr_path = os.path.join(path, 'attributions.npz')
+    if not os.path.exists(attr_path):
+        return None
+    attributions = PrecomputedAttributions.load(attr_path)
+    # Stale file from another model (or too old to tell): compute on demand instead
+    if attributions.feature_names != metadata["numeric_cols"]:
+        return None
+    forest = model.forest
+    if attributions.n_trees != forest.n_trees or attributions.forest_fingerprint != forest.fingerprint():
+        print(f"Ignoring {attr_path}: not computed for this model")
+        return None
+    return attributions
+
+
+def _validate(model, metadata):
+    for key in ("numeric_cols", "controllable_features", "school_defaults"):
+        if key not in metadata:
+            raise ArtifactError(f"metadata.json is missing '{key}'")
+    if not metadata["school_defaults"]:
+        raise ArtifactError("metadata.json has no schools")
+
+    # Smoke-predict one school to catch feature mismatches before going live
+    numeric_cols = metadata["numeric_cols"]
+    sample = next(iter(metadata["school_defaults"].values()))
+    try:
+        pred = model.predict(np.array([[float(sample[c]) for c in numeric_cols]]))
+    except Exception as e:
+        raise ArtifactError(f"Model failed a smoke prediction: {e}")
+    if not np.all(np.isfinite(pred)):
+        raise ArtifactError("model.pkl produced a non-finite prediction")
+
+
+def load_state(version, path):
+    """Load and validate one artifact version. Raises ArtifactError on failure."""
+    try:
+        model = load_predictor(path)
+        with open(os.path.join(path, 'metadata.json'), 'r') as f:
+            metadata = json.load(f)
+    except Exception as e:
+        raise ArtifactError(f"Could not read artifacts for version {version}: {e}")
+
+    _validate(model, metadata)
+
+    try:
+        default_rows, defaults_raw = _defaults_matrix(metadata)
+        analytics = _load_analytics(path)
+        ranking = RankingIndex(analytics, metadata["numeric_cols"] + ["happiness"])
+        attributions = _load_attributions(path, metadata, model)
+    except Exception as e:
+        raise ArtifactError(f"Could not load school data for version {version}: {e}")
+
+    window_ms = float(BATCH_WINDOW_MS) if BATCH_WINDOW_MS else model.batch_window_ms
+    return ServingState(
+        version=version,
+        loaded_at=time.time(),
+        model=model,
+        batcher=MicroBatcher(model.predict_scaled, window_ms=window_ms),
+        # Transposed so results split by row like plain predictions
+        tree_batcher=MicroBatcher(lambda X: model.predict_per_tree(X).T, window_ms=window_ms),
+        metadata=metadata,
+        default_rows=default_rows,
+        defaults_raw=defaults_raw,
+        analytics=analytics,
+        ranking=ranking,
+        standings=StandingsIndex(analytics, ranking),
+        all_states=analytics.states,
+        states_payload=PrecompressedJSON(analytics.states),
+        metadata_payload=PrecompressedJSON({
+            "school_count": len(metadata["school_defaults"]),
+            "controllable": metadata["controllable_features"],
+            "version": version,
+            "backend": model.name
+        }),
+        search_index=SchoolSearchIndex(metadata["school_defaults"].keys()),
+        attributions=attributions,
+    )
+
+
+# --- HOT RELOAD ---
+
+class StateManager:
+    def __init__(self, root=ARTIFACT_ROOT):
+        self.root = root
+        self._state = None
+        self._fingerprint = None
+        self._reload_lock = threading.Lock()
+        self.last_error = None
+
+    @property
+    def current(self):
+        return self._state
+
+    def load_initial(self):
+        """Blocking load used once at startup."""
+        self._fingerprint = fingerprint(self.root)
+        version, path = current_version(self.root)
+        self._state = load_state(version, path)
+        print(f"Serving artifacts version {version}")
+        return self._state
+
+    def reload(self, force=False):
+        """
+        Load the live version and swap it in if it validates. Concurrent calls
+        return immediately instead of loading the same version twice.
+        Returns True if a new state was swapped in.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            fp = fingerprint(self.root)
+            if not force and fp == self._fingerprint:
+                return False
+            version, path = current_version(self.root)
+            try:
+                new_state = load_state(version, path)
+            except ArtifactError as e:
+                # Keep serving the old version; remember the fingerprint so a
+                # broken version is not retried on every poll.
+                self.last_error = str(e)
+                self._fingerprint = fp
+                print(f"Reload of version {version} rejected: {e}")
+                return False
+            self._state = new_state
+            self._fingerprint = fp
+            self.last_error = None
+            print(f"Hot-reloaded artifacts version {version}")
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self, force=False):
+        threading.Thread(target=self.reload, kwargs={"force": force}, daemon=True).start()
+
+    def start_watcher(self, interval=WATCH_INTERVAL):
+        """Poll the artifact directory and reload when CURRENT changes."""
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Artifact watcher error: {e}")
+
+        thread = threading.Thread(target=watch, name="artifact-watcher", daemon=True)
+        thread.start()
+        return thread
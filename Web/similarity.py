@@ -0,0 +1,81 @@
+"""
+"Schools like this one": k nearest neighbours over the scaled rating vectors.
+
+Each school is a point in the model's MinMax-scaled feature space (0-1 per
+rating). Optionally the log review count, also scaled to 0-1, is added as
+one more dimension multiplied by `ratings_weight`.
+
+KD-trees for the national set and for every state are built together, once
+per serving state (on the first similarity request, so workers that never
+serve one don't import scipy). Trees for a non-zero ratings_weight are built on first
+use and cached; the weight is snapped to a 0.05 grid so the cache stays small.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+WEIGHT_STEP = 0.05
+MAX_RATINGS_WEIGHT = 1.0
+
+
+def snap_weight(weight):
+    weight = float(weight)
+    if not np.isfinite(weight):
+        raise ValueError("ratings_weight must be finite")
+    weight = min(max(weight, 0.0), MAX_RATINGS_WEIGHT)
+    return round(round(weight / WEIGHT_STEP) * WEIGHT_STEP, 2)
+
+
+class SimilarityIndex:
+    def __init__(self, names, states, features_scaled, ratings):
+        self.names = np.asarray(names, dtype=object)
+        self.states = np.asarray(states, dtype=object)
+        self.features = np.asarray(features_scaled, dtype=np.float64)
+        self.row_of = {n: i for i, n in enumerate(names)}
+
+        log_ratings = np.log1p(np.nan_to_num(np.asarray(ratings, dtype=np.float64)))
+        spread = log_ratings.max() - log_ratings.min() if log_ratings.size else 0.0
+        self.ratings_scaled = (log_ratings - log_ratings.min()) / spread if spread > 0 else np.zeros_like(log_ratings)
+
+        # None = all schools, otherwise one row set per state
+        self.rows = {None: np.arange(len(self.names))}
+        for state in sorted({s for s in self.states if isinstance(s, str) and s}):
+            self.rows[state] = np.flatnonzero(self.states == state)
+
+        self._trees = {}
+        for key in self.rows:
+            self._tree(key, 0.0)
+
+    def _points(self, rows, weight):
+        if weight == 0.0:
+            return self.features[rows]
+        return np.column_stack([self.features[rows], weight * self.ratings_scaled[rows]])
+
+    def _tree(self, state, weight):
+        key = (state, weight)
+        tree = self._trees.get(key)
+        if tree is None:
+            # A concurrent first use may build the same tree twice; both are identical
+            tree = self._trees[key] = cKDTree(self._points(self.rows[state], weight))
+        return tree
+
+    def query(self, name, k=10, state=None, ratings_weight=0.0):
+        """Return [(name, state, distance)] of the k nearest schools, excluding `name`."""
+        weight = snap_weight(ratings_weight)
+        rows = self.rows[state]
+        if rows.size == 0:
+            return []
+        row = self.row_of[name]
+        point = self._points(np.array([row]), weight)[0]
+
+        # Ask for one extra in case the school itself is in the candidate set
+        n = min(k + 1, rows.size)
+        dist, idx = self._tree(state, weight).query(point, k=n)
+        dist, idx = np.atleast_1d(dist), np.atleast_1d(idx)
+
+        results = []
+        for d, i in zip(dist, idx):
+            r = rows[i]
+            if r == row:
+                continue
+            results.append((self.names[r], self.states[r], float(d)))
+        return results[:k]
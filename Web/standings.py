@@ -0,0 +1,88 @@
+"""
+"Where does my school stand?" lookups.
+
+For every slice (all schools, and each state) and every metric (each rating,
+plus its rank_schools-style weighted score) the values are sorted once when
+the serving state loads. A lookup is a binary search for the school's value
+plus a position lookup for its neighbours, so no per-request scans.
+
+rank       1 = best; ties share the better rank
+percentile share of schools in the slice scoring at or below this school
+"""
+import numpy as np
+
+from ranking import DEFAULT_REVIEW_WEIGHT
+
+
+class _SortedMetric:
+    __slots__ = ("values", "rows", "position")
+
+    def __init__(self, slice_values, slice_rows):
+        valid = np.flatnonzero(~np.isnan(slice_values))
+        order = valid[np.argsort(slice_values[valid], kind='stable')]
+        self.values = slice_values[order]                     # ascending
+        self.rows = slice_rows[order]                         # table rows, same order
+        # index within the slice -> index into values (-1 when the value is missing)
+        self.position = np.full(slice_values.size, -1, dtype=np.int64)
+        self.position[order] = np.arange(order.size)
+
+
+class StandingsIndex:
+    def __init__(self, table, ranking):
+        self.names = ranking.names
+        self.features = list(ranking.features)
+        self.state_codes = table.state_codes
+        self.states = table.states
+
+        # table row -> index within its state's slice
+        self.index_in_state = np.full(table.n_rows, -1, dtype=np.int64)
+        for state, rows in ranking.rows.items():
+            if state is not None:
+                self.index_in_state[rows] = np.arange(rows.size)
+
+        # metrics[(kind, feature)][slice] -> _SortedMetric, kind is "rating" or "weighted"
+        self.metrics = {}
+        for j, feat in enumerate(self.features):
+            rating_slices, weighted_slices = {}, {}
+            for key, rows in ranking.rows.items():
+                ratings = ranking.matrix[key][:, j]
+                weighted = (1 - DEFAULT_REVIEW_WEIGHT) * ratings + DEFAULT_REVIEW_WEIGHT * ranking.reviews[key]
+                rating_slices[key] = _SortedMetric(ratings, rows)
+                weighted_slices[key] = _SortedMetric(weighted, rows)
+            self.metrics[("rating", feat)] = rating_slices
+            self.metrics[("weighted", feat)] = weighted_slices
+
+    def _entries(self, metric, positions):
+        return [{"school_name": self.names[metric.rows[p]], "value": round(float(metric.values[p]), 3)}
+                for p in positions]
+
+    def _standing(self, metric, index, neighbours):
+        pos = metric.position[index]
+        if pos < 0:
+            return None
+        n = metric.values.size
+        value = metric.values[pos]
+        at_or_below = int(np.searchsorted(metric.values, value, side='right'))
+        return {
+            "value": round(float(value), 3),
+            "rank": n - at_or_below + 1,
+            "percentile": round(100.0 * at_or_below / n, 1),
+            "out_of": n,
+            # Nearest first in both lists
+            "above": self._entries(metric, range(pos + 1, min(pos + 1 + neighbours, n))),
+            "below": self._entries(metric, range(pos - 1, max(pos - neighbours, 0) - 1, -1)),
+        }
+
+    def lookup(self, row, neighbours=2):
+        """National and in-state standing of one table row for every metric."""
+        code = self.state_codes[row]
+        state = self.states[code] if code >= 0 else None
+        result = {"state": state, "ratings": {}, "weighted": {}}
+        for (kind, feat), slices in self.metrics.items():
+            group = "ratings" if kind == "rating" else "weighted"
+            result[group][feat] = {
+                "national": self._standing(slices[None], row, neighbours),
+                "state": (self._standing(slices[state], self.index_in_state[row], neighbours)
+                          if state is not None else None),
+            }
+        return result
@@ -15,8 +15,8 @@ async function init() {
     const response = await fetch('/api/metadata');
     const meta = await response.json();
     
-    // 2. Setup Components
-    setupAutocomplete(document.getElementById("school-search"), meta.schools.sort());
+    // 2. Setup Components (school names are searched server-side)
+    setupAutocomplete(document.getElementById("school-search"));
 
     const deltaInput = document.getElementById('delta-input');
     const deltaSlider = document.getElementById('delta-slider');
@@ -323,35 +323,44 @@ function getFeatureColorMap() {
     };
 }
 
-function setupAutocomplete(inp, arr) {
-    let currentFocus;
+function setupAutocomplete(inp) {
+    let searchTimer;
+    let latestQuery = "";
     inp.addEventListener("input", function(e) {
         let val = this.value;
+        latestQuery = val;
+        clearTimeout(searchTimer);
+        if (!val) {
+            closeAllLists();
+            return false;
+        }
+        searchTimer = setTimeout(async () => {
+            const res = await fetch(`/api/schools/search?q=${encodeURIComponent(val)}&limit=6`);
+            const data = await res.json();
+            // Ignore responses for queries the user has already typed past
+            if (val !== latestQuery) return;
+            renderSuggestions(data.results);
+        }, 150);
+    });
+    function renderSuggestions(names) {
         closeAllLists();
-        if (!val) return false;
         let a = document.createElement("DIV");
         a.setAttribute("id", "autocomplete-list");
         a.setAttribute("class", "autocomplete-items");
-        this.parentNode.appendChild(a);
-        let count = 0;
-        for (let i = 0; i < arr.length; i++) {
-            if (arr[i].toUpperCase().includes(val.toUpperCase())) {
-                if (count > 5) break;
-                let b = document.createElement("DIV");
-                b.innerHTML = arr[i];
-                b.innerHTML += "<input type='hidden' value='" + arr[i] + "'>";
-                b.addEventListener("click", function(e) {
-                    loadSchool(this.getElementsByTagName("input")[0].value);
-                    closeAllLists();
-                });
-                a.appendChild(b);
-                count++;
-            }
-        }
-    });
+        inp.parentNode.appendChild(a);
+        names.forEach(name => {
+            let b = document.createElement("DIV");
+            b.innerText = name;
+            b.addEventListener("click", function(e) {
+                loadSchool(name);
+                closeAllLists();
+            });
+            a.appendChild(b);
+        });
+    }
     function closeAllLists(elmnt) {
         var x = document.getElementsByClassName("autocomplete-items");
-        for (var i = 0; i < x.length; i++) {
+        for (var i = x.length - 1; i >= 0; i--) {
             if (elmnt != x[i] && elmnt != inp) x[i].parentNode.removeChild(x[i]);
         }
     }
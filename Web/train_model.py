@@ -2,11 +2,26 @@ import pandas as pd
 import numpy as np
 import pickle
 import json
+import os
+import sys
+from artifacts import publish_artifacts
+from attribution import PrecomputedAttributions
+from forest import NumpyForest
+from history import HistoryStore
+from refresh import (column_profile, load_refresh_state, plan_refresh, row_hashes, save_refresh_state,
+                     school_defaults, touched_schools)
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.pipeline import Pipeline
 from sklearn.ensemble import RandomForestRegressor
 
+# --incremental: rebuild only what changed since the last run (see refresh.py)
+INCREMENTAL = "--incremental" in sys.argv
+# --attributions: precompute every school's TreeSHAP (minutes); without it the server computes them per request
+ATTRIBUTIONS = "--attributions" in sys.argv
+# --snapshot-date=YYYY-MM-DD: scrape date the ratings history snapshot is filed under (default today)
+SNAPSHOT_DATE = next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--snapshot-date=")), None)
+
 # 1. Load Data
 try:
     df_raw = pd.read_csv('C:\\Users\\willm\\Desktop\\college_biz\\Data\\final_school_data.csv')
@@ -30,21 +45,8 @@ drop_cols = [
 existing_drop_cols = [c for c in drop_cols if c in df_raw.columns]
 df_raw = df_raw.drop(columns=existing_drop_cols)
 
-# --- SAVE ANALYTICS DATASET (100% RAW) ---
-print("Saving analysis_dataset.csv (Raw)...")
-df_raw.to_csv('analysis_dataset.csv', index=False)
-
-# --- SAVE METADATA (100% RAW) ---
-print("Saving metadata.json (Raw)...")
-school_data = {}
 target = "happiness"
 
-for index, row in df_raw.iterrows():
-    s_name = row["school_name"]
-    d = row.to_dict()
-    if target in d: del d[target]
-    school_data[s_name] = d
-
 # Prepare Data for Model Training
 df_train = df_raw.copy()
 
@@ -58,17 +60,98 @@ y = df_train[target]
 
 numeric_cols = X.select_dtypes(include=[np.number]).columns.tolist()
 
+# 3. Decide how much to rebuild
+hashes = row_hashes(df_raw)
+refresh_state = None
+previous_metadata = None
+if INCREMENTAL:
+    refresh_state = load_refresh_state()
+    try:
+        with open('metadata.json', 'r') as f:
+            previous_metadata = json.load(f)
+    except FileNotFoundError:
+        pass
+    model_cols = previous_metadata["numeric_cols"] if previous_metadata else []
+    plan = plan_refresh(refresh_state, hashes, df_raw, numeric_cols, model_cols)
+    if plan["mode"] == "warm_start" and (previous_metadata is None or not os.path.exists('model.pkl')):
+        plan.update(mode="full", reasons=["previous model.pkl/metadata.json not found"])
+else:
+    plan = {"mode": "full", "reasons": ["full run"], "changed": [], "added": [], "removed": [], "extra_trees": 0}
+touched = touched_schools(plan)
+
+if plan["mode"] == "none":
+    print("No schools changed since the last run; artifacts left as they are.")
+    exit()
+if INCREMENTAL:
+    print(f"Rows changed: {len(plan['changed'])}, added: {len(plan['added'])}, removed: {len(plan['removed'])} "
+          f"({len(touched)} schools)")
+if plan["mode"] == "full":
+    print(f"Full retrain ({'; '.join(plan['reasons'])})")
+else:
+    print(f"Warm start: adding {plan['extra_trees']} trees")
+
+# --- SAVE ANALYTICS DATASET (100% RAW) ---
+print("Saving analysis_dataset.csv (Raw)...")
+df_raw.to_csv('analysis_dataset.csv', index=False)
+
+# --- SAVE METADATA (100% RAW) ---
+print("Saving metadata.json (Raw)...")
+# On a warm start only the entries of schools with a touched row are rebuilt
+if plan["mode"] == "warm_start":
+    school_data = school_defaults(df_raw, target, previous_metadata["school_defaults"], touched)
+else:
+    school_data = school_defaults(df_raw, target)
+
 # 4. Train Model
-preprocessor = ColumnTransformer(transformers=[("num", MinMaxScaler(), numeric_cols)])
-rf_model = RandomForestRegressor(n_estimators=500, max_depth=10, min_samples_leaf=4, random_state=42, n_jobs=-1)
-pipe = Pipeline([("preprocess", preprocessor), ("model", rf_model)])
-pipe.fit(X, y)
+if plan["mode"] == "warm_start":
+    # Keep the fitted scaler and every existing tree; new trees learn the current data
+    with open('model.pkl', 'rb') as f:
+        pipe = pickle.load(f)
+    rf_model = pipe.named_steps['model']
+    rf_model.set_params(warm_start=True, n_estimators=len(rf_model.estimators_) + plan["extra_trees"])
+    rf_model.fit(pipe.named_steps['preprocess'].transform(X), y)
+    rf_model.set_params(warm_start=False)
+    full_trees = refresh_state["full_trees"]
+    profiles = refresh_state["profiles"]
+else:
+    preprocessor = ColumnTransformer(transformers=[("num", MinMaxScaler(), numeric_cols)])
+    rf_model = RandomForestRegressor(n_estimators=500, max_depth=10, min_samples_leaf=4, random_state=42, n_jobs=-1)
+    pipe = Pipeline([("preprocess", preprocessor), ("model", rf_model)])
+    pipe.fit(X, y)
+    full_trees = rf_model.n_estimators
+    # Drift reference for later incremental runs
+    profiles = {c: column_profile(df_raw[c]) for c in numeric_cols + [target]}
 
 # 5. Save Model
 print("Saving model.pkl...")
 with open('model.pkl', 'wb') as f:
     pickle.dump(pipe, f)
 
+# NumPy copy of the pipeline so the server can predict without pandas/sklearn
+print("Saving forest.npz...")
+forest = NumpyForest.from_pipeline(pipe)
+forest.save('forest.npz')
+
+# Every school's TreeSHAP attributions, so /api/school_attribution is a lookup
+if ATTRIBUTIONS:
+    print("Saving attributions.npz...")
+    attr_names = list(school_data)
+    attr_X = np.array([[float(school_data[n][c]) for c in numeric_cols] for n in attr_names])
+    previous_attributions = None
+    if plan["mode"] == "warm_start" and os.path.exists('attributions.npz'):
+        previous_attributions = PrecomputedAttributions.load('attributions.npz')
+    if (previous_attributions is not None and previous_attributions.n_trees == refresh_state["n_trees"]
+            and previous_attributions.feature_names == numeric_cols):
+        # Warm start: only the new trees, plus full TreeSHAP for touched schools
+        attributions = PrecomputedAttributions.extend(previous_attributions, forest, attr_names, attr_X,
+                                                      recompute=touched)
+    else:
+        attributions = PrecomputedAttributions.compute(forest, attr_names, attr_X)
+    attributions.save('attributions.npz')
+elif os.path.exists('attributions.npz'):
+    # Don't publish attributions of the previous model alongside this one
+    os.remove('attributions.npz')
+
 # Extract states for dropdown
 states = sorted(df_raw['state'].dropna().unique().tolist())
 
@@ -82,4 +165,18 @@ metadata = {
 with open('metadata.json', 'w') as f:
     json.dump(metadata, f)
 
+# 6. Publish a versioned copy; running servers pick it up without a restart
+version = publish_artifacts()
+print(f"Published artifacts version {version}")
+
+save_refresh_state(hashes, profiles, len(rf_model.estimators_), full_trees)
+
+# 7. Keep the ratings history (history.py); only changed values are stored
+snapshot_date = SNAPSHOT_DATE or pd.Timestamp.today().date().isoformat()
+try:
+    changes = HistoryStore().append_csv(snapshot_date, 'analysis_dataset.csv')
+    print(f"History snapshot {snapshot_date}: {changes} changed values")
+except ValueError as e:
+    print(f"History snapshot skipped: {e}")
+
 print("Done. 'number_of_ratings' preserved.")
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Adaptive concurrency limit (AIMD) for bs4_scrape.py's requests to NCES.
+
+Every request takes a slot with `acquire()` and gives it back with
+`release(started, status, retry_after)`. The limit moves like TCP's
+congestion window:
+
+* healthy response   limit += 1 / limit, so about +1 per limit's worth of requests
+* 429 / 5xx / error  limit *= DECREASE_FACTOR, at most once per congestion event
+  (requests that started before the last cut don't cut again)
+* latency spike      same cut, when a response takes LATENCY_SPIKE x the
+                     baseline: a low percentile (BASELINE_PERCENTILE) of the
+                     last BASELINE_WINDOW latencies of the same request kind
+* 429 / 503          also pause every new request for Retry-After seconds
+                     (DEFAULT_PAUSE when the header is missing)
+
+Each kind of request (bs4_scrape.py: "search" and "detail" pages) keeps its
+own baseline, since the pages differ in size and server work. Every
+response's latency goes into its kind's window, spikes included, so one
+unusually fast response only holds the baseline down until the window moves
+past it, and a server that really got slower becomes the new baseline.
+
+Throughput then settles just under what the server sustains instead of
+stalling in fixed exponential backoff. stub_nces_server.py serves throttled
+responses locally to try it out.
+"""
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+MIN_LIMIT = 1
+MAX_LIMIT = 16
+INITIAL_LIMIT = 2
+DECREASE_FACTOR = 0.5
+LATENCY_SPIKE = 3.0         # latency / baseline treated as overload
+BASELINE_WINDOW = 100       # recent latencies per request kind
+BASELINE_PERCENTILE = 0.1   # of that window, taken as the unloaded latency
+BASELINE_MIN_SAMPLES = 10   # no latency cuts for a kind until it has this many
+DEFAULT_PAUSE = 5.0         # seconds, 429/503 without Retry-After
+MAX_PAUSE = 120.0
+
+OVERLOAD_STATUSES = {429, 500, 502, 503, 504}
+PAUSE_STATUSES = {429, 503}
+
+
+def retry_after_seconds(value) -> float | None:
+    """Retry-After header (delta-seconds or HTTP date) -> seconds, None if absent/invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AIMDLimiter:
+    def __init__(self, initial: float = INITIAL_LIMIT, min_limit: float = MIN_LIMIT,
+                 max_limit: float = MAX_LIMIT, on_cut=None):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latencies = {}         # request kind -> recent latencies, seconds
+        self.on_cut = on_cut        # called as on_cut(reason, new_limit)
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """Block until a slot is free and no pause is active. Returns the start time."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now >= self.paused_until and self.in_flight < int(self.limit):
+                    break
+                self._cond.wait(self.paused_until - now if now < self.paused_until else None)
+            self.in_flight += 1
+            return now
+
+    def baseline(self, kind: str = None) -> float | None:
+        """Unloaded latency estimate for a request kind, None until it has enough samples."""
+        window = self.latencies.get(kind)
+        if window is None or len(window) < BASELINE_MIN_SAMPLES:
+            return None
+        return sorted(window)[int(len(window) * BASELINE_PERCENTILE)]
+
+    def release(self, started: float, status: int = None, retry_after: float = None, kind: str = None):
+        """
+        Give the slot back. `status` is None when the request got no response;
+        `kind` picks the latency baseline the response is compared against.
+        """
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self.in_flight -= 1
+            if status is None or status in OVERLOAD_STATUSES:
+                self._cut(started, now, f"http_{status}" if status else "error")
+                if status in PAUSE_STATUSES:
+                    pause = DEFAULT_PAUSE if retry_after is None else retry_after
+                    self.paused_until = max(self.paused_until, now + min(pause, MAX_PAUSE))
+            else:
+                baseline = self.baseline(kind)
+                self.latencies.setdefault(kind, deque(maxlen=BASELINE_WINDOW)).append(latency)
+                if baseline is not None and latency > LATENCY_SPIKE * baseline:
+                    self._cut(started, now, "latency")
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _cut(self, started, now, reason):
+        # Requests already in flight when the limit was cut saw the old load;
+        # letting each of them cut again would collapse the limit to the floor
+        if started < self._last_cut:
+            return
+        self._last_cut = now
+        self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+        if self.on_cut:
+            self.on_cut(reason, self.limit)
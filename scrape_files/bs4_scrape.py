@@ -8,6 +8,11 @@ from urllib.parse import urlparse, parse_qs
 import time
 import os
 import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aimd import MAX_LIMIT, OVERLOAD_STATUSES, PAUSE_STATUSES, AIMDLimiter, retry_after_seconds
+from telemetry import RunTelemetry
 
 BASE_URL = "https://nces.ed.gov/collegenavigator/"
 
@@ -23,13 +28,15 @@ session.headers.update(
     }
 )
 
+# urllib3 only retries failed connections; throttling (429/5xx) and timeouts go
+# back to safe_get so the limiter sees them
 retry_strategy = Retry(
-    total=5,             # total retry attempts
-    connect=5,
-    read=5,
-    backoff_factor=2.0,  # 0, 2, 4, 8, 16... seconds between retries
-    status_forcelist=[429, 500, 502, 503, 504],
+    total=3,
+    connect=3,
+    read=0,
+    backoff_factor=0.5,
     allowed_methods=["HEAD", "GET", "OPTIONS", "GET"],
+    respect_retry_after_header=False,
     raise_on_status=False,
 )
 
@@ -37,20 +44,75 @@ adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=20, pool_maxs
 session.mount("https://", adapter)
 session.mount("http://", adapter)
 
+MAX_ATTEMPTS = 6            # per URL, including the first
+RETRY_BACKOFF = 1.0         # seconds, doubled per attempt when no Retry-After pause applies
+
+telemetry = RunTelemetry("bs4_scrape")
+
+
+def _on_cut(reason, limit):
+    telemetry.count(f"limit_cut_{reason}")
+    print(f"[THROTTLE] {reason}: concurrency limit -> {int(limit)}")
+
+
+limiter = AIMDLimiter(on_cut=_on_cut)
+
+
+def _record_response(resp, *args, **kwargs):
+    """Session hook: status code plus how many connection retries urllib3 needed."""
+    telemetry.count(f"http_{resp.status_code}")
+    retries = getattr(resp.raw, "retries", None)
+    if retries is not None and retries.history:
+        telemetry.count("connect_retries", len(retries.history))
 
-def safe_get(url: str, timeout: int = 60):
+
+session.hooks["response"].append(_record_response)
+
+
+def safe_get(url: str, timeout: int = 60, kind: str = None):
     """
-    Single-call GET using the global session with built-in retry/backoff.
+    GET through the global session, gated by the adaptive concurrency limiter.
+    `kind` ("search" or "detail") picks the limiter's latency baseline.
+    Retries 429/5xx and network errors up to MAX_ATTEMPTS times.
     Returns response or None if all retries fail.
     """
-    try:
-        resp = session.get(url, timeout=timeout)
-        resp.raise_for_status()
-        return resp
-    except requests.exceptions.RequestException as e:
-        print(f"[ERROR] Failed to fetch URL after retries: {url}")
-        print(f"        {type(e).__name__}: {e}")
-        return None
+    error = None
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt:
+            telemetry.count("retries")
+        resp = None
+        started = limiter.acquire()
+        try:
+            with telemetry.stage("fetch"):
+                resp = session.get(url, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            error = e
+        finally:
+            limiter.release(
+                started,
+                resp.status_code if resp is not None else None,
+                retry_after_seconds(resp.headers.get("Retry-After")) if resp is not None else None,
+                kind,
+            )
+
+        if resp is not None:
+            if resp.status_code not in OVERLOAD_STATUSES:
+                try:
+                    resp.raise_for_status()
+                    return resp
+                except requests.exceptions.HTTPError as e:
+                    error = e
+                    break
+            error = requests.exceptions.HTTPError(f"{resp.status_code} for url: {url}", response=resp)
+            if resp.status_code in PAUSE_STATUSES:
+                # The limiter holds every request back until Retry-After has passed
+                continue
+        time.sleep(RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.0))
+
+    telemetry.count("fetch_failed")
+    print(f"[ERROR] Failed to fetch URL after retries: {url}")
+    print(f"        {type(error).__name__}: {error}")
+    return None
 
 
 # helper functions
@@ -89,11 +151,16 @@ def get_table_value(soup: BeautifulSoup, label_text: str):
 # search results scraper
 
 def extract_all_school_data_bs(search_url: str):
-    resp = safe_get(search_url, timeout=60)
+    resp = safe_get(search_url, timeout=60, kind="search")
     if resp is None:
         return []
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    with telemetry.stage("parse"):
+        return _parse_search_results(resp.text)
+
+
+def _parse_search_results(html: str):
+    soup = BeautifulSoup(html, "html.parser")
 
     results = []
     table = soup.find("table", id="ctl00_cphCollegeNavBody_ucResultsMain_tblResults")
@@ -143,7 +210,7 @@ def extract_all_school_data_bs(search_url: str):
 
 
 def extract_school_details(school_url: str):
-    resp = safe_get(school_url, timeout=60)
+    resp = safe_get(school_url, timeout=60, kind="detail")
     # if request fails, return a dictionary of Nones which pandas will turn into N/A
     if resp is None:
         return {
@@ -161,7 +228,12 @@ def extract_school_details(school_url: str):
             "total_expenses_out_state": None,
         }
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    with telemetry.stage("parse"):
+        return _parse_school_details(resp.text)
+
+
+def _parse_school_details(html: str):
+    soup = BeautifulSoup(html, "html.parser")
 
     # campus setting
     campus_setting_raw = get_srb_value(soup, "Campus setting:")
@@ -353,6 +425,61 @@ def extract_school_details(school_url: str):
     }
 
 
+def scrape_row(idx, row, total: int) -> dict:
+    """Search NCES for one school_ratings.csv row and scrape its details page."""
+    school_name = row["school_name"]
+    city = row["city"]
+    state = row["state"]
+
+    search_url = f"{BASE_URL}?q={school_name}"
+    results = extract_all_school_data_bs(search_url)
+
+    # try to find a match where the city matches (state ignored)
+    match = next(
+        (r for r in results if match_city_state(r, city, state)),
+        None,
+    )
+
+    # 2. if no city match is found AND there is exactly one result, use that
+    if not match and len(results) == 1:
+        match = results[0]
+
+    telemetry.count("matched" if match else "no_match")
+    if match:
+        print(
+            f"[INFO] {idx+1}/{total} Scraping {school_name} ({city}, {state})"
+        )
+        details = extract_school_details(match["url"])
+    else:
+        print(
+            f"[WARN] {idx+1}/{total} No match found for {school_name} ({city}, {state})"
+        )
+        # if no match, populate details with Nones
+        details = {
+            "campus_setting_raw": None,
+            "student_population_total": None,
+            "student_population_undergrad": None,
+            "student_to_faculty_ratio": None,
+            "retention_rate_avg": None,
+            "acceptance_rate": None,
+            "sat_median_total": None,
+            "act_median_composite": None,
+            "grad_rate_4yr": None,
+            "avg_aid_awarded": None,
+            "total_expenses_in_state": None,
+            "total_expenses_out_state": None,
+        }
+
+    # merge original school info + scraped details
+    row_out = {
+        "school_name": school_name,
+        "city": city,
+        "state": state,
+    }
+    row_out.update(details)
+    return row_out
+
+
 # main – csv driven
 
 if __name__ == "__main__":
@@ -364,70 +491,36 @@ if __name__ == "__main__":
         os.remove(output_file)
 
     total = len(df)
-
-    for idx, row in df.iterrows():
-        school_name = row["school_name"]
-        city = row["city"]
-        state = row["state"]
-
-        search_url = f"{BASE_URL}?q={school_name}"
-        results = extract_all_school_data_bs(search_url)
-
-        # try to find a match where the city matches (state ignored)
-        match = next(
-            (r for r in results if match_city_state(r, city, state)),
-            None,
-        )
-
-        # 2. if no city match is found AND there is exactly one result, use that
-        if not match and len(results) == 1:
-            match = results[0]
-
-        if match:
-            print(
-                f"[INFO] {idx+1}/{total} Scraping {school_name} ({city}, {state})"
-            )
-            details = extract_school_details(match["url"])
-        else:
-            print(
-                f"[WARN] {idx+1}/{total} No match found for {school_name} ({city}, {state})"
-            )
-            # if no match, populate details with Nones
-            details = {
-                "campus_setting_raw": None,
-                "student_population_total": None,
-                "student_population_undergrad": None,
-                "student_to_faculty_ratio": None,
-                "retention_rate_avg": None,
-                "acceptance_rate": None,
-                "sat_median_total": None,
-                "act_median_composite": None,
-                "grad_rate_4yr": None,
-                "avg_aid_awarded": None,
-                "total_expenses_in_state": None,
-                "total_expenses_out_state": None,
-            }
-
-        # merge original school info + scraped details
-        row_out = {
-            "school_name": school_name,
-            "city": city,
-            "state": state,
-        }
-        row_out.update(details)
-
-        # append this single row to CSV
-        row_df = pd.DataFrame([row_out])
-        write_header = idx == 0
-        row_df.to_csv(
-            output_file,
-            mode="a",
-            header=write_header,
-            index=False,
-            na_rep="N/A",
-        )
-
-        # small random delay to reduce throttling / timeouts
-        time.sleep(random.uniform(0.3, 1.0))
-
+    telemetry.start(total)
+
+    # Rows run on MAX_LIMIT threads; the limiter decides how many requests are
+    # actually in flight. Rows are written back in input order.
+    with ThreadPoolExecutor(max_workers=MAX_LIMIT) as pool:
+        pending = deque()
+        rows = df.iterrows()
+        while True:
+            for idx, row in rows:
+                pending.append((idx, pool.submit(scrape_row, idx, row, total)))
+                if len(pending) >= 4 * MAX_LIMIT:
+                    break
+            if not pending:
+                break
+            idx, future = pending.popleft()
+            row_out = future.result()
+
+            # append this single row to CSV
+            with telemetry.stage("write"):
+                row_df = pd.DataFrame([row_out])
+                write_header = idx == 0
+                row_df.to_csv(
+                    output_file,
+                    mode="a",
+                    header=write_header,
+                    index=False,
+                    na_rep="N/A",
+                )
+
+            telemetry.item_done()
+
+    telemetry.finish()
     print(f"\n[DONE] Streamed all rows to {output_file}")
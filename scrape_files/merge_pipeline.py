@@ -0,0 +1,599 @@
+"""
+Merge + clean stage: school_ratings.csv + school_numeric.csv -> final_school_data.csv
+
+Scripted version of clean_data.ipynb. Both scraper outputs are read in
+chunks, "N/A" style values become NaN and states are normalized to their
+two-letter code ("City, ST", "ST" and full names all work), then the two sides
+are hash-joined on (school name, city, state). When a key repeats on either
+side, its last row wins: the scrapers append, so that is the newest scrape.
+The cleaning rules are the
+notebook's, applied chunk by chunk, and the output has a fixed column
+order and dtypes (OUTPUT_SCHEMA), with rows sorted by join key.
+
+Reruns are incremental. Every input row gets a content hash, and
+merge_cache.csv keeps the cleaned result of each joined row next to the
+hashes it was built from. Rows whose hashes are unchanged are copied from
+the cache, so only new or changed rows go through the cleaning rules. This
+covers a partial scrape that was resumed, or a few schools re-scraped.
+
+Missing values are then imputed like the notebook does (IterativeImputer).
+That step fits on the whole table, so it is re-run whenever anything
+changed, or skipped with --no-impute. <output>.manifest.json records the
+options the output was written with, so changing them rewrites it too.
+
+Usage (from the folder holding the scraper outputs):
+    python merge_pipeline.py
+    python merge_pipeline.py --full            # ignore the cache
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import us
+
+
+RATINGS_FILE = "school_ratings.csv"
+NUMERIC_FILE = "school_numeric.csv"
+OUTPUT_FILE = "final_school_data.csv"
+CACHE_FILE = "merge_cache.csv"
+MANIFEST_SUFFIX = ".manifest.json"
+CHUNK_SIZE = 2000
+
+# Bump when the cleaning rules change so cached rows are rebuilt
+CLEANING_VERSION = "1"
+
+NA_VALUES = ["N/A", "n/a", "NA", "None", "none", "null", "-", "--", ""]
+
+RATING_COLUMNS = [
+    "facilities",
+    "location",
+    "happiness",
+    "opportunities",
+    "clubs",
+    "social",
+    "safety",
+    "reputation",
+    "food",
+    "internet",
+]
+
+# NCES metrics; a school with none of them is dropped
+METRIC_COLUMNS = [
+    "campus_setting_raw",
+    "student_population_total",
+    "student_to_faculty_ratio",
+    "retention_rate_avg",
+    "acceptance_rate",
+    "sat_median_total",
+    "act_median_composite",
+    "grad_rate_4yr",
+    "avg_aid_awarded",
+    "total_expenses_in_state",
+    "total_expenses_out_state",
+]
+
+# Same columns clean_data.ipynb averages when overall_rating is 0
+OVERALL_FALLBACK_COLUMNS = ["number_of_ratings"] + RATING_COLUMNS
+
+CAMPUS_SETTING_MAPPING = {"Large": 2, "Midsize": 1, "Small": 0}
+MAX_STUDENT_POPULATION = 110000
+EXCLUDED_STATES = ["Guam", "Puerto Rico"]
+
+# column -> dtype, in output order. Floats are rounded to 1 decimal for
+# ratings and 2 for everything else.
+OUTPUT_SCHEMA = {
+    "rmp_school_id": "Int64",
+    "school_name": "string",
+    "city": "string",
+    "state": "string",
+    "overall_rating": "float64",
+    "number_of_ratings": "Int64",
+    **{col: "float64" for col in RATING_COLUMNS},
+    "student_population_total": "Int64",
+    "student_to_faculty_ratio": "Int64",
+    "retention_rate_avg": "Int64",
+    "acceptance_rate": "Int64",
+    "sat_median_total": "float64",
+    "act_median_composite": "float64",
+    "grad_rate_4yr": "Int64",
+    "avg_aid_awarded": "float64",
+    "total_expenses_in_state": "float64",
+    "total_expenses_out_state": "float64",
+    "campus_setting": "Int64",
+}
+
+# Upper limits applied after imputation
+CAPPING_LIMITS = {
+    "retention_rate_avg": 100.0,
+    "acceptance_rate": 100.0,
+    "grad_rate_4yr": 100.0,
+    "act_median_composite": 36.0,
+    "sat_median_total": 1600.0,
+    **{col: 5.0 for col in RATING_COLUMNS},
+}
+
+# Cache bookkeeping columns
+KEY_COL, HASH_COL, DROPPED_COL = "_key", "_hash", "_dropped"
+
+# Schools scraped without a city/state (filled in by hand in clean_data.ipynb)
+CITY_STATE_CORRECTIONS = {
+    'Alice Lloyd College': 'Pippa Passes, Kentucky',
+    'Appalachian State University': 'Boone, North Carolina',
+    'Baylor College of Medicine': 'Houston, Texas',
+    'California Institute of the Arts': 'Santa Clarita, California',
+    'St. Catherine University': 'St. Paul, Minnesota',
+    'Covenant College': 'Lookout Mountain, Georgia',
+    'Earlham College': 'Richmond, Indiana',
+    'Eastern Michigan University': 'Ypsilanti, Michigan',
+    'Goldey-Beacom College': 'Wilmington, Delaware',
+    'Kentucky State University': 'Frankfort, Kentucky',
+    'Langston University': 'Langston, Oklahoma',
+    'Lassen Community College': 'Susanville, California',
+    'Mars Hill University': 'Mars Hill, North Carolina',
+    'Monmouth College': 'Monmouth, Illinois',
+    'New England Institute of Technology': 'East Greenwich, Rhode Island',
+    'Peru State College': 'Peru, Nebraska',
+    'Purdue University Northwest': 'Hammond, Indiana',
+    'St. Thomas University': 'Miami Gardens, Florida',
+    'Salish Kootenai College': 'Pablo, Montana',
+    'Savannah College of Art and Design': 'Savannah, Georgia',
+    'Schreiner University': 'Kerrville, Texas',
+    'Spring Arbor University': 'Spring Arbor, Michigan',
+    'SUNY Cortland': 'Cortland, New York',
+    'SUNY Oswego': 'Oswego, New York',
+    'Stevens Institute of Technology': 'Hoboken, New Jersey',
+    'Stillman College': 'Tuscaloosa, Alabama',
+    "Texas Woman's University": 'Denton, Texas',
+    'University of Central Oklahoma': 'Edmond, Oklahoma',
+    'Florida State University': 'Tallahassee, Florida',
+    'Beacon College': 'Leesburg, Florida',
+    'Somerset Community College': 'Somerset, Kentucky',
+    'University of Memphis': 'Memphis, Tennessee',
+    'The University of Tennessee Health Science Center': 'Memphis, Tennessee',
+    'University of Tampa': 'Tampa, Florida',
+    'Central New Mexico Community College': 'Albuquerque, New Mexico',
+    'Allan Hancock College': 'Santa Maria, California',
+    'Ashland Community College': 'Ashland, Kentucky',
+    'Bevill State Community College': 'Sumiton, Alabama',
+    'Butte College': 'Oroville, California',
+    'Central Wyoming College': 'Riverton, Wyoming',
+    'Clinton Community College': 'Plattsburgh, New York',
+    'Colby Community College': 'Colby, Kansas',
+    'College of the Siskiyous': 'Weed, California',
+    'Columbia State Community College': 'Columbia, Tennessee',
+    'Community College of Baltimore County - Dundalk': 'Baltimore, Maryland',
+    'Crafton Hills College': 'Yucaipa, California',
+    'Cowley County Community College': 'Arkansas City, Kansas',
+    'Dallas Institute of Funeral Service': 'Dallas, Texas',
+    'Dakota County Technical College': 'Rosemount, Minnesota',
+    'East Arkansas Community College': 'Forrest City, Arkansas',
+    'Eastern Arizona College': 'Thatcher, Arizona',
+    'Florida Southwestern State College': 'Fort Myers, Florida',
+    'Pinnacle Career Institute': 'Kansas City, Missouri',
+    'Enterprise State Community College': 'Enterprise, Alabama',
+    'ETI Technical College of Niles': 'Niles, Ohio',
+    'Garden City Community College': 'Garden City, Kansas',
+    'Gupton Jones College of Funeral Service': 'Decatur, Georgia',
+    'Herkimer County Community College': 'Herkimer, New York',
+    'Hocking College': 'Nelsonville, Ohio',
+    'Indian River State College': 'Fort Pierce, Florida',
+    'Laboure College': 'Milton, Massachusetts',
+    'Lake Michigan College': 'Benton Harbor, Michigan',
+    'Lake Area Technical College': 'Watertown, South Dakota',
+    'Lansdale School of Business': 'North Wales, Pennsylvania',
+    'Rhodes State College': 'Lima, Ohio',
+    'Los Angeles Mission College': 'Sylmar, California',
+    'Lurleen B. Wallace Community College': 'Andalusia, Alabama',
+    'Manchester Community College': 'Manchester, Connecticut',
+    'Maysville Community and Technical College': 'Maysville, Kentucky',
+    'Meridian Community College': 'Meridian, Mississippi',
+    'Morgan Community College': 'Fort Morgan, Colorado',
+    'Motlow State Community College': 'Lynchburg, Tennessee',
+    'New Mexico Junior College': 'Hobbs, New Mexico',
+    'New Mexico State University at Alamogordo': 'Alamogordo, New Mexico',
+    'North Central State College': 'Mansfield, Ohio',
+    'North Central Texas College': 'Gainesville, Texas',
+    'North Dakota State College of Science': 'Wahpeton, North Dakota',
+    'Northcentral Technical College': 'Wausau, Wisconsin',
+    'Northern Oklahoma College': 'Tonkawa, Oklahoma',
+    'Northwest Vista College': 'San Antonio, Texas',
+    'Ohlone College': 'Fremont, California',
+    'Palo Alto College': 'San Antonio, Texas',
+    'Reedley College': 'Reedley, California',
+    'San Bernardino Valley College': 'San Bernardino, California',
+    'Southern Maine Community College': 'South Portland, Maine',
+    'Technical College of the Lowcountry': 'Beaufort, South Carolina',
+    'Trocaire College': 'Buffalo, New York',
+    'Urban College of Boston': 'Boston, Massachusetts',
+    'Warren County Community College': 'Washington, New Jersey',
+    'Westmoreland County Community College': 'Youngwood, Pennsylvania',
+    'Baker College of Muskegon': 'Muskegon, Michigan',
+    'Mississippi Gulf Coast Community College': 'Perkinston, Mississippi',
+    'Capella University': 'Minneapolis, Minnesota',
+    'Morris Brown College': 'Atlanta, Georgia',
+    'Moore College of Art and Design': 'Philadelphia, Pennsylvania',
+    'Freed-Hardeman University': 'Henderson, Tennessee',
+    'Blinn College': 'Brenham, Texas',
+    'Franklin College of Indiana': 'Franklin, Indiana',
+    'SUNY Delhi': 'Delhi, New York',
+    'Ohio University - Zanesville': 'Zanesville, Ohio',
+    'Ogeechee Technical College': 'Statesboro, Georgia',
+    'Hennepin Technical College': 'Brooklyn Park, Minnesota',
+    'SUNY Upstate Medical University': 'Syracuse, New York',
+    'Appalachian School of Law': 'Grundy, Virginia',
+    'University of Sioux Falls': 'Sioux Falls, South Dakota',
+    'Tidewater Community College': 'Norfolk, Virginia',
+    'Folsom Lake College': 'Folsom, California',
+    'University of New Hampshire School of Law': 'Concord, New Hampshire',
+    'Chestnut Hill College': 'Philadelphia, Pennsylvania',
+    'University of the Southwest': 'Hobbs, New Mexico',
+    'San Diego Christian College': 'Santee, California',
+    'Wharton School': 'Philadelphia, Pennsylvania',
+    'University of South Florida': 'Tampa, Florida',
+    'Gordon Conwell Theological Seminary': 'South Hamilton, Massachusetts',
+    'Trinity Baptist College': 'Jacksonville, Florida',
+    'Southern Union State Community College': 'Opelika, Alabama',
+    'Columbia International University': 'Columbia, South Carolina',
+    'Prairie View A&M University: College of Nursing': 'Houston, Texas',
+    'Roosevelt University': 'Chicago, Illinois',
+    'Touro University California': 'Vallejo, California',
+    'Union County College': 'Cranford, New Jersey',
+    'State Technical College of Missouri': 'Linn, Missouri',
+    'Wharton County Junior College': 'Wharton, Texas',
+    'Brooklyn Law School': 'Brooklyn, New York',
+    'Erwin Technical College': 'Tampa, Florida',
+    'National University of Health Sciences': 'Lombard, Illinois',
+    'Trinity Valley Community College': 'Athens, Texas',
+    'Tillamook Bay Community College': 'Tillamook, Oregon',
+    'Louisiana Delta Community College': 'Monroe, Louisiana',
+    'Adler University': 'Chicago, Illinois',
+    'Southeastern Technical College': 'Swainsboro, Georgia',
+    'New Hope Christian College': 'Eugene, Oregon',
+    'Trinity College of Florida': 'Trinity, Florida',
+    'Swedish Institute': 'New York, New York',
+    'Champlain College': 'Burlington, Vermont',
+    'Rosedale Bible College': 'Irwin, Ohio',
+    'Central Alabama Community College': 'Alexander City, Alabama',
+    'Illinois College of Optometry': 'Chicago, Illinois',
+    'Moberly Area Community College': 'Moberly, Missouri',
+    'Delaware County Community College': 'Media, Pennsylvania',
+    'Good Samaritan College of Nursing': 'Cincinnati, Ohio',
+    'Zane State College': 'Zanesville, Ohio',
+    'New Saint Andrews College': 'Moscow, Idaho',
+    'Kirkwood Community College': 'Cedar Rapids, Iowa',
+    'College of the Canyons': 'Santa Clarita, California',
+    'New River Community and Technical College': 'Beaver, West Virginia',
+    'Missouri Baptist University': 'Creve Coeur, Missouri',
+    'College of Saint Benedict': 'Saint Joseph, Minnesota',
+    'Community College of Vermont': 'Montpelier, Vermont',
+    'Galen College of Nursing - Cincinnati': 'Cincinnati, Ohio',
+    'University of Guam': 'Mangilao, Guam',
+    'McFatter Technical College': 'Davie, Florida',
+    'Virginia Peninsula Community College': 'Hampton, Virginia',
+    'Mercer County Community College': 'West Windsor, New Jersey',
+    'Robert Morris University': 'Moon Township, Pennsylvania',
+    'Fletcher Technical Community College': 'Schriever, Louisiana',
+    'Albany Technical College': 'Albany, Georgia',
+    'Central Arizona College': 'Coolidge, Arizona',
+    'Florida Polytechnic University': 'Lakeland, Florida',
+    'Tennessee College of Applied Technology - Elizabethton': 'Elizabethton, Tennessee',
+    'New Professions Technical Institute': 'Miami, Florida',
+    'Cosumnes River College': 'Sacramento, California',
+    'Jefferson State Community College': 'Birmingham, Alabama',
+    'Southern Regional Technical College': 'Thomasville, Georgia',
+    'Eastern Virginia Career College': 'Fredericksburg, Virginia',
+    'College of Southern Maryland': 'La Plata, Maryland',
+    'Pickens Technical College': 'Aurora, Colorado',
+    'Samaritan Hospital School of Nursing': 'Troy, New York',
+    'Northcentral University': 'San Diego, California',
+    'Coastal Alabama Community College': 'Bay Minette, Alabama',
+    'Sonoran Desert Institute': 'Tempe, Arizona',
+    'Aims Community College': 'Greeley, Colorado',
+    'Gwinnett Technical College': 'Lawrenceville, Georgia',
+    'Aiken Technical College': 'Graniteville, South Carolina',
+    'Eastern Gateway Community College': 'Steubenville, Ohio',
+    'Rowan-Cabarrus Community College': 'Salisbury, North Carolina',
+    'Antillean University': 'Mayagüez, Puerto Rico',
+    'Berkeley College - Woodland Park': 'Woodland Park, New Jersey',
+    'Saint Leo University': 'Saint Leo, Florida',
+    'California Aeronautical University': 'Bakersfield, California',
+    'Utah Valley University': 'Orem, Utah',
+    'California State University Northridge': 'Los Angeles, California',
+    'North West College - West Covina': 'West Covina, California',
+    'Sacramento Ultrasound Institute': 'Sacramento, California',
+    'Fresno State': 'Fresno, California',
+    'Washtenaw community college': 'Ann Arbor, Michigan',
+    'Lone Star College - Cyfair': 'Cypress, Texas',
+    'Suny orange': 'Middletown, New York',
+    'Arizona College of Nursing - Southfield': 'Southfield, Michigan',
+    'Guam Community College': 'Mangilao, Guam'
+}
+
+
+# helpers
+
+def normalize_name(value) -> str:
+    return " ".join(value.lower().split()) if isinstance(value, str) else ""
+
+
+@functools.lru_cache(maxsize=None)
+def state_code(value) -> str:
+    """'PA', 'pa' and 'Pennsylvania' -> 'PA'. Unknown values are returned as-is."""
+    if not isinstance(value, str) or not value.strip():
+        return ""
+    value = value.strip()
+    found = us.states.lookup(value)
+    return found.abbr if found else value
+
+
+@functools.lru_cache(maxsize=None)
+def state_name(code) -> str:
+    found = us.states.lookup(code) if code else None
+    return found.name if found else code
+
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    """Content hash of each row (column names included, so a new column changes every hash)."""
+    salt = CLEANING_VERSION + "\x1e" + "\x1f".join(df.columns)
+    text = df.fillna("").astype(str).agg("\x1f".join, axis=1)
+    return text.map(lambda t: hashlib.blake2b((salt + "\x1e" + t).encode(), digest_size=8).hexdigest())
+
+
+def read_chunks(path: str, chunk_size: int):
+    """Yield normalized chunks of a scraper CSV with a join key and a content hash per row."""
+    reader = pd.read_csv(path, chunksize=chunk_size, dtype=str, na_values=NA_VALUES, keep_default_na=True)
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip().str.lower()
+        for col in chunk.columns:
+            chunk[col] = chunk[col].str.strip().replace("", np.nan)
+
+        # ratings_scrape.py writes "City, ST" into state
+        if "city" not in chunk.columns:
+            parts = chunk["state"].str.rsplit(",", n=1, expand=True).reindex(columns=[0, 1])
+            has_city = parts[1].notna()
+            chunk.insert(chunk.columns.get_loc("state"), "city", parts[0].where(has_city).str.strip())
+            chunk["state"] = parts[1].where(has_city, parts[0]).str.strip()
+        chunk["state"] = chunk["state"].map(state_code).replace("", np.nan)
+
+        chunk[HASH_COL] = row_hashes(chunk)
+        chunk[KEY_COL] = (chunk["school_name"].map(normalize_name) + "|"
+                          + chunk["city"].map(normalize_name) + "|"
+                          + chunk["state"].fillna(""))
+        yield chunk
+
+
+def load_numeric(path: str, chunk_size: int) -> pd.DataFrame:
+    """Build side of the join: NCES rows indexed by join key (the last row wins)."""
+    chunks = [c.drop(columns=["school_name", "city", "state"]) for c in read_chunks(path, chunk_size)]
+    if not chunks:
+        return pd.DataFrame(columns=[HASH_COL]).rename_axis(KEY_COL)
+    numeric = pd.concat(chunks, ignore_index=True)
+    return numeric.drop_duplicates(KEY_COL, keep="last").set_index(KEY_COL)
+
+
+def last_rows(path: str, chunk_size: int) -> np.ndarray:
+    """Sorted positions of the last row of every join key in a scraper CSV."""
+    last, offset = {}, 0
+    for chunk in read_chunks(path, chunk_size):
+        last.update(zip(chunk[KEY_COL], range(offset, offset + len(chunk))))
+        offset += len(chunk)
+    return np.sort(np.fromiter(last.values(), dtype=np.int64, count=len(last)))
+
+
+def read_manifest(output_path: str):
+    try:
+        with open(output_path + MANIFEST_SUFFIX, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_cache_hashes(path: str, chunk_size: int) -> dict:
+    if not os.path.exists(path):
+        return {}
+    hashes = {}
+    for chunk in pd.read_csv(path, usecols=[KEY_COL, HASH_COL], dtype=str, chunksize=chunk_size):
+        hashes.update(zip(chunk[KEY_COL], chunk[HASH_COL]))
+    return hashes
+
+
+def append_csv(df: pd.DataFrame, path: str):
+    df.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Select OUTPUT_SCHEMA's columns in order, cast and round them."""
+    out = pd.DataFrame(index=df.index)
+    for col, dtype in OUTPUT_SCHEMA.items():
+        values = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+        if dtype == "string":
+            out[col] = values.astype("string")
+            continue
+        values = pd.to_numeric(values, errors="coerce")
+        if dtype == "Int64":
+            out[col] = values.round(0).astype("Int64")
+        else:
+            # Always float64, so whole numbers are written as "1300.0" whichever path produced them
+            out[col] = values.astype("float64").round(1 if col in RATING_COLUMNS or col == "overall_rating" else 2)
+    return out
+
+
+# cleaning rules (clean_data.ipynb)
+
+def clean(merged: pd.DataFrame) -> pd.DataFrame:
+    """Clean joined rows. Rows the notebook would remove are kept, flagged in DROPPED_COL."""
+    df = merged.copy()
+    for col in ["overall_rating"] + OVERALL_FALLBACK_COLUMNS + METRIC_COLUMNS[1:] + ["student_population_undergrad"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        else:
+            df[col] = np.nan
+    if "campus_setting_raw" not in df.columns:
+        df["campus_setting_raw"] = np.nan
+
+    dropped = df["school_name"].str.contains("Puerto Rico", na=False)
+
+    df.loc[df["safety"] < 1, "safety"] = np.nan
+
+    # overall_rating of 0 with real ratings: use the average instead
+    fallback = df[OVERALL_FALLBACK_COLUMNS]
+    needs_fallback = (df["overall_rating"] == 0) & (fallback > 0).any(axis=1)
+    df.loc[needs_fallback, "overall_rating"] = fallback[needs_fallback].mean(axis=1, skipna=False)
+
+    df.loc[df["student_population_total"] > MAX_STUDENT_POPULATION, "student_population_total"] = np.nan
+
+    # Schools with no metrics at all are most likely closed or not relevant
+    dropped |= df[METRIC_COLUMNS].isnull().all(axis=1)
+
+    for school, location in CITY_STATE_CORRECTIONS.items():
+        city, state = location.split(", ")
+        match = df["school_name"] == school
+        df.loc[match, "city"] = city
+        df.loc[match, "state"] = state_code(state)
+
+    df.loc[df["campus_setting_raw"] == "Remote", "campus_setting_raw"] = np.nan
+    df["campus_setting"] = df["campus_setting_raw"].map(CAMPUS_SETTING_MAPPING)
+
+    df["state"] = df["state"].map(state_name, na_action="ignore")
+    dropped |= df["state"].isin(EXCLUDED_STATES)
+
+    out = apply_schema(df)
+    out.insert(0, KEY_COL, df[KEY_COL])
+    out.insert(1, HASH_COL, df[HASH_COL])
+    out.insert(2, DROPPED_COL, dropped.astype(int))
+    return out
+
+
+def impute(df: pd.DataFrame) -> pd.DataFrame:
+    """Fill missing numbers the way clean_data.ipynb does (fit on the whole table)."""
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+    from sklearn.impute import IterativeImputer
+
+    cols = [c for c, dtype in OUTPUT_SCHEMA.items() if dtype != "string" and c != "rmp_school_id"]
+    cols = [c for c in cols if df[c].notna().any()]
+    if not cols or not df[cols].isnull().any().any():
+        return df
+
+    imputer = IterativeImputer(max_iter=1000, random_state=42, initial_strategy="median")
+    filled = pd.DataFrame(imputer.fit_transform(df[cols].astype(float)), columns=cols, index=df.index)
+
+    for col in cols:
+        if col != "campus_setting":
+            filled[col] = filled[col].clip(lower=0)
+        if col in CAPPING_LIMITS:
+            filled[col] = filled[col].clip(upper=CAPPING_LIMITS[col])
+
+    df = df.copy()
+    df[cols] = filled
+    return apply_schema(df)
+
+
+# pipeline
+
+def run(ratings_path=RATINGS_FILE, numeric_path=NUMERIC_FILE, output_path=OUTPUT_FILE,
+        cache_path=CACHE_FILE, chunk_size=CHUNK_SIZE, full=False, fill_missing=True):
+    numeric = load_numeric(numeric_path, chunk_size)
+    numeric_hashes = numeric[HASH_COL]
+    numeric_values = numeric.drop(columns=[HASH_COL])
+    keep = last_rows(ratings_path, chunk_size)
+    previous = {} if full else read_cache_hashes(cache_path, chunk_size)
+    manifest = {"fill_missing": bool(fill_missing)}
+
+    tmp_cache = cache_path + ".tmp"
+    if os.path.exists(tmp_cache):
+        os.remove(tmp_cache)
+
+    seen, reused = set(), set()
+    stats = {"ratings_rows": 0, "joined": 0, "processed": 0, "reused": 0}
+
+    # Probe side: stream the ratings, keeping each key's last row
+    for chunk in read_chunks(ratings_path, chunk_size):
+        positions = np.arange(stats["ratings_rows"], stats["ratings_rows"] + len(chunk))
+        stats["ratings_rows"] += len(chunk)
+        chunk = chunk[np.isin(positions, keep) & chunk[KEY_COL].isin(numeric.index).to_numpy()]
+        seen.update(chunk[KEY_COL])
+        if chunk.empty:
+            continue
+        stats["joined"] += len(chunk)
+
+        # A joined row is unchanged when neither side's content hash changed
+        combined = chunk[HASH_COL] + numeric_hashes.reindex(chunk[KEY_COL]).to_numpy()
+        unchanged = combined.to_numpy() == chunk[KEY_COL].map(previous).to_numpy()
+        reused.update(chunk.loc[unchanged, KEY_COL])
+
+        changed = chunk[~unchanged]
+        if changed.empty:
+            continue
+        merged = changed.drop(columns=[HASH_COL]).join(numeric_values, on=KEY_COL)
+        merged[HASH_COL] = combined[~unchanged]
+        append_csv(clean(merged), tmp_cache)
+        stats["processed"] += len(changed)
+
+    stats["reused"] = len(reused)
+    stats["removed"] = sum(1 for key in previous if key not in seen)
+    if (stats["processed"] == 0 and stats["removed"] == 0 and os.path.exists(output_path)
+            and read_manifest(output_path) == manifest):
+        print(f"[DONE] {output_path} is up to date ({stats['reused']} rows unchanged)")
+        return stats
+
+    # Carry unchanged rows over from the previous cache
+    if reused:
+        for chunk in pd.read_csv(cache_path, dtype=str, chunksize=chunk_size):
+            append_csv(chunk[chunk[KEY_COL].isin(reused)], tmp_cache)
+    if os.path.exists(tmp_cache):
+        os.replace(tmp_cache, cache_path)
+    elif os.path.exists(cache_path):
+        os.remove(cache_path)
+
+    # Final table: kept rows, bookkeeping columns removed. Rows go out in join
+    # key order, not cache order (changed rows first), so a rerun on the same
+    # data writes the same file and train_model.py fits the same forest.
+    tmp_output = output_path + ".tmp"
+    stats["dropped"] = 0
+    parts = []
+    if os.path.exists(cache_path):
+        for chunk in pd.read_csv(cache_path, dtype=str, chunksize=chunk_size):
+            kept = chunk[chunk[DROPPED_COL] == "0"]
+            stats["dropped"] += len(chunk) - len(kept)
+            parts.append(kept)
+    if parts:
+        table = pd.concat(parts, ignore_index=True).sort_values(KEY_COL, kind="stable", ignore_index=True)
+        table = apply_schema(table)
+    else:
+        table = apply_schema(pd.DataFrame())
+    if fill_missing:
+        table = impute(table)
+    table.to_csv(tmp_output, index=False)
+    # Manifest out first: a crash before the new one is written forces a rewrite
+    if os.path.exists(output_path + MANIFEST_SUFFIX):
+        os.remove(output_path + MANIFEST_SUFFIX)
+    os.replace(tmp_output, output_path)
+    with open(output_path + MANIFEST_SUFFIX, "w") as f:
+        json.dump(manifest, f)
+
+    stats["written"] = stats["joined"] - stats["dropped"]
+    print(
+        f"[DONE] {output_path}: {stats['written']} rows "
+        f"({stats['processed']} cleaned, {stats['reused']} from cache, "
+        f"{stats['dropped']} dropped, {stats['removed']} removed)"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge and clean the scraper outputs into final_school_data.csv")
+    parser.add_argument("--ratings", default=RATINGS_FILE)
+    parser.add_argument("--numeric", default=NUMERIC_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--full", action="store_true", help="ignore the cache and clean every row")
+    parser.add_argument("--no-impute", action="store_true", help="leave missing values empty")
+    args = parser.parse_args()
+
+    run(args.ratings, args.numeric, args.output, args.cache, args.chunk_size,
+        full=args.full, fill_missing=not args.no_impute)
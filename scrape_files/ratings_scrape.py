@@ -4,6 +4,8 @@ import time
 from urllib.parse import urlparse
 import concurrent.futures 
 
+from telemetry import Recorder, RunTelemetry
+
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
@@ -43,6 +45,10 @@ ratings_columns = [
     "internet",
 ]
 
+# Everything scrape_ratings reads off the page; "N/A" in any makes a partial row
+RATING_FIELDS = ratings_columns[3:]
+CATEGORY_FIELDS = ratings_columns[5:]
+
 school_id_columns = [
     "rmp_school_id",
     "school_name",
@@ -52,6 +58,33 @@ school_id_columns = [
 RETRY_COUNT = 3
 RETRY_DELAY = 1
 
+# Fast detection: don't wait for the page to load, poll for whichever signal
+# decides validity first (redirect, HTTP status, not-found page, school header)
+FAST_DETECT = True
+DETECT_TIMEOUT = 5          # upper bound; most pages are decided well before this
+DETECT_POLL = 0.1
+FIELD_TIMEOUT = 1           # waits for fields once the school header is on the page
+RATINGS_TIMEOUT = 5         # the grades render after the header; wait for them or the end of the document
+
+NAME_SELECTOR = 'div[class*="MiniStickyHeader__MiniNameWrapper"]'
+GRADE_SELECTOR = 'div[class*="CategoryGradeContainer"] div[class*="GradeSquare"]'
+NOT_FOUND_MARKERS = ("not found",)          # in the page title
+
+# Third-party and heavy resources the scrape never reads (Chrome DevTools URL patterns)
+BLOCKED_URLS = [
+    "*googletagmanager.com*", "*google-analytics.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*adservice.google.com*", "*amazon-adsystem.com*",
+    "*facebook.net*", "*hotjar.com*", "*scorecardresearch.com*", "*quantserve.com*",
+    "*.woff", "*.woff2", "*.ttf", "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg",
+    "*.webp", "*.mp4",
+]
+
+# Status of the main document, once the navigation has a response
+NAV_STATUS_JS = (
+    "const nav = performance.getEntriesByType('navigation')[0];"
+    "return nav ? nav.responseStatus || 0 : 0;"
+)
+
 
 # helpers 
 
@@ -77,7 +110,8 @@ def setup_driver() -> webdriver.Chrome:
     options.add_argument("--log-level=3")
     options.add_argument("--no-sandbox")
     options.add_argument("--ignore-certificate-errors")
-    options.page_load_strategy = "eager"
+    # "none" returns from driver.get() right away so detection can poll
+    options.page_load_strategy = "none" if FAST_DETECT else "eager"
     options.add_argument("--disable-extensions")
     options.add_argument("--disable-notifications")
     options.add_argument("--disable-dev-shm-usage")
@@ -105,6 +139,9 @@ def setup_driver() -> webdriver.Chrome:
         options=options
     )
     driver.set_page_load_timeout(30)
+    if FAST_DETECT:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
     return driver
 
 
@@ -126,26 +163,56 @@ def is_valid_school_page(driver) -> bool:
     - URL still contains /school/
     - MiniStickyHeader__MiniNameWrapper exists
     """
+    return check_school_page(driver)[0]
+
+
+def _page_verdict(driver):
+    """One poll of the early signals: 'valid', an invalid reason, or False if undecided yet."""
     url = driver.current_url
-    if "/school/" not in url:
-        return False
+    # Before the navigation commits the URL is still about:blank / data:,
+    if url.startswith("http") and "/school/" not in url:
+        return "redirect"
+    status = driver.execute_script(NAV_STATUS_JS)
+    if status and status >= 400:
+        return f"http_{status}"
+    if driver.find_elements(By.CSS_SELECTOR, NAME_SELECTOR):
+        return "valid"
+    title = driver.title.lower()
+    if any(marker in title for marker in NOT_FOUND_MARKERS):
+        return "not_found"
+    return False
+
+
+def check_school_page(driver) -> tuple:
+    """(is_valid, reason). Reason is 'valid', 'redirect', 'http_<status>', 'not_found' or 'timeout'."""
+    if not FAST_DETECT:
+        if "/school/" not in driver.current_url:
+            return False, "redirect"
+        try:
+            WebDriverWait(driver, 5).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, NAME_SELECTOR))
+            )
+            return True, "valid"
+        except TimeoutException:
+            return False, "timeout"
 
     try:
-        WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located(
-                (By.CSS_SELECTOR, 'div[class*="MiniStickyHeader__MiniNameWrapper"]')
-            )
-        )
-        return True
+        verdict = WebDriverWait(driver, DETECT_TIMEOUT, poll_frequency=DETECT_POLL).until(_page_verdict)
     except TimeoutException:
-        return False
+        return False, "timeout"
+    return verdict == "valid", verdict
+
+
+def field_timeout() -> float:
+    """The header the fields sit next to is already on the page in fast mode."""
+    return FIELD_TIMEOUT if FAST_DETECT else 5
 
 
 def scrape_school_name(driver) -> str:
     try:
-        el = WebDriverWait(driver, 5).until(
+        el = WebDriverWait(driver, field_timeout()).until(
             EC.presence_of_element_located(
-                (By.CSS_SELECTOR, 'div[class*="MiniStickyHeader__MiniNameWrapper"]')
+                (By.CSS_SELECTOR, NAME_SELECTOR)
             )
         )
         return el.text.strip()
@@ -176,7 +243,7 @@ def _parse_state_from_city_state(text: str) -> str:
 def scrape_state_abbrev(driver) -> str:
     """Extracts state abbreviation."""
     try:
-        el = WebDriverWait(driver, 5).until(
+        el = WebDriverWait(driver, field_timeout()).until(
             EC.presence_of_element_located(
                 (By.CSS_SELECTOR, 'div[class*="MiniStickyHeader__MiniLocationWrapper"]')
             )
@@ -191,7 +258,7 @@ def scrape_state_abbrev(driver) -> str:
         pass
 
     try:
-        el = WebDriverWait(driver, 5).until(
+        el = WebDriverWait(driver, field_timeout()).until(
             EC.presence_of_element_located(
                 (By.CSS_SELECTOR, 'span[class*="HeaderDescription__StyledCityState"]')
             )
@@ -208,6 +275,13 @@ def scrape_state_abbrev(driver) -> str:
     return "N/A"
 
 
+def _ratings_rendered(driver) -> bool:
+    """Every category grade is on the page, or the document is fully parsed (what's missing stays missing)."""
+    if len(driver.find_elements(By.CSS_SELECTOR, GRADE_SELECTOR)) >= len(CATEGORY_FIELDS):
+        return True
+    return driver.execute_script("return document.readyState") != "loading"
+
+
 def scrape_ratings(driver, rmp_school_id: str, school_name: str, state: str) -> dict:
     """Scrape ratings + category grades. Missing fields -> 'N/A'."""
     school_data = {
@@ -228,8 +302,15 @@ def scrape_ratings(driver, rmp_school_id: str, school_name: str, state: str) ->
         "internet": "N/A",
     }
 
+    if FAST_DETECT:
+        # The page is still loading ("none" strategy); without this, grades read as N/A
+        try:
+            WebDriverWait(driver, RATINGS_TIMEOUT, poll_frequency=DETECT_POLL).until(_ratings_rendered)
+        except TimeoutException:
+            pass
+
     try:
-        school_data["overall_rating"] = WebDriverWait(driver, 5).until(
+        school_data["overall_rating"] = WebDriverWait(driver, field_timeout()).until(
             EC.presence_of_element_located(
                 (By.CSS_SELECTOR, 'div[class*="OverallRating__Number"]')
             )
@@ -272,11 +353,20 @@ def scrape_ratings(driver, rmp_school_id: str, school_name: str, state: str) ->
 # concurrent scraping
 
 def scrape_single_school(school_id: int) -> tuple:
+    """Runs in a worker process; the last item is that task's telemetry snapshot."""
+    metrics = Recorder()
+    result = _scrape_single_school(school_id, metrics)
+    return (*result, metrics.snapshot())
+
+
+def _scrape_single_school(school_id: int, metrics: Recorder) -> tuple:
     driver = None
     try:
-        driver = setup_driver()
+        with metrics.stage("driver_init"):
+            driver = setup_driver()
     except Exception as e:
         print(f"ERROR (id={school_id}): Driver init failed: {e}")
+        metrics.count("driver_init_failed")
         return False, school_id, None, None
 
     ratings_data = None
@@ -286,40 +376,56 @@ def scrape_single_school(school_id: int) -> tuple:
     print(f"\n--- Visiting ID {school_id}: {url} ---")
 
     try:
-        driver.get(url)
-
-        if not is_valid_school_page(driver):
-            print(f"ID {school_id}: Not a valid school page.")
+        with metrics.stage("page_load"):
+            driver.get(url)
+
+        with metrics.stage("validity_check"):
+            valid, reason = check_school_page(driver)
+        if not valid:
+            print(f"ID {school_id}: Not a valid school page ({reason}).")
+            metrics.count("invalid")
+            metrics.count(f"invalid_{reason}")
             return False, school_id, None, None
 
-        current_id = get_school_id_from_url(driver.current_url) or str(school_id)
-        school_name = scrape_school_name(driver)
-        state_abbrev = scrape_state_abbrev(driver)
-
-        if not school_name:
-            print(f"ID {current_id}: Could not find school name; skipping.")
-            return False, school_id, None, None
-
-        print(f"VALID SCHOOL FOUND: [{current_id}] {school_name} ({state_abbrev})")
-
-        id_data = {
-            "rmp_school_id": current_id,
-            "school_name": school_name,
-            "state": state_abbrev,
-        }
-
-        ratings_data = scrape_ratings(driver, current_id, school_name, state_abbrev)
-
+        with metrics.stage("parse"):
+            current_id = get_school_id_from_url(driver.current_url) or str(school_id)
+            school_name = scrape_school_name(driver)
+            state_abbrev = scrape_state_abbrev(driver)
+
+            if not school_name:
+                print(f"ID {current_id}: Could not find school name; skipping.")
+                metrics.count("no_name")
+                return False, school_id, None, None
+
+            print(f"VALID SCHOOL FOUND: [{current_id}] {school_name} ({state_abbrev})")
+
+            id_data = {
+                "rmp_school_id": current_id,
+                "school_name": school_name,
+                "state": state_abbrev,
+            }
+
+            ratings_data = scrape_ratings(driver, current_id, school_name, state_abbrev)
+
+        # Saved either way, but a row with missing fields isn't counted as a clean success
+        missing = [f for f in RATING_FIELDS if ratings_data[f] == "N/A"]
+        if missing:
+            print(f"ID {current_id}: partial ratings, missing {', '.join(missing)}")
+            metrics.count("partial")
+        else:
+            metrics.count("valid")
         return True, school_id, id_data, ratings_data
 
     except Exception as e:
         print(f"ERROR (id={school_id}): Scraping failed: {e}")
+        metrics.count("error")
         return False, school_id, None, None
 
     finally:
         if driver:
             try:
-                driver.quit()
+                with metrics.stage("driver_quit"):
+                    driver.quit()
             except Exception:
                 pass
 
@@ -332,6 +438,7 @@ def main():
     school_ids_to_check = range(START_ID, MAX_ID + 1)
 
     print(f"Starting concurrent scraping of {MAX_ID - START_ID + 1} IDs with {MAX_WORKERS} workers...")
+    telemetry = RunTelemetry("ratings_scrape", total=MAX_ID - START_ID + 1)
 
     with concurrent.futures.ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor, \
             open(ratings_csv_file, "a", newline="", encoding="utf-8") as ratings_f, \
@@ -349,7 +456,8 @@ def main():
             school_id = future_to_id[future]
 
             try:
-                is_success, _, id_data, ratings_data = future.result()
+                is_success, _, id_data, ratings_data, snapshot = future.result()
+                telemetry.merge(snapshot)
 
                 if is_success:
                     ids_writer.writerow(id_data)
@@ -362,7 +470,11 @@ def main():
 
             except Exception as e:
                 print(f"ERROR (id={school_id}): Worker failed to return result: {e}")
+                telemetry.count("worker_failed")
+
+            telemetry.item_done()
 
+    telemetry.finish()
     print("\nID-based ratings scraping complete. All workers shut down.")
 
 
@@ -0,0 +1,361 @@
+"""
+Sharded ID discovery for ratings_scrape.py across processes or machines.
+
+A coordinator keeps the ID range in a SQLite work queue (scrape_queue.db),
+split into blocks of --block-size IDs. Workers claim a block over HTTP,
+scrape it with their own browser pool, and report the valid schools back.
+A claimed block is leased: the worker heartbeats while it works, and a block
+whose lease runs out (a crashed or disconnected worker) goes back to the
+queue. Results are keyed by RMP school id, so a block that gets scraped
+twice can't produce duplicate rows. Restarting the coordinator on the same
+database continues where it stopped.
+
+    python scrape_queue.py serve --start 1 --end 50000        # coordinator, port 8800
+    python scrape_queue.py work --coordinator http://HOST:8800 --browsers 15
+    python scrape_queue.py status --coordinator http://HOST:8800
+    python scrape_queue.py export                              # merge into the CSVs
+
+Blocks don't depend on each other, so throughput grows with the number of
+worker nodes. The coordinator only does a few small SQLite writes per block.
+When the last block is done the coordinator merges the results into
+school_ratings.csv and school_ids.csv. It keeps rows that are already there
+and replaces any that were scraped again.
+
+--scraper module:function swaps out ratings_scrape.scrape_single_school.
+The replacement must return the same (ok, id, id_data, ratings_data,
+telemetry snapshot) tuple.
+"""
+import argparse
+import csv
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUEUE_DB = "scrape_queue.db"
+BLOCK_SIZE = 100
+LEASE_SECONDS = 600         # a block is handed out again if not renewed in time
+IDLE_POLL = 15              # seconds a worker waits when every block is leased
+DEFAULT_PORT = 8800
+
+RATINGS_CSV = "school_ratings.csv"
+SCHOOL_IDS_CSV = "school_ids.csv"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    block_id      INTEGER PRIMARY KEY,
+    start_id      INTEGER NOT NULL,
+    end_id        INTEGER NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',   -- pending | leased | done
+    worker        TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS results (
+    rmp_school_id TEXT PRIMARY KEY,
+    id_row        TEXT NOT NULL,                     -- JSON of the school_ids.csv row
+    ratings_row   TEXT NOT NULL,                     -- JSON of the school_ratings.csv row
+    block_id      INTEGER NOT NULL
+);
+"""
+
+
+# --- QUEUE ---
+
+class WorkQueue:
+    def __init__(self, path=QUEUE_DB):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        # One writer at a time; the HTTP server handles requests on threads
+        self.lock = threading.Lock()
+
+    def seed(self, start_id, end_id, block_size=BLOCK_SIZE):
+        """Add blocks covering start_id..end_id. Blocks that already exist are kept."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO blocks (block_id, start_id, end_id) VALUES (?, ?, ?)",
+                [(lo // block_size, lo, min(lo + block_size - 1, end_id))
+                 for lo in range(start_id, end_id + 1, block_size)],
+            )
+            self.conn.execute("COMMIT")
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        """Lease the lowest pending block to `worker`. Returns (block_id, start_id, end_id) or None."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute(
+                "UPDATE blocks SET status = 'pending', worker = NULL "
+                "WHERE status = 'leased' AND lease_expires < ?", (now,))
+            row = self.conn.execute(
+                "SELECT block_id, start_id, end_id FROM blocks WHERE status = 'pending' "
+                "ORDER BY block_id LIMIT 1").fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE blocks SET status = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE block_id = ?", (worker, now + lease_seconds, row[0]))
+            self.conn.execute("COMMIT")
+        return row
+
+    def heartbeat(self, block_id, worker, lease_seconds=LEASE_SECONDS):
+        """Extend the lease. False if the block was handed to someone else in the meantime."""
+        with self.lock:
+            cur = self.conn.execute(
+                "UPDATE blocks SET lease_expires = ? WHERE block_id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + lease_seconds, block_id, worker))
+        return cur.rowcount == 1
+
+    def complete(self, block_id, worker, rows):
+        """Store a block's schools and mark it done.
+
+        Accepted even if the lease already went to another worker: the rows
+        are upserted by school id, so whichever copy lands last just
+        overwrites the same rows.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results (rmp_school_id, id_row, ratings_row, block_id) "
+                "VALUES (?, ?, ?, ?)",
+                [(str(r["id_row"]["rmp_school_id"]), json.dumps(r["id_row"]), json.dumps(r["ratings_row"]), block_id)
+                 for r in rows],
+            )
+            self.conn.execute(
+                "UPDATE blocks SET status = 'done', worker = ?, lease_expires = NULL WHERE block_id = ?",
+                (worker, block_id))
+            self.conn.execute("COMMIT")
+
+    def status(self):
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM blocks GROUP BY status").fetchall())
+            schools = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            workers = [w for (w,) in self.conn.execute(
+                "SELECT DISTINCT worker FROM blocks WHERE status = 'leased'")]
+        return {
+            "pending": counts.get("pending", 0),
+            "leased": counts.get("leased", 0),
+            "done": counts.get("done", 0),
+            "schools": schools,
+            "active_workers": workers,
+        }
+
+    def results(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT rmp_school_id, id_row, ratings_row FROM results").fetchall()
+        return [(sid, json.loads(id_row), json.loads(ratings_row)) for sid, id_row, ratings_row in rows]
+
+    def export(self, ratings_csv=RATINGS_CSV, ids_csv=SCHOOL_IDS_CSV):
+        """Merge results into the two CSVs by rmp_school_id. Returns the row count."""
+        results = self.results()
+        _merge_csv(ids_csv, {sid: id_row for sid, id_row, _ in results})
+        return _merge_csv(ratings_csv, {sid: ratings_row for sid, _, ratings_row in results})
+
+
+def _merge_csv(path, new_rows):
+    """Existing rows, replaced by `new_rows` where the id matches, sorted by id; written atomically."""
+    merged, columns = {}, None
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            columns = reader.fieldnames
+            for row in reader:
+                merged[row["rmp_school_id"]] = row
+    merged.update(new_rows)
+    if not merged:
+        return 0
+    columns = columns or list(next(iter(merged.values())))
+
+    def order(sid):
+        return (0, int(sid), "") if sid.isdigit() else (1, 0, sid)
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for sid in sorted(merged, key=order):
+            writer.writerow(merged[sid])
+    os.replace(tmp, path)
+    return len(merged)
+
+
+# --- COORDINATOR ---
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/status":
+            self._reply(self.server.queue.status())
+        else:
+            self._reply({"error": "not found"}, 404)
+
+    def do_POST(self):
+        queue = self.server.queue
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        worker = body.get("worker", "")
+        if self.path == "/claim":
+            block = queue.claim(worker, self.server.lease_seconds)
+            status = queue.status()
+            self._reply({
+                "block": None if block is None else dict(zip(("block_id", "start_id", "end_id"), block)),
+                "remaining": status["pending"] + status["leased"],
+                "lease_seconds": self.server.lease_seconds,
+            })
+        elif self.path == "/heartbeat":
+            self._reply({"ok": queue.heartbeat(body["block_id"], worker, self.server.lease_seconds)})
+        elif self.path == "/complete":
+            queue.complete(body["block_id"], worker, body.get("rows", []))
+            status = queue.status()
+            print(f"[QUEUE] block {body['block_id']} done by {worker} "
+                  f"({len(body.get('rows', []))} schools) | done {status['done']}, "
+                  f"leased {status['leased']}, pending {status['pending']}, schools {status['schools']}")
+            if status["pending"] == 0 and status["leased"] == 0:
+                n = queue.export(self.server.ratings_csv, self.server.ids_csv)
+                print(f"[QUEUE] All blocks done; merged {n} schools into {self.server.ratings_csv}")
+            self._reply({"ok": True})
+        else:
+            self._reply({"error": "not found"}, 404)
+
+    def _reply(self, payload, code=200):
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(args):
+    queue = WorkQueue(args.db)
+    if args.start is not None and args.end is not None:
+        queue.seed(args.start, args.end, args.block_size)
+    server = ThreadingHTTPServer((args.host, args.port), CoordinatorHandler)
+    server.daemon_threads = True
+    server.queue = queue
+    server.lease_seconds = args.lease
+    server.ratings_csv, server.ids_csv = args.ratings_csv, args.ids_csv
+    print(f"[QUEUE] Coordinator on http://{args.host}:{args.port} | {queue.status()}")
+    server.serve_forever()
+
+
+# --- WORKER ---
+
+class CoordinatorClient:
+    def __init__(self, url, worker):
+        self.url = url.rstrip("/")
+        self.worker = worker
+
+    def call(self, path, payload=None):
+        data = None if payload is None else json.dumps({"worker": self.worker, **payload}).encode()
+        req = urllib.request.Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return json.loads(resp.read())
+
+
+def _load_scraper(spec):
+    module, func = spec.split(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def work(args):
+    from telemetry import RunTelemetry
+
+    worker = args.name or f"{socket.gethostname()}-{os.getpid()}"
+    client = CoordinatorClient(args.coordinator, worker)
+    scrape = _load_scraper(args.scraper)
+    telemetry = RunTelemetry(f"scrape_queue_{worker}")
+    print(f"[WORKER] {worker} with {args.browsers} browsers -> {args.coordinator}")
+
+    with ProcessPoolExecutor(max_workers=args.browsers) as executor:
+        while True:
+            claim = client.call("/claim", {})
+            block = claim["block"]
+            if block is None:
+                if claim["remaining"] == 0:
+                    break
+                # Everything left is leased; one may still expire and come back
+                time.sleep(args.idle_poll)
+                continue
+
+            block_id, lease = block["block_id"], claim["lease_seconds"]
+            print(f"[WORKER] Claimed block {block_id}: IDs {block['start_id']}-{block['end_id']}")
+            futures = {executor.submit(scrape, school_id): school_id
+                       for school_id in range(block["start_id"], block["end_id"] + 1)}
+            rows, last_beat = [], time.monotonic()
+            for future in as_completed(futures):
+                try:
+                    is_success, _, id_data, ratings_data, snapshot = future.result()
+                    telemetry.merge(snapshot)
+                    if is_success:
+                        rows.append({"id_row": id_data, "ratings_row": ratings_data})
+                except Exception as e:
+                    print(f"ERROR (id={futures[future]}): Worker failed to return result: {e}")
+                    telemetry.count("worker_failed")
+                telemetry.item_done()
+                if time.monotonic() - last_beat > lease / 3:
+                    last_beat = time.monotonic()
+                    if not client.call("/heartbeat", {"block_id": block_id})["ok"]:
+                        # Still finish it; results are upserted by school id
+                        print(f"[WORKER] Lease on block {block_id} expired; it may be scraped twice")
+            client.call("/complete", {"block_id": block_id, "rows": rows})
+            telemetry.count("blocks")
+
+    telemetry.finish()
+    print(f"[WORKER] {worker}: no blocks left.")
+
+
+# --- CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded RMP ID discovery with a SQLite work queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="run the coordinator")
+    p.add_argument("--db", default=QUEUE_DB)
+    p.add_argument("--start", type=int, help="first ID to queue (omit to resume an existing queue)")
+    p.add_argument("--end", type=int, help="last ID to queue")
+    p.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    p.add_argument("--lease", type=float, default=LEASE_SECONDS)
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--ratings-csv", default=RATINGS_CSV)
+    p.add_argument("--ids-csv", default=SCHOOL_IDS_CSV)
+
+    p = sub.add_parser("work", help="claim and scrape blocks until the queue is empty")
+    p.add_argument("--coordinator", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    p.add_argument("--browsers", type=int, default=15)
+    p.add_argument("--name", help="worker name (default: host-pid)")
+    p.add_argument("--scraper", default="ratings_scrape:scrape_single_school")
+    p.add_argument("--idle-poll", type=float, default=IDLE_POLL)
+
+    p = sub.add_parser("status", help="print queue progress")
+    p.add_argument("--coordinator", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+
+    p = sub.add_parser("export", help="merge results into the CSVs")
+    p.add_argument("--db", default=QUEUE_DB)
+    p.add_argument("--ratings-csv", default=RATINGS_CSV)
+    p.add_argument("--ids-csv", default=SCHOOL_IDS_CSV)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+    elif args.command == "work":
+        work(args)
+    elif args.command == "status":
+        print(json.dumps(CoordinatorClient(args.coordinator, "").call("/status"), indent=2))
+    else:
+        n = WorkQueue(args.db).export(args.ratings_csv, args.ids_csv)
+        print(f"Merged {n} schools into {args.ratings_csv} and {args.ids_csv}")
+
+
+if __name__ == "__main__":
+    main()
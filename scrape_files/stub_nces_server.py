@@ -0,0 +1,157 @@
+"""
+Local stand-in for the NCES site that throttles like a busy server, to try
+bs4_scrape.py's adaptive concurrency limiter (aimd.py) without touching NCES.
+
+The server handles CAPACITY requests at a time at BASE_LATENCY each. Past
+that, responses slow down in proportion to the queue. Past 2 x CAPACITY in
+flight it answers 503, and past RATE requests per second 429. Both carry a
+Retry-After header.
+
+    python stub_nces_server.py                       # serve on :8765
+    python stub_nces_server.py --check --requests 400
+    python stub_nces_server.py --check --mixed
+
+--mixed makes latency depend on the page, like the real site: search pages
+(?q=) answer SEARCH_FACTOR x faster than detail pages (?id=), and every
+FAST_HIT_EVERY-th response is an almost instant cache hit. --check then mixes
+one search per four detail fetches, each under its own limiter baseline.
+
+--check starts the server in the background, fetches --requests pages
+through bs4_scrape.safe_get from bs4_scrape's worker threads, and prints
+throughput, the status mix and how the concurrency limit moved. A run
+should end with no failed fetches and the limit near CAPACITY.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CAPACITY = 6
+BASE_LATENCY = 0.05     # seconds
+RATE = 60.0             # requests per second before 429
+RETRY_AFTER = 1
+SEARCH_FACTOR = 0.2     # --mixed: search page latency / detail page latency
+FAST_HIT_EVERY = 50     # --mixed: every Nth response is a cache hit
+FAST_HIT_FACTOR = 0.05
+
+PAGE = b"<html><body><table id='ctl00_cphCollegeNavBody_ucResultsMain_tblResults'></table></body></html>"
+
+
+class ThrottlingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, address, capacity=CAPACITY, latency=BASE_LATENCY, rate=RATE, mixed=False):
+        super().__init__(address, StubHandler)
+        self.capacity = capacity
+        self.latency = latency
+        self.rate = rate
+        self.mixed = mixed
+        self.served = 0
+        self.in_flight = 0
+        self.tokens = rate
+        self.refilled = time.monotonic()
+        self.lock = threading.Lock()
+
+    def admit(self, path="/"):
+        """Returns (status, seconds to spend on the response)."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.refilled) * self.rate)
+            self.refilled = now
+            if self.tokens < 1:
+                return 429, 0.0
+            self.tokens -= 1
+            if self.in_flight >= 2 * self.capacity:
+                return 503, 0.0
+            self.in_flight += 1
+            queued = max(0, self.in_flight - self.capacity)
+            delay = self.latency * (1 + queued)
+            if self.mixed:
+                self.served += 1
+                if self.served % FAST_HIT_EVERY == 0:
+                    delay *= FAST_HIT_FACTOR
+                elif "?q=" in path:
+                    delay *= SEARCH_FACTOR
+            return 200, delay
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status, delay = self.server.admit(self.path)
+        if status != 200:
+            self.send_response(status)
+            self.send_header("Retry-After", str(RETRY_AFTER))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        try:
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def check(server, n_requests):
+    import bs4_scrape
+
+    host, port = server.server_address
+    limits = []
+
+    def fetch(i):
+        if server.mixed and i % 5:
+            url, kind = f"http://{host}:{port}/collegenavigator/?id={i}", "detail"
+        else:
+            url, kind = f"http://{host}:{port}/collegenavigator/?q=school{i}", "search"
+        resp = bs4_scrape.safe_get(url, timeout=10, kind=kind)
+        limits.append(bs4_scrape.limiter.limit)
+        return resp is not None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=bs4_scrape.MAX_LIMIT) as pool:
+        ok = sum(pool.map(fetch, range(n_requests)))
+    elapsed = time.perf_counter() - start
+
+    counters = dict(sorted(bs4_scrape.telemetry.counters.items()))
+    print(f"{ok}/{n_requests} fetched in {elapsed:.1f}s ({n_requests / elapsed:.1f} pages/s)")
+    print(f"server capacity {server.capacity} concurrent, {server.rate:.0f} req/s"
+          + (", mixed page latencies" if server.mixed else ""))
+    print(f"limit: min {min(limits):.1f}, max {max(limits):.1f}, "
+          f"mean over last half {sum(limits[len(limits) // 2:]) / (len(limits) - len(limits) // 2):.1f}")
+    print(f"counters: {counters}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throttling stub of the NCES site")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--capacity", type=int, default=CAPACITY)
+    parser.add_argument("--latency", type=float, default=BASE_LATENCY)
+    parser.add_argument("--rate", type=float, default=RATE)
+    parser.add_argument("--check", action="store_true", help="drive bs4_scrape.safe_get against the stub")
+    parser.add_argument("--mixed", action="store_true", help="fast search pages, slower detail pages, cache hits")
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    server = ThrottlingServer(("127.0.0.1", args.port), args.capacity, args.latency, args.rate, args.mixed)
+    if not args.check:
+        print(f"Serving throttled stub on http://127.0.0.1:{args.port}/")
+        server.serve_forever()
+        return
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        check(server, args.requests)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Run telemetry shared by ratings_scrape.py and bs4_scrape.py.
+
+Recorder       per-stage timers and counters. Worker processes create one per
+               task and send `snapshot()` back with the task's result.
+RunTelemetry   lives in the main process. It merges worker snapshots (or is
+               recorded into directly), prints a progress line with throughput
+               and ETA every `interval` seconds, and writes a JSON run report at
+               the end.
+
+Usage:
+    run = RunTelemetry("ratings_scrape", total=50000)
+    ...
+    metrics = Recorder()                     # in the worker
+    with metrics.stage("page_load"):
+        driver.get(url)
+    metrics.count("valid")
+    return ..., metrics.snapshot()
+    ...
+    run.merge(snapshot)                      # in the main process
+    run.item_done()
+    ...
+    run.finish()                             # prints a summary, writes ratings_scrape_report.json
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+REPORT_INTERVAL = 30.0      # seconds between progress lines
+MAX_SAMPLES = 2048          # durations kept per stage for percentiles
+
+
+class _Stage:
+    __slots__ = ("count", "total", "max", "samples", "_seen")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+        self._seen = 0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._sample(seconds)
+
+    def absorb(self, count: int, total: float, max_: float, samples: list):
+        self.count += count
+        self.total += total
+        self.max = max(self.max, max_)
+        for seconds in samples:
+            self._sample(seconds)
+
+    def _sample(self, seconds: float):
+        # Reservoir sample so percentiles stay cheap on long runs
+        self._seen += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            i = random.randrange(self._seen)
+            if i < MAX_SAMPLES:
+                self.samples[i] = seconds
+
+    def summary(self, wall: float) -> dict:
+        ordered = sorted(self.samples)
+
+        def pct(p):
+            return round(ordered[min(int(p * len(ordered)), len(ordered) - 1)] * 1000, 1) if ordered else 0.0
+
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 3),
+            "mean_ms": round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max * 1000, 1),
+            "share": round(self.total / wall, 4) if wall > 0 else 0.0,
+        }
+
+
+class Recorder:
+    """Safe to record into from several threads (bs4_scrape's row pool)."""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = _Stage()
+            stage.add(seconds)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def snapshot(self) -> dict:
+        """Picklable copy to send from a worker process to the main one."""
+        return {
+            "stages": {name: [s.count, s.total, s.max, s.samples] for name, s in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def merge(self, snapshot):
+        if not snapshot:
+            return
+        with self._lock:
+            for name, (count, total, max_, samples) in snapshot["stages"].items():
+                stage = self.stages.get(name)
+                if stage is None:
+                    stage = self.stages[name] = _Stage()
+                stage.absorb(count, total, max_, samples)
+            self.counters.update(snapshot["counters"])
+
+
+def _fmt_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}h{m:02d}m" if h else f"{m}m{s:02d}s"
+
+
+class RunTelemetry(Recorder):
+    def __init__(self, name: str, total: int = None, interval: float = REPORT_INTERVAL,
+                 report_path: str = None):
+        super().__init__()
+        self.name = name
+        self.interval = interval
+        self.report_path = report_path or f"{name}_report.json"
+        self.start(total)
+
+    def start(self, total: int = None):
+        self.total = total
+        self.done = 0
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._last_report = self._t0
+        self._last_done = 0
+        self.timeline = []      # [elapsed_s, items done, items/s since previous line]
+
+    def item_done(self, n: int = 1):
+        self.done += n
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self.report(now)
+
+    def report(self, now: float = None):
+        now = now or time.perf_counter()
+        elapsed = now - self._t0
+        window = now - self._last_report
+        recent = (self.done - self._last_done) / window if window > 0 else 0.0
+        overall = self.done / elapsed if elapsed > 0 else 0.0
+        self.timeline.append([round(elapsed, 1), self.done, round(recent, 3)])
+        self._last_report, self._last_done = now, self.done
+
+        progress = f"{self.done}"
+        if self.total:
+            progress += f"/{self.total} ({self.done / self.total:.1%})"
+            # Recent rate reacts to slowdowns faster than the overall average
+            rate = recent or overall
+            if rate > 0:
+                progress += f" | ETA {_fmt_duration((self.total - self.done) / rate)}"
+        counters = " ".join(f"{k} {v}" for k, v in sorted(self.counters.items()))
+        stage_time = sum(s.total for s in self.stages.values())
+        shares = " ".join(f"{name} {s.total / stage_time:.0%}"
+                          for name, s in sorted(self.stages.items(), key=lambda kv: -kv[1].total)) if stage_time else ""
+        print(f"[PROGRESS] {progress} | {overall:.2f}/s (last {window:.0f}s: {recent:.2f}/s) | {counters} | {shares}")
+
+    def finish(self) -> dict:
+        """Print a final progress line and write the JSON run report."""
+        self.report()
+        elapsed = time.perf_counter() - self._t0
+        report = {
+            "name": self.name,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "elapsed_s": round(elapsed, 1),
+            "items_done": self.done,
+            "items_total": self.total,
+            "items_per_s": round(self.done / elapsed, 3) if elapsed > 0 else 0.0,
+            "counters": dict(sorted(self.counters.items())),
+            # share = stage time / wall time; with N workers shares add up to about N
+            "stages": {name: s.summary(elapsed) for name, s in sorted(self.stages.items())},
+            "timeline": self.timeline,
+        }
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[DONE] Run report written to {self.report_path}")
+        return report